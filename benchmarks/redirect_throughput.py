@@ -0,0 +1,63 @@
+# SPDX-License-Identifier: MIT
+# Copyright (c) 2025 Scott Joiner
+
+"""
+Redirect requests/sec through the full app and the redirect-only app.
+
+Requests are driven in-process through each app's WSGI callable, so the
+numbers compare framework overhead per redirect. By default the link lookup
+and click buffer are stubbed out; pass --live SHORT_LINK to go through the
+real caches and MongoDB instead.
+
+    python -m benchmarks.redirect_throughput --requests 20000
+
+For end to end numbers, serve each entry point with gunicorn and point a load
+generator such as wrk or hey at /<short_link>/.
+"""
+
+import argparse
+import time
+
+from bson import ObjectId
+
+from src.api import services
+from src.app import create_app
+from src.redirect_app import create_redirect_app
+
+
+def run(app, path, requests):
+    client = app.test_client()
+    for _ in range(min(requests // 10, 1000)):
+        client.get(path)
+
+    start = time.perf_counter()
+    for _ in range(requests):
+        response = client.get(path)
+        assert response.status_code == 302, response.status_code
+    return requests / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=10000)
+    parser.add_argument('--live', metavar='SHORT_LINK', help='existing short link to redirect through MongoDB')
+    args = parser.parse_args()
+
+    short_link = args.live or 'bench'
+    if not args.live:
+        link = {'_id': ObjectId(), 'short_link': short_link, 'redirect_url': 'https://example.com/{}'}
+        services.find_cached = lambda id: link
+        services.click_buffer.add = lambda click: True
+
+    path = f'/{short_link}/arg'
+    results = {
+        'full app (src.app:create_app)': run(create_app(), path, args.requests),
+        'redirect app (src.redirect_app:create_redirect_app)': run(create_redirect_app(), path, args.requests),
+    }
+    baseline = next(iter(results.values()))
+    for name, rps in results.items():
+        print(f'{name:55} {rps:10.0f} req/s  {rps / baseline:5.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,246 @@
+# SPDX-License-Identifier: MIT
+# Copyright (c) 2025 Scott Joiner
+
+"""
+asyncio versions of the redirect lookup and click logging, for the ASGI
+entry point. Documents, caches and errors are the same as the Flask path;
+only the I/O differs.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+
+from pymongo import AsyncMongoClient
+from redis import asyncio as aioredis
+
+from src import settings
+from .cache import link_cache, MISSING
+from .clicks import CLICKS, WRITE_STAGES, ClickBatch
+from .partitions import insert_clicks_async
+from .services import link_filter, check_redirectable, build_click, redirect_url
+from .shared_cache import dumps, loads, _NOT_FOUND
+from .sketches import ingest_clicks_async
+from .webhooks import queue_click_webhook
+
+log = logging.getLogger(__name__)
+
+
+class AsyncLinkStore:
+    """
+    Link lookups through the in-process cache, the shared Redis cache and
+    then MongoDB. Concurrent misses on the same key share one lookup.
+    """
+
+    def __init__(self, db, redis, prefix='link:'):
+        self.db = db
+        self.redis = redis
+        self.prefix = prefix
+        self._flights = {}
+        self._down_until = 0.0
+
+    async def find(self, key):
+        link = link_cache.get(key)
+        if link is not MISSING:
+            return link
+
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = self._flights[key] = asyncio.ensure_future(self._load(key))
+            flight.add_done_callback(lambda _: self._flights.pop(key, None))
+        return await asyncio.shield(flight)
+
+    async def _load(self, key):
+        data = await self._redis(self.redis.get(self.prefix + key))
+        if data == _NOT_FOUND:
+            link = None
+        elif data:
+            link = loads(data)
+        else:
+            link = await self.db.links.find_one(link_filter(key))
+            if link:
+                pipe = self.redis.pipeline(transaction=False)
+                for k in (str(link['_id']), link['short_link']):
+                    pipe.set(self.prefix + k, dumps(link), ex=settings.LINK_REDIS_CACHE_TTL)
+                await self._redis(pipe.execute())
+            else:
+                await self._redis(
+                    self.redis.set(self.prefix + key, _NOT_FOUND, ex=settings.LINK_REDIS_CACHE_NEGATIVE_TTL)
+                )
+
+        if link:
+            link_cache.put(link)
+        else:
+            link_cache.put_missing(key)
+        return link
+
+    async def _redis(self, call):
+        """
+        Await a Redis call; errors count as a miss and pause Redis for
+        REDIS_RETRY_INTERVAL seconds
+        """
+        if self._down_until > time.monotonic():
+            call.close()
+            return None
+        try:
+            return await call
+        except Exception as ex:
+            log.warning(f'Shared link cache unavailable: {ex}')
+            self._down_until = time.monotonic() + settings.REDIS_RETRY_INTERVAL
+            return None
+
+
+class AsyncClickWriter:
+    """
+    Bounded click buffer flushed by a task on the event loop, with the same
+    writes as ClickBuffer: partitioned inserts, link counters, rollups and
+    sketches. Clicks arriving while the buffer is full are dropped, and so
+    is a batch that still fails after max_attempts flushes.
+    """
+
+    def __init__(self, db, capacity, batch_size, flush_interval, max_attempts=5):
+        self.db = db
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+        self.dropped = 0
+        self._queue = deque()
+        self._failed = None
+        self._wake = asyncio.Event()
+        self._task = None
+
+    def __len__(self):
+        return len(self._queue)
+
+    def add(self, click):
+        if len(self._queue) >= self.capacity:
+            self.dropped += 1
+            return False
+        self._queue.append(click)
+        if len(self._queue) >= self.batch_size:
+            self._wake.set()
+        return True
+
+    def start(self):
+        self._task = asyncio.ensure_future(self._run())
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        await self.flush()
+
+    async def flush(self):
+        # The batch that failed last time goes first
+        batch, self._failed = self._failed, None
+        while batch is not None or self._queue:
+            if batch is None:
+                batch = ClickBatch([self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))])
+            if not await self._write(batch):
+                if batch.attempts < self.max_attempts:
+                    self._failed = batch
+                    return
+                log.error(f'Giving up on {len(batch)} clicks after {batch.attempts} attempts')
+                self.dropped += len(batch)
+            batch = None
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.flush()
+            except Exception:
+                log.exception('Click flush failed')
+
+    async def _write(self, batch):
+        """
+        ClickBuffer._write on the loop: stages already applied are skipped
+        """
+        batch.attempts += 1
+        try:
+            if CLICKS not in batch.done:
+                await insert_clicks_async(self.db, batch.clicks)
+                batch.applied(CLICKS)
+            for stage, collection, build in WRITE_STAGES:
+                if stage in batch.done:
+                    continue
+                todo, ops = batch.operations(stage, build)
+                try:
+                    if ops:
+                        await getattr(self.db, collection).bulk_write(ops, ordered=False)
+                except Exception as ex:
+                    batch.failed(stage, todo, ex)
+                    raise
+                batch.applied(stage)
+        except Exception as ex:
+            log.error(f'Unable to write {len(batch)} clicks (attempt {batch.attempts}): {ex}')
+            return False
+
+        try:
+            await ingest_clicks_async(self.db, batch.clicks)
+        except Exception as ex:
+            log.error(f'Unable to update sketches for {len(batch)} clicks: {ex}')
+        return True
+
+
+def _log_webhook_failure(future):
+    if not future.cancelled() and future.exception() is not None:
+        log.error(f'Unable to queue click webhook: {future.exception()!r}')
+
+
+class AsyncRedirects:
+    """
+    The redirect path for one event loop: lookups, click buffering and
+    webhook hand-off
+    """
+
+    def __init__(self, mongo_uri=None, redis_url=None):
+        self.client = AsyncMongoClient(mongo_uri or settings.MONGO_URI)
+        db = self.client.get_default_database()
+        self.links = AsyncLinkStore(
+            db,
+            aioredis.Redis.from_url(
+                redis_url or settings.REDIS_URL,
+                socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+                socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT
+            )
+        )
+        self.clicks = AsyncClickWriter(
+            db, settings.CLICK_BUFFER_SIZE, settings.CLICK_BATCH_SIZE, settings.CLICK_FLUSH_INTERVAL,
+            max_attempts=settings.CLICK_MAX_ATTEMPTS
+        )
+
+    async def start(self):
+        self.clicks.start()
+
+    async def close(self):
+        await self.clicks.close()
+        await self.links.redis.aclose()
+        await self.client.close()
+
+    async def redirect_target(self, short_link, request_url, varargs=None, client=None):
+        """
+        get_redirect_target() without blocking the event loop
+        """
+        link = check_redirectable(await self.links.find(short_link), short_link)
+
+        args = varargs.split("/") if varargs else []
+        click = build_click(link, request_url, args, client)
+        self.clicks.add(dict(click))
+
+        webhook_url = link.get('web_hook')
+        if webhook_url and webhook_url != 'https://test.com/webhook':
+            # Enqueueing talks to the broker synchronously, so keep it off the loop
+            queued = asyncio.get_running_loop().run_in_executor(None, queue_click_webhook, webhook_url, click)
+            queued.add_done_callback(_log_webhook_failure)
+
+        return redirect_url(link, args)
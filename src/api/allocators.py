@@ -0,0 +1,137 @@
+# SPDX-License-Identifier: MIT
+# Copyright (c) 2025 Scott Joiner
+
+import hashlib
+import threading
+
+from bson.objectid import ObjectId
+from pymongo import ReturnDocument
+
+from src import settings
+from .extensions import mongo, get_redis
+
+BASE62 = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz'
+
+# Prime multiplier used to scatter sequence numbers (coprime with 2, 31 and 61)
+_SCRAMBLE = 2654435761
+
+
+def base62_encode(n):
+    if n == 0:
+        return BASE62[0]
+    out = []
+    while n:
+        n, r = divmod(n, 62)
+        out.append(BASE62[r])
+    return ''.join(reversed(out))
+
+
+def scramble(n):
+    """
+    Bijective shuffle of n among all numbers with the same base62 length,
+    so consecutive sequence numbers do not produce guessable codes
+    """
+    length = len(base62_encode(n))
+    low = 62 ** (length - 1) if length > 1 else 0
+    size = 62 ** length - low
+    return low + ((n - low) * _SCRAMBLE) % size
+
+
+class HashAllocator:
+    """
+    Candidates from an MD5 of a fresh ObjectId. Each retry gets a longer
+    prefix, from 5 up to 11 characters. Collisions grow with the keyspace.
+    """
+
+    def candidates(self):
+        digest = hashlib.md5(str(ObjectId()).encode('utf-8')).hexdigest()
+        for i in range(5, 12):
+            yield digest[:i]
+
+    def allocate(self, count=1):
+        return [next(self.candidates()) for _ in range(count)]
+
+
+class RangeLeaseAllocator:
+    """
+    Collision free codes from a shared counter.
+
+    The process leases a block of block_size sequence numbers at a time
+    (one round trip per block) and hands them out locally, encoded in
+    base62. Numbers start at 'offset' so codes keep a minimum length.
+    """
+
+    def __init__(self, lease, block_size, offset=0, scrambled=True):
+        self.block_size = block_size
+        self.offset = offset
+        self.scrambled = scrambled
+        self._lease = lease
+        self._lock = threading.Lock()
+        self._next = 0
+        self._end = 0
+
+    def candidates(self):
+        while True:
+            yield self.allocate()[0]
+
+    def allocate(self, count=1):
+        codes = []
+        with self._lock:
+            while len(codes) < count:
+                if self._next >= self._end:
+                    size = max(self.block_size, count - len(codes))
+                    self._end = self._lease(size)
+                    self._next = self._end - size
+                take = min(count - len(codes), self._end - self._next)
+                codes.extend(self._encode(n) for n in range(self._next, self._next + take))
+                self._next += take
+        return codes
+
+    def _encode(self, n):
+        n += self.offset
+        return base62_encode(scramble(n) if self.scrambled else n)
+
+
+def mongo_lease(name):
+    """
+    Lease blocks from a counter document in the 'counters' collection.
+    Returns the (exclusive) end of the leased block.
+    """
+    def lease(size):
+        doc = mongo.db.counters.find_one_and_update(
+            {'_id': name},
+            {'$inc': {'seq': size}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        return doc['seq']
+    return lease
+
+
+def redis_lease(name):
+    """
+    Lease blocks with INCRBY on a Redis counter. Redis must be persistent,
+    a reset counter hands out codes that are already taken.
+    """
+    def lease(size):
+        return get_redis().incrby(f'counters:{name}', size)
+    return lease
+
+
+def make_allocator(strategy):
+    if strategy == 'hash':
+        return HashAllocator()
+
+    leases = {'mongo': mongo_lease, 'redis': redis_lease}
+    if strategy not in leases:
+        raise ValueError(f'Unknown short link allocator: {strategy}')
+
+    return RangeLeaseAllocator(
+        leases[strategy]('short_link'),
+        settings.SHORT_LINK_BLOCK_SIZE,
+        offset=settings.SHORT_LINK_OFFSET,
+        scrambled=settings.SHORT_LINK_SCRAMBLE
+    )
+
+
+short_link_allocator = make_allocator(settings.SHORT_LINK_ALLOCATOR)
@@ -1,15 +1,136 @@
 # SPDX-License-Identifier: MIT
 # Copyright (c) 2025 Scott Joiner
 
+import hashlib
 import logging
+import os
+import threading
+import time
 import jwt
-from jwt import PyJWKClient
+import requests
+from jwt import PyJWKSet
 from flask import request
 from src import settings
 from functools import wraps
+from .cache import TTLCache, MISSING
 
 log = logging.getLogger(__name__)
 
+
+class JWKSCache:
+    """
+    Process wide cache of the IdP's signing keys.
+
+    Keys are refreshed in the background every refresh_interval seconds and
+    on demand when a token names an unknown kid (rate limited so bogus kids
+    cannot hammer the IdP). A failed refresh keeps the previous keys.
+    """
+
+    def __init__(self, url, refresh_interval, min_refresh_interval, timeout):
+        self.url = url
+        self.refresh_interval = refresh_interval
+        self.min_refresh_interval = min_refresh_interval
+        self.timeout = timeout
+        self._keys = {}
+        self._fetched = 0.0
+        self._attempted = 0.0
+        self._lock = threading.Lock()
+        self._pid = None
+        self._stopped = threading.Event()
+
+    def get_signing_key(self, kid):
+        self.ensure_started()
+        key = self._keys.get(kid)
+        if key is None:
+            self.refresh(force=False)
+            key = self._keys.get(kid)
+        if key is None:
+            raise jwt.InvalidKeyError(f'Unknown signing key: {kid}')
+        return key
+
+    def refresh(self, force=True):
+        """
+        Fetch the JWKS document. Returns False, keeping the current keys,
+        if the IdP could not be reached.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if not force and self._attempted and now - self._attempted < self.min_refresh_interval:
+                return False
+            self._attempted = now
+            try:
+                response = requests.get(self.url, timeout=self.timeout)
+                response.raise_for_status()
+                keys = PyJWKSet.from_dict(response.json()).keys
+            except Exception as ex:
+                log.warning(f'Unable to refresh signing keys, using {len(self._keys)} cached: {ex}')
+                return False
+
+            self._keys = {key.key_id: key for key in keys}
+            self._fetched = now
+            return True
+
+    def ensure_started(self):
+        """
+        Start the background refresh once per process (safe to call per request)
+        """
+        if self._pid == os.getpid():
+            return
+
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._stopped.clear()
+            threading.Thread(target=self._run, name='jwks-refresh', daemon=True).start()
+
+    def stop(self):
+        self._stopped.set()
+        self._pid = None
+
+    def _run(self):
+        while not self._stopped.is_set():
+            if time.monotonic() - self._fetched >= self.refresh_interval:
+                self.refresh()
+            self._stopped.wait(min(self.refresh_interval, self.min_refresh_interval))
+
+
+jwks_cache = JWKSCache(
+    settings.IDP_URL,
+    settings.IDP_JWKS_REFRESH_INTERVAL,
+    settings.IDP_JWKS_MIN_REFRESH_INTERVAL,
+    settings.IDP_JWKS_TIMEOUT
+)
+
+token_cache = TTLCache(settings.AUTH_TOKEN_CACHE_SIZE, settings.AUTH_TOKEN_CACHE_TTL)
+
+
+def verify_token(token):
+    """
+    Decode and validate a bearer token. This verifies the signature, token
+    expiration and audience. Tokens that passed are cached by hash until
+    they expire, so repeat requests skip the signature check.
+    """
+    digest = hashlib.sha256(token.encode('utf-8')).hexdigest()
+    decoded = token_cache.get(digest, MISSING)
+    if decoded is not MISSING:
+        return decoded
+
+    kid = jwt.get_unverified_header(token).get('kid')
+    decoded = jwt.decode(
+        token,
+        jwks_cache.get_signing_key(kid).key,
+        algorithms = [settings.IDP_ALG],
+        audience = settings.IDP_AUDIENCE
+    )
+
+    ttl = settings.AUTH_TOKEN_CACHE_TTL
+    if 'exp' in decoded:
+        ttl = min(ttl, decoded['exp'] - time.time())
+    token_cache.set(digest, decoded, ttl)
+    return decoded
+
+
 def requires_auth(f):
     @wraps(f)
     def decorated(*args, **kwargs):
@@ -27,37 +148,24 @@ def requires_auth(f):
             return {'message': 'Unauthorized'}, 401
 
         token = parts[1]
-        
+
         try:
-            
-            # Retrieve the signing key from the JWKS endpoint
-            jwks_client = PyJWKClient(settings.IDP_URL)
-            signing_key = jwks_client.get_signing_key_from_jwt(token).key
-
-            # Decode and validate the token. This verifies the signature,
-            # token expiration, audience, and (optionally) issuer.
-            decoded = jwt.decode(
-                token,
-                signing_key,
-                algorithms = settings.IDP_ALG,
-                audience = settings.IDP_AUDIENCE_AUDIENCE
-            )
-            
+            decoded = verify_token(token)
             log.debug(f'User token for request: {request.path}\n{decoded}')
 
         except Exception as e:
-            
+
             log.warning(f'Token validation error: {str(e)}')
             return {'message': 'Unauthorized'}, 401
 
         # Set the decoded token in the request context (or Flask's g)
         # to allow downstream code to access token info.
         request.decoded_token = decoded
-        
+
         # Logging which user did what: assume 'sub' holds the user identifier.
         user_id = decoded.get('sub', 'unknown')
         log.info(f'User: {user_id} accessed {request.path}')
-        
+
         return f(*args, **kwargs)
 
     return decorated
@@ -0,0 +1,193 @@
+# SPDX-License-Identifier: MIT
+# Copyright (c) 2025 Scott Joiner
+
+import heapq
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from src import settings
+
+# Returned by LinkCache.get when nothing is cached for a key
+MISSING = object()
+
+# Stored for keys known not to exist (negative cache)
+_NOT_FOUND = object()
+
+
+class TTLCache:
+    """
+    Thread safe LRU cache with a per-entry time to live.
+    Keeps hit/miss/eviction counters for reporting.
+
+    Expiry times are also kept in a heap, so entries are dropped as soon as
+    they expire on the next write rather than lingering until the LRU
+    reaches them.
+    """
+
+    def __init__(self, maxsize, ttl, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._data = OrderedDict()
+        self._expiry = []
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+
+            expires_at, value = entry
+            if expires_at <= self._clock():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0 or self.maxsize <= 0:
+            return
+
+        with self._lock:
+            now = self._clock()
+            self._purge(now)
+            expires_at = now + ttl
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            heapq.heappush(self._expiry, (expires_at, next(self._seq), key))
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+            # Overwritten and evicted entries leave stale heap items behind
+            if len(self._expiry) > 2 * len(self._data) + 64:
+                self._expiry = [(entry[0], next(self._seq), k) for k, entry in self._data.items()]
+                heapq.heapify(self._expiry)
+
+    def purge(self):
+        """
+        Drop every expired entry now
+        """
+        with self._lock:
+            self._purge(self._clock())
+
+    def _purge(self, now):
+        expiry = self._expiry
+        while expiry and expiry[0][0] <= now:
+            expires_at, _, key = heapq.heappop(expiry)
+            entry = self._data.get(key)
+            # Skip heap items for entries that were since replaced
+            if entry is not None and entry[0] == expires_at:
+                del self._data[key]
+                self.expirations += 1
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._data.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._expiry.clear()
+
+    def stats(self):
+        return {
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+        }
+
+
+def _as_utc(dt):
+    """
+    PyMongo hands back naive datetimes that are implicitly UTC
+    """
+    return dt.replace(tzinfo=timezone.utc) if dt.tzinfo is None else dt
+
+
+class LinkCache:
+    """
+    In-process cache of resolved link documents used by the redirect path.
+
+    A document is stored under both its '_id' and 'short_link' so a lookup
+    or an invalidation by either identifier finds it. Misses are remembered
+    for a short while so unknown codes do not hammer the database.
+    Cached documents are shared between callers and must not be mutated.
+    """
+
+    def __init__(self, maxsize, ttl, negative_ttl):
+        self.negative_ttl = negative_ttl
+        self._entries = TTLCache(maxsize, ttl)
+
+    @property
+    def maxsize(self):
+        return self._entries.maxsize
+
+    def get(self, key):
+        """
+        Returns the cached document, None for a cached miss, or MISSING
+        """
+        value = self._entries.get(key, MISSING)
+        return None if value is _NOT_FOUND else value
+
+    def put(self, link):
+        ttl = self._entries.ttl
+
+        # Never serve a link from cache past its expiration
+        exp = link.get('expiration')
+        if exp:
+            remaining = (_as_utc(exp) - datetime.now(timezone.utc)).total_seconds()
+            if remaining > 0:
+                ttl = min(ttl, remaining)
+
+        for key in self._keys(link):
+            self._entries.set(key, link, ttl)
+
+    def put_missing(self, key):
+        self._entries.set(key, _NOT_FOUND, self.negative_ttl)
+
+    def invalidate(self, *keys):
+        for key in keys:
+            value = self._entries.pop(str(key))
+            if isinstance(value, dict):
+                for alias in self._keys(value):
+                    self._entries.pop(alias)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        return self._entries.stats()
+
+    @staticmethod
+    def _keys(link):
+        return [str(k) for k in (link.get('_id'), link.get('short_link')) if k]
+
+
+link_cache = LinkCache(
+    settings.LINK_CACHE_SIZE,
+    settings.LINK_CACHE_TTL,
+    settings.LINK_CACHE_NEGATIVE_TTL
+)
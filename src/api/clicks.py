@@ -0,0 +1,398 @@
+# SPDX-License-Identifier: MIT
+# Copyright (c) 2025 Scott Joiner
+
+import atexit
+import fcntl
+import glob
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+from bson import ObjectId, json_util
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from src import settings
+from .extensions import mongo
+from .partitions import insert_clicks
+from .rollups import rollup_updates, breakdown_updates
+from .sketches import ingest_clicks
+
+log = logging.getLogger(__name__)
+
+DROP = 'drop'
+BLOCK = 'block'
+SPILL = 'spill'
+
+
+def counter_updates(clicks):
+    """
+    One $inc of click_count per link, carrying its latest click time
+    """
+    counters = {}
+    for click in clicks:
+        count, last = counters.get(click['url_id'], (0, click['clicked']))
+        counters[click['url_id']] = (count + 1, max(last, click['clicked']))
+
+    return [
+        UpdateOne(
+            {'_id': url_id},
+            {'$inc': {'click_count': count}, '$max': {'last_clicked': last}}
+        )
+        for url_id, (count, last) in counters.items()
+    ]
+
+
+# A batch is written in stages: the click documents, then one bulk_write per
+# collection below. Stages that succeeded are not run again when the batch is
+# retried, and after a partial bulk_write failure only the operations that
+# failed are retried, so counters are never incremented twice. (Operations
+# whose outcome is unknown after a network error are covered by PyMongo's
+# retryable writes.)
+CLICKS = 'clicks'
+WRITE_STAGES = (
+    ('counters', 'links', counter_updates),
+    ('rollups', 'click_rollups', rollup_updates),
+    ('breakdowns', 'click_breakdowns', breakdown_updates),
+)
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class ClickBatch:
+    """
+    A batch of clicks and how far writing it has got
+    """
+
+    def __init__(self, clicks, done=(), pending=None, attempts=0):
+        # Fixed ids make re-inserting the click documents a no-op
+        for click in clicks:
+            click.setdefault('_id', ObjectId())
+        self.clicks = clicks
+        self.done = set(done)
+        # stage -> indexes of the operations still to apply
+        self.pending = dict(pending or {})
+        self.attempts = attempts
+
+    def __len__(self):
+        return len(self.clicks)
+
+    def operations(self, stage, build):
+        ops = build(self.clicks)
+        todo = self.pending.get(stage, range(len(ops)))
+        return list(todo), [ops[i] for i in todo]
+
+    def failed(self, stage, todo, ex):
+        """
+        Record a stage failure; for a BulkWriteError the other operations
+        were applied
+        """
+        if isinstance(ex, BulkWriteError):
+            self.pending[stage] = [todo[e['index']] for e in ex.details['writeErrors']]
+
+    def applied(self, stage):
+        self.done.add(stage)
+        self.pending.pop(stage, None)
+
+    def to_record(self):
+        return {'batch': {
+            'clicks': self.clicks, 'done': sorted(self.done), 'pending': self.pending, 'attempts': self.attempts
+        }}
+
+    @classmethod
+    def from_record(cls, record):
+        return cls(record['clicks'], record['done'], record['pending'], record['attempts'])
+
+
+class ClickBuffer:
+    """
+    Bounded in-memory buffer of click documents.
+
+    Redirects only append to the buffer; a background thread writes the
+    clicks with insert_many into their monthly partitions and folds the
+    per-link counters and time bucket rollups into bulk_writes every flush
+    interval (or as soon as a full batch is waiting), then merges the batch
+    into the daily visitor sketches.
+
+    When the buffer is full the policy decides what happens to new clicks:
+    'drop' discards them, 'block' waits up to block_timeout for room, and
+    'spill' appends them to a local NDJSON file that is replayed on the
+    next successful flush. A batch that still fails after max_attempts is
+    spilled too (or dropped under the other policies) so it cannot hold up
+    the queue. When the flusher starts it replays the spill files of every
+    process, including workers that have since exited.
+    """
+
+    def __init__(self, capacity, batch_size, flush_interval, policy=DROP,
+                 block_timeout=0.05, spill_dir=None, max_attempts=5):
+        if policy not in (DROP, BLOCK, SPILL):
+            raise ValueError(f'Unknown click buffer policy: {policy}')
+
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.spill_dir = spill_dir
+        self.max_attempts = max_attempts
+        self.dropped = 0
+        self.spilled = 0
+
+        self._queue = deque()
+        self._failed = None
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._pid = None
+        self._stopped = False
+
+    def __len__(self):
+        return len(self._queue)
+
+    def add(self, click):
+        """
+        Queue a click for the next flush. Returns False if it was dropped.
+        """
+        self.ensure_started()
+
+        with self._cond:
+            if len(self._queue) >= self.capacity and self.policy == BLOCK:
+                self._cond.wait_for(lambda: len(self._queue) < self.capacity, self.block_timeout)
+
+            if len(self._queue) < self.capacity:
+                self._queue.append(click)
+                if len(self._queue) >= self.batch_size:
+                    self._cond.notify_all()
+                return True
+
+        if self.policy == SPILL:
+            return self._spill([click])
+
+        self.dropped += 1
+        return False
+
+    def flush(self):
+        """
+        Write everything currently buffered (and any spilled clicks)
+        """
+        with self._flush_lock:
+            # The batch that failed last time goes first
+            batch, self._failed = self._failed, None
+            while True:
+                if batch is None:
+                    with self._cond:
+                        clicks = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+                        self._cond.notify_all()
+                    if not clicks:
+                        break
+                    batch = ClickBatch(clicks)
+                if not self._write(batch) and self._retry_later(batch):
+                    return
+                batch = None
+
+            self._replay_spill()
+
+    def ensure_started(self):
+        """
+        Start the flusher thread once per process
+        """
+        if self._pid == os.getpid():
+            return
+
+        with self._cond:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._stopped = False
+            self._failed = None
+            threading.Thread(target=self._run, name='click-flusher', daemon=True).start()
+
+    def close(self):
+        """
+        Stop the flusher and write whatever is left
+        """
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        self.flush()
+
+    def _run(self):
+        # Clicks spilled by earlier or crashed workers
+        try:
+            with self._flush_lock:
+                self._replay_spill(everyone=True)
+        except Exception:
+            log.exception('Click spill replay failed')
+
+        while True:
+            with self._cond:
+                self._cond.wait_for(
+                    lambda: self._stopped or len(self._queue) >= self.batch_size,
+                    self.flush_interval
+                )
+                if self._stopped:
+                    return
+            try:
+                self.flush()
+            except Exception:
+                log.exception('Click flush failed')
+
+    def _write(self, batch):
+        """
+        Apply the stages of 'batch' that have not been applied yet.
+        Returns False if one of them failed.
+        """
+        batch.attempts += 1
+        try:
+            if CLICKS not in batch.done:
+                insert_clicks(mongo.db, batch.clicks)
+                batch.applied(CLICKS)
+            for stage, collection, build in WRITE_STAGES:
+                if stage in batch.done:
+                    continue
+                todo, ops = batch.operations(stage, build)
+                try:
+                    if ops:
+                        getattr(mongo.db, collection).bulk_write(ops, ordered=False)
+                except Exception as ex:
+                    batch.failed(stage, todo, ex)
+                    raise
+                batch.applied(stage)
+        except Exception as ex:
+            log.error(f'Unable to write {len(batch)} clicks (attempt {batch.attempts}): {ex}')
+            return False
+
+        # Sketches are approximate anyway; retrying the batch for them could
+        # count clicks twice
+        try:
+            ingest_clicks(batch.clicks)
+        except Exception as ex:
+            log.error(f'Unable to update sketches for {len(batch)} clicks: {ex}')
+        return True
+
+    def _retry_later(self, batch):
+        """
+        Keep a failed batch for the next flush (returns True), or give up
+        on it after max_attempts
+        """
+        if batch.attempts < self.max_attempts:
+            self._failed = batch
+            return True
+
+        log.error(f'Giving up on {len(batch)} clicks after {batch.attempts} attempts')
+        if self.policy == SPILL:
+            self._spill_lines([json_util.dumps(batch.to_record())], len(batch))
+        else:
+            self.dropped += len(batch)
+        return False
+
+    def _spill_path(self):
+        return os.path.join(self.spill_dir, f'clicks-{os.getpid()}.ndjson')
+
+    def _spill(self, clicks):
+        return self._spill_lines([json_util.dumps(c) for c in clicks], len(clicks))
+
+    def _spill_lines(self, lines, count):
+        path = self._spill_path()
+        try:
+            while True:
+                with open(path, 'a') as f:
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                    # The replayer may have claimed the file after we opened it
+                    try:
+                        current = os.stat(path).st_ino == os.fstat(f.fileno()).st_ino
+                    except FileNotFoundError:
+                        current = False
+                    if current:
+                        f.writelines(line + '\n' for line in lines)
+                        break
+            self.spilled += count
+            return True
+        except OSError as ex:
+            log.error(f'Unable to spill {count} clicks: {ex}')
+            self.dropped += count
+            return False
+
+    def _spill_files(self, everyone):
+        if not everyone:
+            return [self._spill_path()]
+
+        paths = glob.glob(os.path.join(self.spill_dir, 'clicks-*.ndjson'))
+        # Files claimed by a replayer that died before finishing them
+        for path in glob.glob(os.path.join(self.spill_dir, 'clicks-*.ndjson.*.*')):
+            if not _alive(int(path.rsplit('.', 2)[1])):
+                paths.append(path)
+        return paths
+
+    def _claim_spill(self, everyone):
+        """
+        Atomically take one spill file (this process's, or any process's
+        when 'everyone') by renaming it. Returns the claimed path or None.
+        """
+        for path in self._spill_files(everyone):
+            base = path[:path.index('.ndjson')]
+            claimed = f'{base}.ndjson.{os.getpid()}.{time.time_ns()}'
+            try:
+                os.rename(path, claimed)
+            except FileNotFoundError:
+                continue
+            # Wait for a writer that opened the file before the rename
+            with open(claimed) as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            return claimed
+        return None
+
+    def _read_spill(self, path):
+        clicks, batches = [], []
+        with open(path) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json_util.loads(line)
+                if 'batch' in record:
+                    batches.append(ClickBatch.from_record(record['batch']))
+                else:
+                    clicks.append(record)
+        batches += [ClickBatch(clicks[i:i + self.batch_size]) for i in range(0, len(clicks), self.batch_size)]
+        return batches
+
+    def _replay_spill(self, everyone=False):
+        if self.policy != SPILL or not self.spill_dir:
+            return
+
+        while True:
+            path = self._claim_spill(everyone)
+            if path is None:
+                return
+
+            batches = self._read_spill(path)
+            for i, batch in enumerate(batches):
+                if not self._write(batch):
+                    # Keep the rest, with the stages already applied
+                    lines = [json_util.dumps(b.to_record()) for b in batches[i:]]
+                    self._spill_lines(lines, sum(len(b) for b in batches[i:]))
+                    os.remove(path)
+                    return
+            os.remove(path)
+
+
+click_buffer = ClickBuffer(
+    settings.CLICK_BUFFER_SIZE,
+    settings.CLICK_BATCH_SIZE,
+    settings.CLICK_FLUSH_INTERVAL,
+    policy=settings.CLICK_BUFFER_POLICY,
+    block_timeout=settings.CLICK_BLOCK_TIMEOUT,
+    spill_dir=settings.CLICK_SPILL_DIR,
+    max_attempts=settings.CLICK_MAX_ATTEMPTS
+)
+
+atexit.register(click_buffer.close)
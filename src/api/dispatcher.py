@@ -0,0 +1,180 @@
+# SPDX-License-Identifier: MIT
+# Copyright (c) 2025 Scott Joiner
+
+import asyncio
+import json
+import logging
+import weakref
+from urllib.parse import urlsplit
+
+import aiohttp
+import redis.asyncio as aioredis
+from celery.utils.time import get_exponential_backoff_interval
+
+from src import settings
+from .tasks import WebhookTask
+
+log = logging.getLogger(__name__)
+
+
+def retry_countdown(retries):
+    """
+    Seconds to wait before the next attempt, using WebhookTask's policy
+    """
+    if not WebhookTask.retry_backoff:
+        return 0
+    return get_exponential_backoff_interval(
+        factor=int(max(1.0, WebhookTask.retry_backoff)),
+        retries=retries,
+        maximum=WebhookTask.retry_backoff_max,
+        full_jitter=WebhookTask.retry_jitter
+    )
+
+
+class AsyncWebhookDispatcher:
+    """
+    Delivers click webhooks from an asyncio event loop.
+
+    Takes the same (webhook_url, payload) pairs the celery tasks receive,
+    where payload is a click or a list of clicks. Up to 'concurrency'
+    deliveries are in flight at once, at most 'per_host' of them against
+    any single destination. Failed POSTs are retried with WebhookTask's
+    exponential backoff and jitter, up to its max_retries; a delivery
+    waiting to be retried gives up its slot and submits itself again.
+    """
+
+    def __init__(self, concurrency, per_host, timeout, max_retries=WebhookTask.max_retries):
+        self.per_host = per_host
+        self.max_retries = max_retries
+        self.delivered = 0
+        self.failed = 0
+        self._slots = asyncio.Semaphore(concurrency)
+        # Held by the deliveries using them, so idle hosts drop out
+        self._hosts = weakref.WeakValueDictionary()
+        self._timeout = aiohttp.ClientTimeout(connect=timeout[0], sock_read=timeout[1])
+        self._session = None
+        self._tasks = set()
+        self._retrying = set()
+
+    async def __aenter__(self):
+        connector = aiohttp.TCPConnector(limit=0, limit_per_host=self.per_host)
+        self._session = aiohttp.ClientSession(connector=connector, timeout=self._timeout)
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.drain()
+        await self._session.close()
+
+    async def submit(self, webhook_url, payload, ack=None, retries=0):
+        """
+        Schedule a delivery, waiting while the dispatcher is at capacity.
+        'ack' is awaited once the delivery has succeeded or been given up.
+        """
+        await self._slots.acquire()
+        task = asyncio.create_task(self._deliver(webhook_url, payload, ack, retries))
+        self._tasks.add(task)
+        task.add_done_callback(self._done)
+
+    async def drain(self):
+        while self._tasks or self._retrying:
+            await asyncio.gather(*self._tasks, *self._retrying, return_exceptions=True)
+
+    async def run(self, redis_client, queue, consumer):
+        """
+        Consume JSON encoded [webhook_url, payload] entries from a Redis list.
+
+        Each entry is moved to this consumer's processing list while it is
+        being delivered and removed from it afterwards, so entries left
+        there by a crash are put back on the queue at the next start.
+        """
+        processing = f'{queue}:processing:{consumer}'
+        recovered = 0
+        while await redis_client.lmove(processing, queue, 'RIGHT', 'LEFT') is not None:
+            recovered += 1
+        if recovered:
+            log.warning(f'Requeued {recovered} unfinished webhook entries from {processing}')
+
+        while True:
+            item = await redis_client.blmove(queue, processing, 1, 'LEFT', 'RIGHT')
+            if item is None:
+                continue
+
+            async def ack(item=item):
+                await redis_client.lrem(processing, 1, item)
+
+            try:
+                webhook_url, payload = json.loads(item)
+            except ValueError:
+                log.error(f'Discarding malformed webhook entry: {item!r}')
+                await ack()
+                continue
+            await self.submit(webhook_url, payload, ack)
+
+    def _done(self, task):
+        self._tasks.discard(task)
+        self._slots.release()
+        if not task.cancelled() and task.exception() is not None:
+            log.error(f'Webhook delivery task failed: {task.exception()!r}')
+
+    def _host_limit(self, webhook_url):
+        host = urlsplit(webhook_url).netloc
+        limit = self._hosts.get(host)
+        if limit is None:
+            limit = self._hosts[host] = asyncio.Semaphore(self.per_host)
+        return limit
+
+    async def _deliver(self, webhook_url, payload, ack, retries):
+        try:
+            limit = self._host_limit(webhook_url)
+            async with limit:
+                async with self._session.post(webhook_url, json=payload) as response:
+                    response.raise_for_status()
+                    await response.read()
+            self.delivered += 1
+        except (aiohttp.ClientError, asyncio.TimeoutError) as ex:
+            if retries >= self.max_retries:
+                self.failed += 1
+                log.warning(f'Giving up on webhook {webhook_url} after {retries} retries: {ex}')
+            else:
+                countdown = retry_countdown(retries)
+                log.debug(f'Webhook {webhook_url} failed ({ex}), retry {retries + 1} in {countdown}s')
+                retry = asyncio.create_task(self._retry(countdown, webhook_url, payload, ack, retries + 1))
+                self._retrying.add(retry)
+                retry.add_done_callback(self._retrying.discard)
+                return
+        except Exception as ex:
+            # Not worth retrying (e.g. a payload that is not JSON serializable);
+            # acknowledged so it is not requeued at every restart
+            self.failed += 1
+            log.error(f'Giving up on webhook {webhook_url}: {ex!r}')
+
+        if ack is not None:
+            try:
+                await ack()
+            except Exception as ex:
+                log.error(f'Unable to acknowledge webhook entry for {webhook_url}: {ex}')
+
+    async def _retry(self, countdown, webhook_url, payload, ack, retries):
+        # Sleep without a slot, then queue up for one like a new delivery
+        await asyncio.sleep(countdown)
+        await self.submit(webhook_url, payload, ack, retries)
+
+
+async def serve():
+    redis_client = aioredis.from_url(settings.REDIS_URL)
+    dispatcher = AsyncWebhookDispatcher(
+        settings.WEBHOOK_ASYNC_CONCURRENCY,
+        settings.WEBHOOK_ASYNC_PER_HOST,
+        (settings.WEBHOOK_CONNECT_TIMEOUT, settings.WEBHOOK_READ_TIMEOUT)
+    )
+    async with dispatcher:
+        log.info(f'Dispatching webhooks from {settings.WEBHOOK_QUEUE}')
+        await dispatcher.run(redis_client, settings.WEBHOOK_QUEUE, settings.WEBHOOK_CONSUMER)
+
+
+def main():
+    asyncio.run(serve())
+
+# Command line handler
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+# SPDX-License-Identifier: MIT
+# Copyright (c) 2025 Scott Joiner
+
+"""
+Link expiration. A link stops redirecting (410) at the exact instant in its
+'expiration' field. Once LINK_EXPIRATION_GRACE seconds have passed,
+sweep_expired_links() moves it from 'links' to 'expired_links'. Only with
+LINK_EXPIRED_DELETE does a TTL index delete it without keeping a copy.
+"""
+
+import logging
+from datetime import datetime, timedelta, timezone
+
+import click
+from pymongo import ReplaceOne
+
+from src import settings
+from .extensions import mongo, links_cli
+from .invalidation import invalidation_bus
+from .shared_cache import shared_link_cache
+
+log = logging.getLogger(__name__)
+
+ARCHIVE = 'expired_links'
+
+
+def _as_utc(dt):
+    return dt.replace(tzinfo=timezone.utc) if dt.tzinfo is None else dt.astimezone(timezone.utc)
+
+
+def is_expired(link, now=None):
+    exp = link.get('expiration')
+    if not exp:
+        return False
+    return _as_utc(exp) <= (now or datetime.now(timezone.utc))
+
+
+def sweep_expired_links(db, grace=None, now=None, batch_size=None):
+    """
+    Move links whose grace period has passed to the archive collection,
+    a batch at a time. Safe to rerun: archive writes are upserts and only
+    links still past the cutoff are deleted. Returns the number moved.
+    """
+    grace = settings.LINK_EXPIRATION_GRACE if grace is None else grace
+    batch_size = batch_size or settings.BULK_CHUNK_SIZE
+    cutoff = _as_utc(now or datetime.now(timezone.utc)) - timedelta(seconds=grace)
+
+    moved = 0
+    while True:
+        batch = list(db.links.find({'expiration': {'$lte': cutoff}}).limit(batch_size))
+        if not batch:
+            return moved
+
+        db[ARCHIVE].bulk_write([ReplaceOne({'_id': link['_id']}, link, upsert=True) for link in batch], ordered=False)
+        ids = [link['_id'] for link in batch]
+        db.links.delete_many({'_id': {'$in': ids}, 'expiration': {'$lte': cutoff}})
+
+        codes = [link['short_link'] for link in batch]
+        shared_link_cache.delete(*ids, *codes)
+        invalidation_bus.publish(*ids, *codes)
+
+        moved += len(batch)
+        log.info(f'Archived {len(batch)} expired links')
+        if len(batch) < batch_size:
+            return moved
+
+
+@links_cli.command('sweep-expired')
+def sweep_expired_command():
+    """
+    Move links expired for longer than LINK_EXPIRATION_GRACE to expired_links.
+    """
+    click.echo(f'{sweep_expired_links(mongo.db)} expired links archived')
@@ -1,20 +1,39 @@
 # SPDX-License-Identifier: MIT
 # Copyright (c) 2025 Scott Joiner
 
+import redis
 from flask_pymongo import PyMongo
 from flask_restx import Namespace
 from flask import url_for
+from flask.cli import AppGroup
 from functools import wraps
+from src import settings
 
 # instantiate but don’t init yet
 mongo = PyMongo()
 
+# Shared Redis client, created on first use
+_redis = None
+
+def get_redis():
+    global _redis
+    if _redis is None:
+        _redis = redis.Redis.from_url(
+            settings.REDIS_URL,
+            socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT
+        )
+    return _redis
+
 # To prevent circular references
 ns = Namespace(
     'Links', 
     description='URL shortening operations'
 )
 
+# flask links <command>
+links_cli = AppGroup('links', help='Link storage maintenance.')
+
 # Exceptions
 class LinkNotFoundError(Exception):
     pass
@@ -49,6 +68,8 @@ def attach_hateoas(f):
                 doc['_links'].update({
                     'self':   url_for('api.links_item',  id=sid, _external=False),
                     'clicks': url_for('api.link_clicks', id=sid, _external=False),
+                    'stats':  url_for('api.link_stats',  id=sid, _external=False),
+                    'visitors': url_for('api.link_visitors', id=sid, _external=False),
                 })
             return doc
 
@@ -0,0 +1,229 @@
+# SPDX-License-Identifier: MIT
+# Copyright (c) 2025 Scott Joiner
+
+import logging
+import os
+import threading
+from datetime import datetime, timezone
+
+import click
+from bson.objectid import ObjectId
+from pymongo import IndexModel, ASCENDING, DESCENDING, TEXT
+from pymongo.errors import OperationFailure
+
+from src import settings
+from .extensions import mongo, links_cli
+from .partitions import PARTITION_INDEXES, existing_partitions, partition_name
+
+log = logging.getLogger(__name__)
+
+# Index registry. Names are left to MongoDB's defaults so indexes created by
+# hand (see README) are recognised rather than duplicated.
+INDEXES = {
+    'links': [
+        IndexModel([('short_link', ASCENDING)], unique=True),
+        IndexModel([('owner', ASCENDING), ('created', DESCENDING)]),
+        IndexModel([('tags', ASCENDING)]),
+        IndexModel([('host', ASCENDING)]),
+        IndexModel([('redirect_url', ASCENDING)]),
+        IndexModel([('redirect_url', TEXT)]),
+        IndexModel([('click_count', DESCENDING), ('last_clicked', DESCENDING)]),
+        # Only deletes expired links when LINK_EXPIRED_DELETE is set; otherwise
+        # it serves the expiry sweeper
+        IndexModel(
+            [('expiration', ASCENDING)],
+            **({'expireAfterSeconds': settings.LINK_EXPIRATION_GRACE} if settings.LINK_EXPIRED_DELETE else {})
+        ),
+    ],
+    'expired_links': [
+        IndexModel([('short_link', ASCENDING)]),
+    ],
+    'click_rollups': [
+        IndexModel([('url_id', ASCENDING), ('g', ASCENDING), ('ts', ASCENDING)], unique=True),
+        IndexModel([('expires', ASCENDING)], expireAfterSeconds=0),
+    ],
+    'click_breakdowns': [
+        IndexModel([('url_id', ASCENDING), ('g', ASCENDING), ('ts', ASCENDING), ('k', ASCENDING), ('v', ASCENDING)],
+                   unique=True),
+        IndexModel([('expires', ASCENDING)], expireAfterSeconds=0),
+    ],
+    'link_sketches': [
+        IndexModel([('url_id', ASCENDING), ('day', ASCENDING)]),
+    ],
+}
+
+# Stands for the newest click partition in QUERY_SHAPES
+CLICKS = 'clicks_*'
+
+# Every query shape issued by services.py, as (label, collection, filter, sort).
+# check_query_plans() explains each one and reports any collection scan.
+# tests/test_indexes.py runs the services against a recording database and
+# fails if this list and the queries actually issued disagree.
+_ID = ObjectId()
+_WHEN = datetime(2025, 1, 1)
+QUERY_SHAPES = [
+    ('find_one by _id', 'links', {'_id': _ID}, None),
+    ('find_one by short_link', 'links', {'short_link': 'abc12'}, None),
+    ('sweep_expired_links', 'links', {'expiration': {'$lte': _WHEN}}, None),
+    ('link warmup', 'links', {}, [('click_count', DESCENDING), ('last_clicked', DESCENDING)]),
+    ('insert_links availability', 'links', {'short_link': {'$in': ['abc12', 'def34']}}, None),
+    ('search', 'links', {}, [('_id', ASCENDING)]),
+    ('search by tag', 'links', {'tags': {'$in': ['a', 'b']}}, [('_id', ASCENDING)]),
+    ('search by all tags', 'links', {'tags': {'$all': ['a', 'b']}}, [('_id', ASCENDING)]),
+    ('search by url prefix', 'links', {'redirect_url': {'$regex': '^https://example\\.com/'}}, [('_id', ASCENDING)]),
+    ('search by host', 'links', {'host': 'example.com'}, [('_id', ASCENDING)]),
+    ('search by text', 'links', {'$text': {'$search': 'example'}}, [('_id', ASCENDING)]),
+    ('search after cursor', 'links', {'_id': {'$gt': _ID}}, [('_id', ASCENDING)]),
+    ('export_links', 'links', {}, [('_id', ASCENDING)]),
+    ('get_clicks', CLICKS, {'url_id': _ID, 'clicked': {'$gte': _WHEN}}, [('clicked', ASCENDING), ('_id', ASCENDING)]),
+    ('get_clicks after cursor', CLICKS, {'$and': [
+        {'url_id': _ID, 'clicked': {'$gte': _WHEN}},
+        {'$or': [{'clicked': {'$gt': _WHEN}}, {'clicked': _WHEN, '_id': {'$gt': _ID}}]},
+    ]}, [('clicked', ASCENDING), ('_id', ASCENDING)]),
+    ('link_stats', 'click_rollups', {'url_id': _ID, 'g': 'hour', 'ts': {'$gte': _WHEN, '$lte': _WHEN}}, [('ts', ASCENDING)]),
+    ('link_stats breakdowns', 'click_breakdowns', {'url_id': _ID, 'g': 'hour', 'ts': {'$gte': _WHEN, '$lte': _WHEN}}, None),
+    ('link_audience', 'link_sketches', {'url_id': _ID, 'day': {'$gte': _WHEN, '$lte': _WHEN}}, [('day', ASCENDING)]),
+]
+
+
+def ensure_indexes(db):
+    """
+    Create every registered index, including those of existing click
+    partitions. Conflicting definitions are logged and skipped so one stale
+    index does not block the rest.
+    """
+    created = []
+    registry = dict(INDEXES)
+    for name in existing_partitions(db):
+        registry[name] = PARTITION_INDEXES
+    for collection, models in registry.items():
+        for model in models:
+            try:
+                created += db[collection].create_indexes([model])
+            except OperationFailure as ex:
+                if ex.code == _INDEX_OPTIONS_CONFLICT and 'expireAfterSeconds' in model.document:
+                    created += _update_ttl(db, collection, model)
+                elif ex.code == _INDEX_OPTIONS_CONFLICT and _unwanted_ttl(db, collection, model):
+                    created += _drop_ttl(db, collection, model)
+                else:
+                    log.error(f"Unable to create index {model.document['key']} on {collection}: {ex}")
+    return created
+
+
+_INDEX_OPTIONS_CONFLICT = 85
+
+def _update_ttl(db, collection, model):
+    """
+    A TTL index whose expireAfterSeconds changed (e.g. LINK_EXPIRATION_GRACE)
+    is modified in place instead of being rebuilt
+    """
+    try:
+        db.command({
+            'collMod': collection,
+            'index': {
+                'keyPattern': dict(model.document['key']),
+                'expireAfterSeconds': model.document['expireAfterSeconds'],
+            },
+        })
+    except OperationFailure as ex:
+        log.error(f"Unable to update TTL of {model.document['key']} on {collection}: {ex}")
+        return []
+    return [model.document['name']]
+
+
+# The only TTL index that settings can turn off
+_EXPIRATION_KEY = [('expiration', ASCENDING)]
+
+def _unwanted_ttl(db, collection, model):
+    """
+    True if 'model' is the plain links.expiration index and the existing
+    index on that key is a TTL index
+    """
+    key = list(model.document['key'].items())
+    if collection != 'links' or key != _EXPIRATION_KEY or 'expireAfterSeconds' in model.document:
+        return False
+    for info in db[collection].index_information().values():
+        if list(info['key']) == key and 'expireAfterSeconds' in info:
+            return True
+    return False
+
+
+def _drop_ttl(db, collection, model):
+    """
+    Replace a TTL index that is no longer wanted (LINK_EXPIRED_DELETE was
+    turned off) with a plain one, so it stops deleting documents
+    """
+    try:
+        db[collection].drop_index(list(model.document['key'].items()))
+        return db[collection].create_indexes([model])
+    except OperationFailure as ex:
+        log.error(f"Unable to remove TTL from {model.document['key']} on {collection}: {ex}")
+        return []
+
+
+def _stages(plan):
+    yield plan.get('stage')
+    for key in ('inputStage', 'queryPlan'):
+        if key in plan:
+            yield from _stages(plan[key])
+    for child in plan.get('inputStages', []):
+        yield from _stages(child)
+
+
+def check_query_plans(db):
+    """
+    Explain every query shape and return the labels of those whose winning
+    plan contains a COLLSCAN
+    """
+    offenders = []
+    for label, collection, query, sort in QUERY_SHAPES:
+        if collection == CLICKS:
+            collection = (existing_partitions(db) or [partition_name(datetime.now(timezone.utc))])[-1]
+        cursor = db[collection].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        plan = cursor.explain()['queryPlanner']['winningPlan']
+        if 'COLLSCAN' in _stages(plan):
+            offenders.append(label)
+    return offenders
+
+
+_provisioned_pid = None
+
+def provision_indexes(db):
+    """
+    Create indexes in the background, once per process
+    """
+    global _provisioned_pid
+    if _provisioned_pid == os.getpid():
+        return
+    _provisioned_pid = os.getpid()
+
+    def run():
+        try:
+            ensure_indexes(db)
+        except Exception as ex:
+            log.error(f'Index provisioning failed: {ex}')
+
+    threading.Thread(target=run, name='index-provisioning', daemon=True).start()
+
+
+@links_cli.command('ensure-indexes')
+def ensure_indexes_command():
+    """
+    Create every registered index.
+    """
+    for name in ensure_indexes(mongo.db):
+        click.echo(name)
+
+@links_cli.command('check-indexes')
+def check_indexes_command():
+    """
+    Fail if any services.py query shape falls back to a collection scan.
+    """
+    offenders = check_query_plans(mongo.db)
+    for label in offenders:
+        click.echo(f'COLLSCAN: {label}', err=True)
+    if offenders:
+        raise SystemExit(1)
+    click.echo('All query shapes use an index.')
@@ -0,0 +1,113 @@
+# SPDX-License-Identifier: MIT
+# Copyright (c) 2025 Scott Joiner
+
+import json
+import logging
+import os
+import threading
+import time
+
+from src import settings
+from .extensions import mongo, get_redis
+from .cache import link_cache
+
+log = logging.getLogger(__name__)
+
+
+class InvalidationBus:
+    """
+    Propagates link cache invalidations to every process.
+
+    Keys are evicted locally and published on a Redis channel; each process
+    runs a subscriber thread that evicts whatever its peers publish. A MongoDB
+    change stream on 'links' can be enabled as a second source so writes made
+    outside this service are picked up as well (requires a replica set).
+    """
+
+    RETRY_MAX = 30
+
+    def __init__(self, cache, channel, redis_factory=get_redis, change_stream=False):
+        self.cache = cache
+        self.channel = channel
+        self.change_stream = change_stream
+        self._redis_factory = redis_factory
+        self._pid = None
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+
+    def publish(self, *keys):
+        """
+        Evict keys here and in every other subscribed process
+        """
+        keys = [str(k) for k in keys if k]
+        if not keys:
+            return
+
+        self.cache.invalidate(*keys)
+        try:
+            self._redis_factory().publish(self.channel, json.dumps(keys))
+        except Exception as ex:
+            log.warning(f'Unable to publish cache invalidation for {keys}: {ex}')
+
+    def ensure_started(self):
+        """
+        Start the listener threads once per process (safe to call per request)
+        """
+        if self._pid == os.getpid():
+            return
+
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._stopped.clear()
+
+            self._spawn(self._listen, 'link-cache-pubsub')
+            if self.change_stream:
+                self._spawn(self._watch, 'link-cache-changes')
+
+    def stop(self):
+        self._stopped.set()
+        self._pid = None
+
+    def _spawn(self, target, name):
+        threading.Thread(target=self._forever, args=(target,), name=name, daemon=True).start()
+
+    def _forever(self, target):
+        delay = 0.5
+        while not self._stopped.is_set():
+            try:
+                target()
+                delay = 0.5
+            except Exception as ex:
+                log.warning(f'Cache invalidation listener failed, retrying in {delay}s: {ex}')
+                self._stopped.wait(delay)
+                delay = min(delay * 2, self.RETRY_MAX)
+
+    def _listen(self):
+        pubsub = self._redis_factory().pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(self.channel)
+        try:
+            while not self._stopped.is_set():
+                message = pubsub.get_message(timeout=1.0)
+                if message and message['type'] == 'message':
+                    self.cache.invalidate(*json.loads(message['data']))
+        finally:
+            pubsub.close()
+
+    def _watch(self):
+        pipeline = [{'$match': {'operationType': {'$in': ['update', 'replace', 'delete']}}}]
+        with mongo.db.links.watch(pipeline) as stream:
+            while not self._stopped.is_set():
+                change = stream.try_next()
+                if change is None:
+                    time.sleep(0.1)
+                    continue
+                self.cache.invalidate(str(change['documentKey']['_id']))
+
+
+invalidation_bus = InvalidationBus(
+    link_cache,
+    settings.LINK_CACHE_CHANNEL,
+    change_stream=settings.LINK_CACHE_CHANGE_STREAM
+)
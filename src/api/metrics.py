@@ -0,0 +1,209 @@
+# SPDX-License-Identifier: MIT
+# Copyright (c) 2025 Scott Joiner
+
+"""
+Prometheus metrics, served at /metrics. Under gunicorn set
+PROMETHEUS_MULTIPROC_DIR to an empty directory shared by the workers: each
+process then writes its samples there and /metrics adds them up. Dead
+workers are cleaned up by the child_exit hook in src/gunicorn_conf.py.
+
+Recording is a histogram observation per request and per MongoDB command.
+Cache and click buffer figures are copied from counters the code already
+keeps, every METRICS_SYNC_INTERVAL seconds, so lookups pay nothing.
+"""
+
+import inspect
+import logging
+import os
+import threading
+import time
+from contextvars import ContextVar
+from functools import wraps
+
+from flask import Response, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+)
+from pymongo import monitoring
+
+from src import settings
+from .auth import token_cache
+from .cache import link_cache
+from .clicks import click_buffer
+from .sessions import webhook_sessions
+
+log = logging.getLogger(__name__)
+
+BUCKETS = (.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5)
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds', 'Request latency by endpoint',
+    ['endpoint', 'method', 'status'], buckets=BUCKETS
+)
+MONGO_LATENCY = Histogram(
+    'mongo_command_duration_seconds', 'MongoDB command latency by services function',
+    ['operation', 'command'], buckets=BUCKETS
+)
+WEBHOOK_ENQUEUE_LATENCY = Histogram(
+    'webhook_enqueue_duration_seconds', 'Time taken to hand a click to the webhook queue',
+    ['engine'], buckets=BUCKETS
+)
+CACHE_LOOKUPS = Counter('cache_lookups', 'In-process cache lookups', ['cache', 'result'])
+CLICK_BUFFER_DEPTH = Gauge('click_buffer_depth', 'Clicks waiting to be written', multiprocess_mode='livesum')
+CLICKS_NOT_BUFFERED = Counter('click_buffer_overflow', 'Clicks dropped or spilled to disk', ['outcome'])
+WEBHOOK_POOL = Counter(
+    'webhook_pool', 'Webhook requests sent and connections opened by the pooled sessions', ['event']
+)
+
+# services.py function issuing the current MongoDB commands
+_operation = ContextVar('mongo_operation', default='background')
+
+
+def mongo_operation(f):
+    """
+    Label the MongoDB commands 'f' issues with its name
+    """
+    name = f.__name__
+
+    if inspect.isgeneratorfunction(f):
+        @wraps(f)
+        def generator(*args, **kwargs):
+            gen = f(*args, **kwargs)
+            try:
+                while True:
+                    token = _operation.set(name)
+                    try:
+                        item = next(gen)
+                    except StopIteration:
+                        return
+                    finally:
+                        _operation.reset(token)
+                    yield item
+            finally:
+                gen.close()
+        return generator
+
+    @wraps(f)
+    def wrapper(*args, **kwargs):
+        token = _operation.set(name)
+        try:
+            return f(*args, **kwargs)
+        finally:
+            _operation.reset(token)
+    return wrapper
+
+
+class MongoCommandTimer(monitoring.CommandListener):
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        MONGO_LATENCY.labels(_operation.get(), event.command_name).observe(event.duration_micros / 1e6)
+
+    def failed(self, event):
+        MONGO_LATENCY.labels(_operation.get(), event.command_name).observe(event.duration_micros / 1e6)
+
+
+class MetricsSync:
+    """
+    Copies the in-process cache, click buffer and webhook session counters
+    into the Prometheus metrics, once per process in a background thread
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._last = {}
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def _counters(self):
+        values = {}
+        for name, cache in (('link', link_cache), ('token', token_cache)):
+            stats = cache.stats()
+            values[(CACHE_LOOKUPS, name, 'hit')] = stats['hits']
+            values[(CACHE_LOOKUPS, name, 'miss')] = stats['misses']
+        values[(CLICKS_NOT_BUFFERED, 'dropped')] = click_buffer.dropped
+        values[(CLICKS_NOT_BUFFERED, 'spilled')] = click_buffer.spilled
+        webhook = webhook_sessions.totals()
+        values[(WEBHOOK_POOL, 'request')] = webhook['requests']
+        values[(WEBHOOK_POOL, 'connection')] = webhook['connections']
+        return values
+
+    def sync(self):
+        with self._lock:
+            for key, value in self._counters().items():
+                delta = value - self._last.get(key, 0)
+                if delta > 0:
+                    key[0].labels(*key[1:]).inc(delta)
+                self._last[key] = value
+        CLICK_BUFFER_DEPTH.set(len(click_buffer))
+
+    def ensure_started(self):
+        """
+        Start syncing once per process (safe to call per request)
+        """
+        if self._pid == os.getpid():
+            return
+
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            # Counts inherited from the parent process were reported there
+            self._last = self._counters()
+            threading.Thread(target=self._run, name='metrics-sync', daemon=True).start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.sync()
+            except Exception as ex:
+                log.warning(f'Unable to sync metrics: {ex}')
+
+
+metrics_sync = MetricsSync(settings.METRICS_SYNC_INTERVAL)
+
+if settings.METRICS_ENABLED:
+    # Applies to every MongoClient created from here on
+    monitoring.register(MongoCommandTimer())
+
+
+def exposition():
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry)
+
+
+def metrics_view():
+    metrics_sync.sync()
+    return Response(exposition(), mimetype=CONTENT_TYPE_LATEST)
+
+
+def _start_timer():
+    metrics_sync.ensure_started()
+    request.environ['metrics.started'] = time.perf_counter()
+
+
+def _observe(response):
+    started = request.environ.get('metrics.started')
+    if started is not None:
+        # The matched route, so unknown paths share one label
+        endpoint = request.url_rule.endpoint if request.url_rule else 'unmatched'
+        REQUEST_LATENCY.labels(endpoint, request.method, response.status_code).observe(time.perf_counter() - started)
+    return response
+
+
+def init_app(app):
+    """
+    Time every request and serve /metrics, unless METRICS_ENABLED is false
+    """
+    if not settings.METRICS_ENABLED:
+        return
+    app.before_request(_start_timer)
+    app.after_request(_observe)
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
@@ -0,0 +1,58 @@
+# SPDX-License-Identifier: MIT
+# Copyright (c) 2025 Scott Joiner
+
+import base64
+import json
+from datetime import datetime, timezone
+
+from bson.objectid import ObjectId
+from bson.errors import InvalidId
+
+# Response header carrying the token for the next page
+NEXT_CURSOR_HEADER = 'X-Next-Cursor'
+
+LINKS = 'l'
+CLICKS = 'c'
+
+
+class InvalidCursorError(ValueError):
+    pass
+
+
+def encode_cursor(kind, doc):
+    """
+    Opaque token pointing just past 'doc' in a (clicked, _id) or _id ordering
+    """
+    token = {'k': kind, 'i': str(doc['_id'])}
+    if kind == CLICKS:
+        clicked = doc['clicked']
+        if clicked.tzinfo is None:
+            clicked = clicked.replace(tzinfo=timezone.utc)
+        token['c'] = int(clicked.timestamp() * 1000)
+    raw = json.dumps(token, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(kind, cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        token = json.loads(raw)
+        if token.get('k') != kind:
+            raise InvalidCursorError('Cursor does not belong to this listing')
+
+        out = {'_id': ObjectId(token['i'])}
+        if kind == CLICKS:
+            out['clicked'] = datetime.fromtimestamp(token['c'] / 1000, timezone.utc)
+        return out
+    except (ValueError, KeyError, TypeError, InvalidId) as ex:
+        raise InvalidCursorError(f'Invalid cursor: {cursor}') from ex
+
+
+def cursor_headers(kind, items, args):
+    """
+    Headers for a page of results; a full page gets a next cursor
+    """
+    max = int(args.get('max') or 20)
+    if not items or len(items) < max:
+        return {}
+    return {NEXT_CURSOR_HEADER: encode_cursor(kind, items[-1])}
@@ -25,7 +25,7 @@ search_parser.add_argument(
     type=str,
     location="args",
     required=False,
-    help='All or part of a URL'
+    help='A URL prefix (https://...), a host name, or words to search for in the URL'
 )
 search_parser.add_argument(
     "tag",
@@ -34,7 +34,15 @@ search_parser.add_argument(
     location="args",
     action="append",
     required=False,
-    help='All or part of a tag.'
+    help='A tag. Matching is case insensitive.'
+)
+search_parser.add_argument(
+    "tag_match",
+    type=str,
+    location="args",
+    choices=("any", "all"),
+    required=False,
+    help='Match links with any (default) or all of the tags'
 )
 search_parser.add_argument(
     "page",
@@ -50,13 +58,20 @@ search_parser.add_argument(
     required=False,
     help='Maximum number of results to return. Defaults to 20.'
 )
+search_parser.add_argument(
+    "cursor",
+    type=str,
+    location="args",
+    required=False,
+    help='Opaque token from the X-Next-Cursor header of the previous page. Overrides page.'
+)
 
 """
 Page Parser
 """
 click_parser = get_parser.copy()
-search_parser.add_argument(
-    "tag",
+click_parser.add_argument(
+    "args",
     type=str,
     dest="args",
     location="args",
@@ -78,3 +93,61 @@ click_parser.add_argument(
     required=False,
     help='Maximum number of results to return. Defaults to 20.'
 )
+click_parser.add_argument(
+    "cursor",
+    type=str,
+    location="args",
+    required=False,
+    help='Opaque token from the X-Next-Cursor header of the previous page. Overrides page.'
+)
+click_parser.add_argument(
+    "start",
+    type=str,
+    location="args",
+    required=False,
+    help='Only clicks at or after this time (ISO 8601, UTC)'
+)
+click_parser.add_argument(
+    "end",
+    type=str,
+    location="args",
+    required=False,
+    help='Only clicks at or before this time (ISO 8601, UTC)'
+)
+
+"""
+Stats Parser
+"""
+stats_parser = get_parser.copy()
+stats_parser.add_argument(
+    "granularity",
+    type=str,
+    location="args",
+    choices=("minute", "hour", "day"),
+    required=False,
+    help='Bucket size of the time series. Defaults to hour'
+)
+stats_parser.add_argument(
+    "start",
+    type=str,
+    location="args",
+    required=False,
+    help='Start of the range (ISO 8601, UTC). Defaults to one window before end'
+)
+stats_parser.add_argument(
+    "end",
+    type=str,
+    location="args",
+    required=False,
+    help='End of the range (ISO 8601, UTC). Defaults to now'
+)
+stats_parser.add_argument(
+    "top",
+    type=int,
+    location="args",
+    required=False,
+    help='Number of top referrers, user agents and args to return. Defaults to 10'
+)
+
+visitors_parser = stats_parser.copy()
+visitors_parser.remove_argument("granularity")
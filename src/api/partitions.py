@@ -0,0 +1,250 @@
+# SPDX-License-Identifier: MIT
+# Copyright (c) 2025 Scott Joiner
+
+"""
+Clicks are stored in one collection per calendar month (UTC), clicks_YYYYMM,
+so old months can be archived and dropped whole instead of deleted row by row.
+"""
+
+import gzip
+import logging
+import os
+import re
+import threading
+from datetime import datetime, timezone
+
+import click
+from bson import json_util
+from pymongo import IndexModel, ASCENDING
+from pymongo.errors import BulkWriteError
+
+from src import settings
+from .extensions import mongo, links_cli
+
+log = logging.getLogger(__name__)
+
+PREFIX = 'clicks_'
+_NAME = re.compile(r'^clicks_(\d{4})(\d{2})$')
+
+# Indexes created on every partition
+PARTITION_INDEXES = [
+    IndexModel([('url_id', ASCENDING), ('clicked', ASCENDING), ('_id', ASCENDING)]),
+]
+
+
+def _as_utc(dt):
+    return dt.replace(tzinfo=timezone.utc) if dt.tzinfo is None else dt.astimezone(timezone.utc)
+
+
+def partition_name(when):
+    when = _as_utc(when)
+    return f'{PREFIX}{when.year:04d}{when.month:02d}'
+
+
+def partition_month(name):
+    match = _NAME.match(name)
+    if not match:
+        return None
+    return int(match.group(1)), int(match.group(2))
+
+
+def existing_partitions(db):
+    """
+    Names of the click partitions present in the database, oldest first
+    """
+    return sorted(name for name in db.list_collection_names() if _NAME.match(name))
+
+
+def partitions_between(db, start=None, end=None):
+    """
+    Existing partitions overlapping [start, end], oldest first
+    """
+    lo = (_as_utc(start).year, _as_utc(start).month) if start else None
+    hi = (_as_utc(end).year, _as_utc(end).month) if end else None
+    return [
+        name for name in existing_partitions(db)
+        if (lo is None or partition_month(name) >= lo) and (hi is None or partition_month(name) <= hi)
+    ]
+
+
+_ensured = set()
+_ensured_lock = threading.Lock()
+
+def ensure_partition(db, name):
+    """
+    Create a partition's indexes the first time this process writes to it
+    """
+    if name in _ensured:
+        return
+    with _ensured_lock:
+        if name in _ensured:
+            return
+        db[name].create_indexes(PARTITION_INDEXES)
+        _ensured.add(name)
+
+
+def group_by_partition(clicks):
+    by_partition = {}
+    for click in clicks:
+        by_partition.setdefault(partition_name(click['clicked']), []).append(click)
+    return by_partition
+
+
+def _ignore_duplicates(ex):
+    # Clicks already written by an earlier, partially failed attempt are fine
+    if any(e['code'] != 11000 for e in ex.details['writeErrors']):
+        raise ex
+
+
+def insert_clicks(db, clicks):
+    """
+    insert_many each month's clicks into its partition
+    """
+    for name, batch in group_by_partition(clicks).items():
+        ensure_partition(db, name)
+        try:
+            db[name].insert_many(batch, ordered=False)
+        except BulkWriteError as ex:
+            _ignore_duplicates(ex)
+
+
+async def insert_clicks_async(db, clicks):
+    """
+    insert_clicks() for an AsyncMongoClient database
+    """
+    for name, batch in group_by_partition(clicks).items():
+        if name not in _ensured:
+            await db[name].create_indexes(PARTITION_INDEXES)
+            _ensured.add(name)
+        try:
+            await db[name].insert_many(batch, ordered=False)
+        except BulkWriteError as ex:
+            _ignore_duplicates(ex)
+
+
+def find_clicks(db, query, start=None, end=None, after=None, skip=0, limit=20):
+    """
+    Clicks matching 'query' across the partitions overlapping [start, end]
+    in (clicked, _id) order. 'after' is a decoded cursor; partitions before
+    its month are not queried at all.
+    """
+    if start or end:
+        query = dict(query)
+        query['clicked'] = {}
+        if start:
+            query['clicked']['$gte'] = _as_utc(start)
+        if end:
+            query['clicked']['$lte'] = _as_utc(end)
+    if after:
+        start = max(_as_utc(start), after['clicked']) if start else after['clicked']
+        query = {'$and': [query, {'$or': [
+            {'clicked': {'$gt': after['clicked']}},
+            {'clicked': after['clicked'], '_id': {'$gt': after['_id']}},
+        ]}]}
+
+    results = []
+    for name in partitions_between(db, start, end):
+        if len(results) >= limit:
+            break
+        if skip:
+            # Page offsets skip whole partitions by count rather than by scanning
+            count = db[name].count_documents(query)
+            if count <= skip:
+                skip -= count
+                continue
+        cursor = db[name].find(query).sort([('clicked', 1), ('_id', 1)])
+        if skip:
+            cursor = cursor.skip(skip)
+            skip = 0
+        results += list(cursor.limit(limit - len(results)))
+    return results
+
+
+def expired_partitions(db, months=None, now=None):
+    """
+    Partitions older than the current month and the 'months' before it
+    """
+    months = settings.CLICK_RETENTION_MONTHS if months is None else months
+    if not months:
+        return []
+    now = _as_utc(now or datetime.now(timezone.utc))
+    index = now.year * 12 + now.month - 1 - months
+    oldest_kept = (index // 12, index % 12 + 1)
+    return [name for name in existing_partitions(db) if partition_month(name) < oldest_kept]
+
+
+def archive_partition(db, name, directory):
+    """
+    Stream a partition to gzipped NDJSON in 'directory' and return the file
+    path. The file is only renamed into place once every click is written.
+    """
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f'{name}.ndjson.gz')
+    partial = path + '.partial'
+
+    written = 0
+    with gzip.open(partial, 'wt', encoding='utf-8') as out:
+        for doc in db[name].find().sort('_id', 1).batch_size(settings.BULK_CHUNK_SIZE):
+            out.write(json_util.dumps(doc) + '\n')
+            written += 1
+
+    expected = db[name].estimated_document_count()
+    if written < expected:
+        os.remove(partial)
+        raise RuntimeError(f'Archived {written} of {expected} clicks from {name}')
+    os.replace(partial, path)
+    return path
+
+
+def apply_retention(db, months=None, directory=None, archive=None, now=None):
+    """
+    Archive (unless disabled) and drop every expired partition.
+    Returns the names of the dropped partitions.
+    """
+    directory = directory or settings.CLICK_ARCHIVE_DIR
+    archive = settings.CLICK_ARCHIVE if archive is None else archive
+
+    dropped = []
+    for name in expired_partitions(db, months, now):
+        if archive:
+            log.info(f'Archived {name} to {archive_partition(db, name, directory)}')
+        db.drop_collection(name)
+        _ensured.discard(name)
+        dropped.append(name)
+    return dropped
+
+
+def migrate_legacy_clicks(db, batch_size=1000):
+    """
+    Move clicks from the unpartitioned clicks collection into the monthly
+    partitions, then drop it. Returns the number of clicks moved.
+    """
+    moved = 0
+    batch = []
+    for doc in db.clicks.find().sort('_id', 1).batch_size(batch_size):
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            insert_clicks(db, batch)
+            moved += len(batch)
+            batch = []
+    if batch:
+        insert_clicks(db, batch)
+        moved += len(batch)
+    db.drop_collection('clicks')
+    return moved
+
+
+@links_cli.command('apply-retention')
+def apply_retention_command():
+    """
+    Archive and drop click partitions older than CLICK_RETENTION_MONTHS.
+    """
+    for name in apply_retention(mongo.db):
+        click.echo(f'Dropped {name}')
+
+@links_cli.command('partition-clicks')
+def partition_clicks_command():
+    """
+    Move clicks from the legacy clicks collection into monthly partitions.
+    """
+    click.echo(f'{migrate_legacy_clicks(mongo.db)} clicks moved')
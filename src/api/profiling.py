@@ -0,0 +1,230 @@
+# SPDX-License-Identifier: MIT
+# Copyright (c) 2025 Scott Joiner
+
+"""
+Opt-in statistical profiling of requests. A sampled request's thread is
+registered with a per-process sampler thread, which walks its stack every
+PROFILE_INTERVAL seconds via sys._current_frames(); stacks are counted per
+endpoint. Unsampled requests only pay for one random() call, and nothing
+is installed at all unless PROFILE_ENABLED is set.
+"""
+
+import atexit
+import hmac
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+from flask import Response, request
+
+from src import settings
+from .auth import requires_auth
+
+log = logging.getLogger(__name__)
+
+TRUNCATED = '[truncated]'
+
+
+def _frame_name(code):
+    return f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+
+
+def collapse(frame):
+    """
+    Semicolon separated stack, outermost frame first
+    """
+    names = []
+    while frame is not None:
+        names.append(_frame_name(frame.f_code))
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class StackSampler:
+    """
+    Samples the stacks of the threads currently serving profiled requests
+    and aggregates them per endpoint. Each endpoint keeps at most
+    max_stacks distinct stacks; further ones are counted as TRUNCATED.
+    """
+
+    def __init__(self, interval, max_stacks):
+        self.interval = interval
+        self.max_stacks = max_stacks
+        self._active = {}
+        self._stacks = {}
+        self._requests = Counter()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._pid = None
+
+    def begin(self, endpoint):
+        self.ensure_started()
+        with self._lock:
+            self._requests[endpoint] += 1
+        self._active[threading.get_ident()] = endpoint
+        self._wake.set()
+
+    def end(self):
+        self._active.pop(threading.get_ident(), None)
+
+    def sample(self):
+        frames = sys._current_frames()
+        with self._lock:
+            for ident, endpoint in list(self._active.items()):
+                frame = frames.get(ident)
+                if frame is None:
+                    continue
+                stacks = self._stacks.setdefault(endpoint, Counter())
+                stack = collapse(frame)
+                if stack not in stacks and len(stacks) >= self.max_stacks:
+                    stack = TRUNCATED
+                stacks[stack] += 1
+
+    def snapshot(self, reset=False):
+        """
+        {endpoint: Counter of collapsed stacks}, and the profiled request counts
+        """
+        with self._lock:
+            stacks = {endpoint: Counter(counts) for endpoint, counts in self._stacks.items()}
+            counts = dict(self._requests)
+            if reset:
+                self._stacks.clear()
+                self._requests.clear()
+        return stacks, counts
+
+    def ensure_started(self):
+        """
+        Start the sampler thread once per process
+        """
+        if self._pid == os.getpid():
+            return
+
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            threading.Thread(target=self._run, name='profile-sampler', daemon=True).start()
+
+    def _run(self):
+        while True:
+            if not self._active:
+                self._wake.clear()
+                # Re-check so a request registered before the clear is not missed
+                if not self._active:
+                    self._wake.wait()
+            time.sleep(self.interval)
+            try:
+                self.sample()
+            except Exception as ex:
+                log.warning(f'Profile sampling failed: {ex}')
+
+
+def to_collapsed(stacks):
+    """
+    Brendan Gregg's collapsed format, one 'endpoint;frames count' line per stack
+    """
+    lines = []
+    for endpoint, counts in sorted(stacks.items()):
+        for stack, count in counts.most_common():
+            lines.append(f'{endpoint};{stack} {count}')
+    return '\n'.join(lines) + '\n'
+
+
+def to_speedscope(stacks, interval):
+    """
+    A speedscope sampled profile per endpoint, weighted in seconds
+    """
+    frames, index = [], {}
+    profiles = []
+    for endpoint, counts in sorted(stacks.items()):
+        samples, weights = [], []
+        for stack, count in counts.most_common():
+            sample = []
+            for name in stack.split(';'):
+                if name not in index:
+                    index[name] = len(frames)
+                    frames.append({'name': name})
+                sample.append(index[name])
+            samples.append(sample)
+            weights.append(count * interval)
+        profiles.append({
+            'type': 'sampled',
+            'name': endpoint,
+            'unit': 'seconds',
+            'startValue': 0,
+            'endValue': sum(weights),
+            'samples': samples,
+            'weights': weights,
+        })
+    return {
+        '$schema': 'https://www.speedscope.app/file-format-schema.json',
+        'shared': {'frames': frames},
+        'profiles': profiles,
+        'name': f'urls pid {os.getpid()}',
+    }
+
+
+def dump(sampler, directory):
+    """
+    Write this process's profile to 'directory' as collapsed stacks
+    """
+    stacks, _ = sampler.snapshot()
+    if not stacks:
+        return None
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f'profile-{os.getpid()}.collapsed')
+    with open(path, 'w', encoding='utf-8') as out:
+        out.write(to_collapsed(stacks))
+    return path
+
+
+profiler = StackSampler(settings.PROFILE_INTERVAL, settings.PROFILE_MAX_STACKS)
+
+
+def _wanted():
+    if settings.PROFILE_TOKEN:
+        token = request.headers.get(settings.PROFILE_HEADER)
+        if token and hmac.compare_digest(token, settings.PROFILE_TOKEN):
+            return True
+    return random.random() < settings.PROFILE_SAMPLE_RATE
+
+
+def _begin():
+    if _wanted():
+        profiler.begin(request.url_rule.endpoint if request.url_rule else 'unmatched')
+
+
+def _end(exc):
+    profiler.end()
+
+
+@requires_auth
+def profile_view():
+    """
+    This worker's profile: ?format=collapsed (default) or speedscope,
+    ?reset=true to start over after reading
+    """
+    stacks, counts = profiler.snapshot(reset=request.args.get('reset') == 'true')
+    if request.args.get('format') == 'speedscope':
+        body = to_speedscope(stacks, settings.PROFILE_INTERVAL)
+        body['requests'] = counts
+        return Response(json.dumps(body), mimetype='application/json')
+    return Response(to_collapsed(stacks), mimetype='text/plain')
+
+
+def init_app(app):
+    """
+    Profile sampled requests and serve /profile, only when PROFILE_ENABLED
+    """
+    if not settings.PROFILE_ENABLED:
+        return
+    app.before_request(_begin)
+    app.teardown_request(_end)
+    app.add_url_rule('/profile', 'profile', profile_view)
+    if settings.PROFILE_DIR:
+        atexit.register(dump, profiler, settings.PROFILE_DIR)
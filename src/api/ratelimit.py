@@ -0,0 +1,322 @@
+# SPDX-License-Identifier: MIT
+# Copyright (c) 2025 Scott Joiner
+
+import logging
+import math
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+from functools import wraps
+
+from flask import request, Response
+
+from src import settings
+from .cache import TTLCache
+from .extensions import get_redis
+
+log = logging.getLogger(__name__)
+
+TOKEN_BUCKET = 'token_bucket'
+SLIDING_WINDOW = 'sliding_window'
+
+_PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+Decision = namedtuple('Decision', 'allowed limit remaining reset retry_after')
+
+
+def parse_limit(value):
+    """
+    '100/minute' -> (100, 60)
+    """
+    count, _, period = value.partition('/')
+    if period.rstrip('s') not in _PERIODS:
+        raise ValueError(f'Invalid rate limit: {value}')
+    return int(count), _PERIODS[period.rstrip('s')]
+
+
+# Each script is one round trip and uses the Redis server clock, so every
+# process agrees on time. Fractional results are returned as strings because
+# Redis truncates Lua numbers to integers. Scripts only touch the key passed
+# in KEYS, so they also run on Redis Cluster.
+_TOKEN_BUCKET = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+local retry = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+else
+    retry = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000))
+return {allowed, tostring(tokens), tostring(retry)}
+"""
+
+_SLIDING_WINDOW = """
+local limit = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local current = math.floor(now / window)
+local elapsed = (now - current * window) / window
+-- One hash per limit, with a count field per window
+local counts = redis.call('HGETALL', KEYS[1])
+local prev, cur = 0, 0
+for i = 1, #counts, 2 do
+    local w = tonumber(counts[i])
+    if w == current then
+        cur = tonumber(counts[i + 1])
+    elseif w == current - 1 then
+        prev = tonumber(counts[i + 1])
+    else
+        redis.call('HDEL', KEYS[1], counts[i])
+    end
+end
+local used = prev * (1 - elapsed) + cur
+if used + cost > limit then
+    local retry = (1 - elapsed) * window
+    if prev > 0 and limit - cur - cost >= 0 then
+        retry = math.max(0, (1 - (limit - cur - cost) / prev - elapsed) * window)
+    end
+    return {0, tostring(math.max(0, limit - used)), tostring(retry)}
+end
+redis.call('HINCRBY', KEYS[1], current, cost)
+redis.call('EXPIRE', KEYS[1], window * 2)
+return {1, tostring(limit - used - cost), '0'}
+"""
+
+_QUOTA = """
+local limit = tonumber(ARGV[1])
+local cost = tonumber(ARGV[2])
+local used = tonumber(redis.call('GET', KEYS[1]) or '0')
+if used + cost > limit then
+    return {0, used}
+end
+used = redis.call('INCRBY', KEYS[1], cost)
+redis.call('EXPIRE', KEYS[1], tonumber(ARGV[3]))
+return {1, used}
+"""
+
+_REFUND = """
+local used = tonumber(redis.call('GET', KEYS[1]) or '0')
+local amount = math.min(used, tonumber(ARGV[1]))
+if amount > 0 then
+    used = redis.call('DECRBY', KEYS[1], amount)
+end
+return used
+"""
+
+
+class LocalLimiter:
+    """
+    In-process versions of the Redis scripts, used while Redis is
+    unavailable. Limits then apply per process rather than per deployment.
+    """
+
+    def __init__(self, maxsize=100000, clock=time.time):
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = TTLCache(maxsize, 86400)
+
+    def token_bucket(self, key, capacity, rate, cost):
+        with self._lock:
+            now = self._clock()
+            tokens, ts = self._state.get(key) or (capacity, now)
+            tokens = min(capacity, tokens + max(0, now - ts) * rate)
+            allowed, retry = tokens >= cost, 0
+            if allowed:
+                tokens -= cost
+            else:
+                retry = (cost - tokens) / rate
+            self._state.set(key, (tokens, now), capacity / rate)
+            return allowed, tokens, retry
+
+    def sliding_window(self, key, limit, window, cost):
+        with self._lock:
+            now = self._clock()
+            current = math.floor(now / window)
+            elapsed = (now - current * window) / window
+            counts = self._state.get(key) or {}
+            prev, cur = counts.get(current - 1, 0), counts.get(current, 0)
+            used = prev * (1 - elapsed) + cur
+            if used + cost > limit:
+                retry = (1 - elapsed) * window
+                if prev > 0 and limit - cur - cost >= 0:
+                    retry = max(0, (1 - (limit - cur - cost) / prev - elapsed) * window)
+                return False, max(0, limit - used), retry
+            self._state.set(key, {current - 1: prev, current: cur + cost}, window * 2)
+            return True, limit - used - cost, 0
+
+    def quota(self, key, limit, cost, ttl):
+        with self._lock:
+            used = self._state.get(key) or 0
+            if used + cost > limit:
+                return False, used
+            self._state.set(key, used + cost, ttl)
+            return True, used + cost
+
+    def refund(self, key, amount, ttl):
+        with self._lock:
+            used = max(0, (self._state.get(key) or 0) - amount)
+            self._state.set(key, used, ttl)
+            return used
+
+
+class RateLimiter:
+    """
+    Token bucket or sliding window rate limits and daily quotas kept in
+    Redis, falling back to a LocalLimiter for REDIS_RETRY_INTERVAL seconds
+    whenever Redis fails.
+    """
+
+    def __init__(self, redis_factory, algorithm=TOKEN_BUCKET, prefix='rl:', local=None):
+        if algorithm not in (TOKEN_BUCKET, SLIDING_WINDOW):
+            raise ValueError(f'Unknown rate limit algorithm: {algorithm}')
+        self.algorithm = algorithm
+        self.prefix = prefix
+        self.local = local or LocalLimiter()
+        self._redis_factory = redis_factory
+        self._scripts = None
+        self._down_until = 0.0
+
+    def hit(self, key, limit, period, cost=1):
+        """
+        Take 'cost' from the limit of 'limit' requests per 'period' seconds
+        """
+        key = f'{self.prefix}{self.algorithm[0]}:{key}'
+        if self.algorithm == TOKEN_BUCKET:
+            rate = limit / period
+            result = self._run('token_bucket', key, [limit, rate, cost])
+            allowed, remaining, retry = result or self.local.token_bucket(key, limit, rate, cost)
+            # Time until the bucket is full again
+            reset = (limit - float(remaining)) / rate
+        else:
+            result = self._run('sliding_window', key, [limit, period, cost])
+            allowed, remaining, retry = result or self.local.sliding_window(key, limit, period, cost)
+            reset = period
+
+        return Decision(bool(int(allowed)), limit, int(float(remaining)), math.ceil(reset), math.ceil(float(retry)))
+
+    def _quota_key(self, key, now):
+        now = now or datetime.now(timezone.utc)
+        tomorrow = (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+        return f'{self.prefix}q:{now:%Y%m%d}:{key}', max(1, int((tomorrow - now).total_seconds()))
+
+    def consume_quota(self, key, limit, cost=1, now=None):
+        """
+        Take 'cost' from a daily quota that resets at midnight UTC
+        """
+        key, ttl = self._quota_key(key, now)
+        result = self._run('quota', key, [limit, cost, ttl])
+        allowed, used = result or self.local.quota(key, limit, cost, ttl)
+        allowed = bool(int(allowed))
+        return Decision(allowed, limit, max(0, limit - int(used)), ttl, 0 if allowed else ttl)
+
+    def refund_quota(self, key, amount, now=None):
+        """
+        Give back part of a consume_quota() charge, e.g. for links that were
+        not created. Pass the same 'now' so the same day is credited.
+        """
+        if amount <= 0:
+            return
+        key, ttl = self._quota_key(key, now)
+        if self._run('refund', key, [amount]) is None:
+            self.local.refund(key, amount, ttl)
+
+    def _run(self, script, key, args):
+        if self._down_until > time.monotonic():
+            return None
+        try:
+            if self._scripts is None:
+                r = self._redis_factory()
+                self._scripts = {
+                    'token_bucket': r.register_script(_TOKEN_BUCKET),
+                    'sliding_window': r.register_script(_SLIDING_WINDOW),
+                    'quota': r.register_script(_QUOTA),
+                    'refund': r.register_script(_REFUND),
+                }
+            return self._scripts[script](keys=[key], args=args)
+        except Exception as ex:
+            log.warning(f'Rate limiter falling back to local state: {ex}')
+            self._scripts = None
+            self._down_until = time.monotonic() + settings.REDIS_RETRY_INTERVAL
+            return None
+
+
+rate_limiter = RateLimiter(get_redis, settings.RATELIMIT_ALGORITHM, settings.RATELIMIT_PREFIX)
+
+
+def limit_headers(decision):
+    headers = {
+        'X-RateLimit-Limit': str(decision.limit),
+        'X-RateLimit-Remaining': str(decision.remaining),
+        'X-RateLimit-Reset': str(decision.reset),
+    }
+    if not decision.allowed:
+        headers['Retry-After'] = str(max(1, decision.retry_after))
+    return headers
+
+
+def _with_headers(rv, headers):
+    if isinstance(rv, Response):
+        rv.headers.extend(headers)
+        return rv
+    if isinstance(rv, tuple):
+        data, code, extra = rv + (None,) * (3 - len(rv))
+        return data, code or 200, {**headers, **(extra or {})}
+    return rv, 200, headers
+
+
+def rate_limit(scope, limit=None, quota_cost=None, quota_used=None):
+    """
+    Limit an endpoint per owner. Apply below requires_auth so the owner is
+    known. 'limit' is a setting such as '60/minute' (RATELIMIT_DEFAULT when
+    omitted). When quota_cost is given it is called with no arguments and
+    its result is charged against the owner's daily link quota before the
+    view runs; quota_used is then called with the view's return value and
+    whatever it does not account for is refunded. A view that raises is
+    refunded in full.
+    """
+    count, period = parse_limit(limit or settings.RATELIMIT_DEFAULT)
+
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            if not settings.RATELIMIT_ENABLED:
+                return f(*args, **kwargs)
+
+            owner = request.decoded_token.get('sub', 'unknown')
+            decision = rate_limiter.hit(f'{scope}:{owner}', count, period)
+            if not decision.allowed:
+                return {'message': 'Too many requests'}, 429, limit_headers(decision)
+
+            if not (quota_cost and settings.LINK_DAILY_QUOTA):
+                return _with_headers(f(*args, **kwargs), limit_headers(decision))
+
+            cost, now = quota_cost(), datetime.now(timezone.utc)
+            quota = rate_limiter.consume_quota(owner, settings.LINK_DAILY_QUOTA, cost, now=now)
+            if not quota.allowed:
+                return {'message': 'Daily link quota exceeded'}, 429, limit_headers(quota)
+
+            used = 0
+            try:
+                rv = f(*args, **kwargs)
+                used = quota_used(rv) if quota_used else cost
+            finally:
+                rate_limiter.refund_quota(owner, cost - used, now=now)
+            return _with_headers(rv, limit_headers(decision))
+
+        return decorated
+
+    return decorator
@@ -0,0 +1,44 @@
+# SPDX-License-Identifier: MIT
+# Copyright (c) 2025 Scott Joiner
+
+"""
+Short link redirects as a plain Flask blueprint, outside the RESTX Api, so
+they skip its dispatch, marshalling and error handling. Registered by both
+the full app and the redirect-only app.
+"""
+
+import logging
+from flask import Blueprint, request, redirect
+
+from .extensions import LinkNotFoundError, LinkExpiredError
+from .services import get_redirect_target, client_info
+from .warmup import link_warmup
+
+log = logging.getLogger(__name__)
+
+redirects = Blueprint('redirects', __name__)
+
+
+@redirects.route('/ready')
+def ready():
+    """
+    Readiness probe: 503 until the link cache warmup has finished
+    """
+    return link_warmup.status(), 200 if link_warmup.ready else 503
+
+
+@redirects.route('/<short_link>/', defaults={'varargs': None})
+@redirects.route('/<short_link>/<path:varargs>')
+def redirect_short_link(short_link, varargs):
+    """
+    Main Redirect
+    """
+
+    try:
+        target = get_redirect_target(short_link, request.url, varargs, client_info(request))
+    except LinkNotFoundError as e:
+        return {'message': str(e)}, 404
+    except LinkExpiredError as e:
+        return {'message': str(e)}, 410
+
+    return redirect(target)
@@ -2,22 +2,37 @@
 # Copyright (c) 2025 Scott Joiner
  
 import logging
-from flask import request, abort, redirect
+from flask import request, abort, Response, stream_with_context
 from flask_restx import Resource
+from src import settings
 from .auth import requires_auth
-from .serializers import new_link_request, update_link_request, link_object, click_object
-from .parsers import search_parser, get_parser, click_parser
+from .ratelimit import rate_limit
+from .serializers import new_link_request, update_link_request, link_object, created_link_object, click_object, stats_object, visitors_object
+from .parsers import search_parser, get_parser, click_parser, stats_parser, visitors_parser
 from src.api import services as ops
 from .extensions import ns, attach_hateoas
+from .pagination import cursor_headers, InvalidCursorError, LINKS, CLICKS
 
 log = logging.getLogger(__name__)   
+
+
+def created_links(rv):
+    """
+    Links a POST /links response actually created, for the daily quota
+    """
+    data = rv[0] if isinstance(rv, tuple) else rv
+    if not isinstance(data, list):
+        return 0
+    return sum(1 for link in data if link.get('status') in ('created', 'reassigned'))
     
 @ns.route('/')
 @ns.response(401, 'Not Authorized.')
+@ns.response(429, 'Rate limit or daily quota exceeded.')
 @ns.response(500, 'Link error.')
 class LinkListResource(Resource):
 
     @requires_auth
+    @rate_limit('search', settings.RATELIMIT_SEARCH)
     @ns.expect(search_parser, validate=True)
     @ns.marshal_list_with(link_object, code=200, description='Link list')
     def get(self):
@@ -26,16 +41,20 @@ class LinkListResource(Resource):
         """
 
         try:
-            return ops.search(request.args), 200
+            results = ops.search(request.args)
+            return results, 200, cursor_headers(LINKS, results, request.args)
 
+        except InvalidCursorError as e:
+            abort(400, str(e))
         except Exception as e:
             abort(500, str(e))
 
 
     @requires_auth
+    @rate_limit('create', settings.RATELIMIT_CREATE, quota_cost=lambda: len(ns.payload or []), quota_used=created_links)
     @attach_hateoas
     @ns.expect(get_parser, [new_link_request], validate=True)
-    @ns.marshal_list_with(link_object, code=201, description='Link created')
+    @ns.marshal_list_with(created_link_object, code=201, description='Link created')
     def post(self):
         """
         Creates minified links for the provided urls.
@@ -48,12 +67,50 @@ class LinkListResource(Resource):
             abort(500, str(e))
 
 
+@ns.route('/bulk', endpoint='links_bulk')
+@ns.response(401, 'Not Authorized.')
+@ns.response(429, 'Rate limit or daily quota exceeded.')
+@ns.response(500, 'Link error.')
+class LinkBulkResource(Resource):
+
+    @requires_auth
+    @rate_limit('export')
+    @ns.expect(get_parser, validate=True)
+    @ns.produces(['application/x-ndjson'])
+    @ns.response(200, 'Newline delimited link documents')
+    def get(self):
+        """
+        Exports every link as newline delimited JSON.
+        """
+
+        return Response(stream_with_context(ops.export_links()), mimetype='application/x-ndjson')
+
+
+    @requires_auth
+    @rate_limit('import', settings.RATELIMIT_CREATE)
+    @ns.expect(get_parser, validate=True)
+    @ns.produces(['application/x-ndjson'])
+    @ns.response(200, 'Newline delimited progress, one line per chunk')
+    def post(self):
+        """
+        Imports newline delimited JSON minification requests in chunks.
+        """
+
+        owner = request.decoded_token.get('sub')
+        return Response(
+            stream_with_context(ops.import_links(request.stream, owner)),
+            mimetype='application/x-ndjson'
+        )
+
+
 @ns.route('/<string:id>', endpoint='links_item')
 @ns.response(500, 'Link error.')
 @ns.response(401, 'Not Authorized.')
+@ns.response(429, 'Rate limit or daily quota exceeded.')
 class LinkResource(Resource):
 
     @requires_auth
+    @rate_limit('read')
     @attach_hateoas
     @ns.response(404, 'Link not found.')
     @ns.marshal_with(link_object, code=200, description='Link object')
@@ -71,7 +128,9 @@ class LinkResource(Resource):
 
 
     @requires_auth
+    @rate_limit('update')
     @attach_hateoas
+    @ns.response(400, 'Invalid redirect_url template or expiration.')
     @ns.response(404, 'Link not found.')
     @ns.expect(update_link_request, get_parser, validate=True)
     @ns.marshal_with(link_object, code=200, description='Link updated')
@@ -83,11 +142,14 @@ class LinkResource(Resource):
         try:
             return ops.update_link(id, ns.payload), 200
 
+        except ValueError as e:
+            abort(400, str(e))
         except Exception as e:
             abort(404, str(e))
 
 
     @requires_auth
+    @rate_limit('delete')
     @ns.response(204, 'Link deleted')
     @ns.response(404, 'Link not found.')
     @ns.expect(get_parser, validate=True)
@@ -107,9 +169,11 @@ class LinkResource(Resource):
 @ns.route('/<string:id>/clicks', endpoint='link_clicks')
 @ns.response(500, 'Link error.')
 @ns.response(401, 'Not Authorized.')
+@ns.response(429, 'Rate limit or daily quota exceeded.')
 class ClickListResource(Resource):
 
     @requires_auth
+    @rate_limit('clicks')
     @ns.response(404, 'Link not found.')
     @ns.expect(click_parser, validate=True)
     @ns.marshal_list_with(click_object, code=200, description='Link list')
@@ -119,30 +183,59 @@ class ClickListResource(Resource):
         """
 
         try:
-            return ops.get_clicks(id, request.args), 200
+            results = ops.get_clicks(id, request.args)
+            return results, 200, cursor_headers(CLICKS, results, request.args)
 
+        except InvalidCursorError as e:
+            abort(400, str(e))
         except Exception as e:
             abort(404, str(e))
 
 
-@ns.route('/<short_link>/', defaults={'varargs': None})
-@ns.route('/<short_link>/<path:varargs>')
-class RedirectResource(Resource):
+@ns.route('/<string:id>/stats', endpoint='link_stats')
+@ns.response(500, 'Link error.')
+@ns.response(401, 'Not Authorized.')
+@ns.response(429, 'Rate limit or daily quota exceeded.')
+class LinkStatsResource(Resource):
 
-    def redirect_short_link(short_link, varargs):
+    @requires_auth
+    @rate_limit('stats')
+    @ns.response(404, 'Link not found.')
+    @ns.expect(stats_parser, validate=True)
+    @ns.marshal_with(stats_object, code=200, description='Click analytics')
+    def get(self, id):
         """
-        Main Redirect 
+        Returns a Link's click time series and top referrers, user agents and args.
         """
 
         try:
-            target = ops.get_redirect_target(
-                short_link,
-                request.url,
-                varargs
-            )
-        except ops.LinkNotFoundError as e:
+            return ops.get_stats(id, request.args), 200
+
+        except ValueError as e:
+            abort(400, str(e))
+        except Exception as e:
             abort(404, str(e))
-        except ops.LinkExpiredError as e:
-            abort(410, str(e))
 
-        return redirect(target)
\ No newline at end of file
+
+@ns.route('/<string:id>/visitors', endpoint='link_visitors')
+@ns.response(401, 'Not Authorized.')
+@ns.response(429, 'Rate limit or daily quota exceeded.')
+class LinkVisitorsResource(Resource):
+
+    @requires_auth
+    @rate_limit('visitors')
+    @ns.response(404, 'Link not found.')
+    @ns.expect(visitors_parser, validate=True)
+    @ns.marshal_with(visitors_object, code=200, description='Approximate audience')
+    def get(self, id):
+        """
+        Returns a Link's estimated unique visitors and heaviest referrers and user agents.
+        """
+
+        try:
+            return ops.get_visitors(id, request.args), 200
+
+        except ValueError as e:
+            abort(400, str(e))
+        except Exception as e:
+            abort(404, str(e))
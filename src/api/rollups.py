@@ -0,0 +1,169 @@
+# SPDX-License-Identifier: MIT
+# Copyright (c) 2025 Scott Joiner
+
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+from pymongo import UpdateOne
+
+from src import settings
+from .extensions import mongo
+
+MINUTE = 'minute'
+HOUR = 'hour'
+DAY = 'day'
+
+GRANULARITIES = {
+    MINUTE: timedelta(minutes=1),
+    HOUR: timedelta(hours=1),
+    DAY: timedelta(days=1),
+}
+
+# Default reporting window per granularity
+DEFAULT_WINDOWS = {
+    MINUTE: timedelta(hours=1),
+    HOUR: timedelta(days=1),
+    DAY: timedelta(days=30),
+}
+
+# Referrer, user agent and argument breakdowns are only kept on these buckets
+_BREAKDOWN = (HOUR, DAY)
+
+REFERRER = 'referrer'
+AGENT = 'agent'
+ARG = 'arg'
+
+_MAX_KEY = 200
+
+
+def _as_utc(dt):
+    return dt.replace(tzinfo=timezone.utc) if dt.tzinfo is None else dt.astimezone(timezone.utc)
+
+
+def bucket_start(when, granularity):
+    when = _as_utc(when)
+    if granularity == MINUTE:
+        return when.replace(second=0, microsecond=0)
+    if granularity == HOUR:
+        return when.replace(minute=0, second=0, microsecond=0)
+    return when.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _retention(granularity):
+    days = {
+        MINUTE: settings.ROLLUP_MINUTE_RETENTION_DAYS,
+        HOUR: settings.ROLLUP_HOUR_RETENTION_DAYS,
+        DAY: settings.ROLLUP_DAY_RETENTION_DAYS,
+    }[granularity]
+    return timedelta(days=days) if days else None
+
+
+def _expires(granularity, ts):
+    retention = _retention(granularity)
+    return {'$setOnInsert': {'expires': ts + GRANULARITIES[granularity] + retention}} if retention else {}
+
+
+def rollup_updates(clicks):
+    """
+    Fold a batch of clicks into one $inc upsert per (link, granularity, bucket)
+    """
+    buckets = Counter()
+    for click in clicks:
+        for granularity in GRANULARITIES:
+            buckets[(click['url_id'], granularity, bucket_start(click['clicked'], granularity))] += 1
+
+    return [
+        UpdateOne(
+            {'url_id': url_id, 'g': granularity, 'ts': ts},
+            {'$inc': {'count': count}, **_expires(granularity, ts)},
+            upsert=True
+        )
+        for (url_id, granularity, ts), count in buckets.items()
+    ]
+
+
+def _breakdown_values(click):
+    yield REFERRER, click.get('referrer') or '(direct)'
+    yield AGENT, click.get('user_agent') or '(unknown)'
+    # Path arguments are chosen by whoever requests the link, so only the
+    # positions listed in ROLLUP_ARG_POSITIONS are counted
+    args = click.get('args') or []
+    for position in settings.ROLLUP_ARG_POSITIONS:
+        if position < len(args):
+            yield ARG, f'{position}:{args[position]}'
+
+
+def breakdown_updates(clicks):
+    """
+    One $inc upsert per (link, granularity, bucket, kind, value) into
+    click_breakdowns. Each value is its own small document, so no number of
+    distinct referrers, user agents or arguments can grow a document
+    towards MongoDB's size limit.
+    """
+    counts = Counter()
+    for click in clicks:
+        for granularity in _BREAKDOWN:
+            ts = bucket_start(click['clicked'], granularity)
+            for kind, value in _breakdown_values(click):
+                counts[(click['url_id'], granularity, ts, kind, str(value)[:_MAX_KEY])] += 1
+
+    return [
+        UpdateOne(
+            {'url_id': url_id, 'g': granularity, 'ts': ts, 'k': kind, 'v': value},
+            {'$inc': {'n': count}, **_expires(granularity, ts)},
+            upsert=True
+        )
+        for (url_id, granularity, ts, kind, value), count in counts.items()
+    ]
+
+
+def _top(counter, limit):
+    return [{'value': k, 'count': v} for k, v in counter.most_common(limit)]
+
+
+def link_stats(url_id, granularity=HOUR, start=None, end=None, top=10):
+    """
+    Time series and top referrers/user agents/args for one link, read from
+    the rollup buckets rather than raw clicks
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f'Unknown granularity: {granularity}')
+
+    end = _as_utc(end) if end else datetime.now(timezone.utc)
+    start = _as_utc(start) if start else end - DEFAULT_WINDOWS[granularity]
+
+    series = [
+        {'ts': doc['ts'], 'count': doc.get('count', 0)}
+        for doc in mongo.db.click_rollups.find(
+            {'url_id': url_id, 'g': granularity,
+             'ts': {'$gte': bucket_start(start, granularity), '$lte': end}},
+            {'ts': 1, 'count': 1, '_id': 0}
+        ).sort('ts', 1)
+    ]
+
+    # Breakdowns come from the finest bucket that carries them
+    source = DAY if granularity == DAY else HOUR
+    match = {'url_id': url_id, 'g': source, 'ts': {'$gte': bucket_start(start, source), '$lte': end}}
+    totals = {REFERRER: Counter(), AGENT: Counter(), ARG: Counter()}
+    for doc in mongo.db.click_breakdowns.aggregate([
+        {'$match': match},
+        {'$group': {'_id': {'k': '$k', 'v': '$v'}, 'n': {'$sum': '$n'}}},
+    ], allowDiskUse=True):
+        totals[doc['_id']['k']][doc['_id']['v']] += doc['n']
+
+    top_args = []
+    for value, count in totals[ARG].most_common(top):
+        position, _, value = value.partition(':')
+        top_args.append({'position': int(position), 'value': value, 'count': count})
+
+    return {
+        'url_id': url_id,
+        'granularity': granularity,
+        'start': start,
+        'end': end,
+        'total': sum(point['count'] for point in series),
+        'series': series,
+        'top_referrers': _top(totals[REFERRER], top),
+        'top_user_agents': _top(totals[AGENT], top),
+        'top_args': top_args,
+    }
@@ -0,0 +1,92 @@
+# SPDX-License-Identifier: MIT
+# Copyright (c) 2025 Scott Joiner
+
+import re
+from urllib.parse import urlsplit
+
+import click
+from pymongo import UpdateOne
+
+from .extensions import mongo, links_cli
+
+# Something like example.com or sub.example.co.uk, without a scheme or path
+_HOSTNAME = re.compile(r'^(?=.{1,253}$)([a-z0-9-]{1,63}\.)+[a-z0-9-]{1,63}$', re.IGNORECASE)
+_SCHEME = re.compile(r'^[a-z][a-z0-9+.-]*://', re.IGNORECASE)
+
+
+def normalize_tags(tags):
+    """
+    Lowercased, trimmed, de-duplicated tags so they match with an indexed $in
+    """
+    out = []
+    for tag in tags or []:
+        tag = (tag or '').strip().lower()
+        if tag and tag not in out:
+            out.append(tag)
+    return out
+
+
+def extract_host(url):
+    """
+    Lowercased host of a redirect URL, stored alongside it at write time
+    """
+    if not url:
+        return None
+    try:
+        return urlsplit(url).hostname
+    except ValueError:
+        return None
+
+
+def url_query(url):
+    """
+    Pick the cheapest indexed query for a url search term:
+    a full URL is matched as an anchored prefix of redirect_url,
+    a bare hostname on the extracted host, anything else with $text
+    """
+    url = url.strip()
+    if _SCHEME.match(url):
+        return {'redirect_url': {'$regex': '^' + re.escape(url)}}
+    if _HOSTNAME.match(url):
+        return {'host': url.lower()}
+    return {'$text': {'$search': url}}
+
+
+def tags_query(tags, match_all=False):
+    tags = normalize_tags(tags)
+    if not tags:
+        return {}
+    return {'tags': {'$all' if match_all else '$in': tags}}
+
+
+def backfill_search_fields(db, batch_size=1000):
+    """
+    Normalize tags and extract hosts on links written before they were
+    maintained at write time. Returns the number of links updated.
+    """
+    updated = 0
+    ops = []
+    for link in db.links.find({}, {'redirect_url': 1, 'tags': 1, 'host': 1}):
+        changes = {}
+        tags = normalize_tags(link.get('tags'))
+        if tags != (link.get('tags') or []):
+            changes['tags'] = tags
+        host = extract_host(link.get('redirect_url'))
+        if host != link.get('host'):
+            changes['host'] = host
+        if changes:
+            ops.append(UpdateOne({'_id': link['_id']}, {'$set': changes}))
+        if len(ops) >= batch_size:
+            updated += db.links.bulk_write(ops, ordered=False).modified_count
+            ops = []
+    if ops:
+        updated += db.links.bulk_write(ops, ordered=False).modified_count
+    return updated
+
+
+@links_cli.command('backfill-search')
+def backfill_search_command():
+    """
+    Normalize tags and extract hosts on existing links.
+    """
+    click.echo(f'{backfill_search_fields(mongo.db)} links updated')
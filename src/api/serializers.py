@@ -1,7 +1,11 @@
 # SPDX-License-Identifier: MIT
 # Copyright (c) 2025 Scott Joiner
 
+import math
+
 from flask_restx import fields
+
+from src import settings
 from .extensions import ns
 
 new_link_request = ns.model('Minification Request', {
@@ -63,7 +67,8 @@ update_link_request = ns.model('Update Link Request', {
 
 _link_hateoas = ns.model('LinkHateoas', {
     'self':   fields.String(description='This resource’s URL'),
-    'clicks': fields.String(description='URL to fetch click list')
+    'clicks': fields.String(description='URL to fetch click list'),
+    'stats':  fields.String(description='URL to fetch click analytics')
 })
 
 link_object = ns.model('Link', {
@@ -82,6 +87,10 @@ link_object = ns.model('Link', {
     '_links':       fields.Nested(_link_hateoas, attribute='_links')
 })
 
+created_link_object = ns.clone('Created Link', link_object, {
+    'status': fields.String(description='created, reassigned (requested short_link was taken), skipped, invalid (bad redirect_url template) or failed')
+})
+
 click_object = ns.model('Click', {
     'id':          fields.String(attribute='_id'),
     'url_id':      fields.String(),
@@ -91,4 +100,51 @@ click_object = ns.model('Click', {
     'ip_address':  fields.String(),
     'user_agent':  fields.String(),
     'referrer':    fields.String(),
-})
\ No newline at end of file
+})
+
+_stats_point = ns.model('StatsPoint', {
+    'ts':    fields.DateTime(description='Start of the bucket'),
+    'count': fields.Integer(),
+})
+
+_stats_top = ns.model('StatsTop', {
+    'value': fields.String(),
+    'count': fields.Integer(),
+})
+
+_stats_top_arg = ns.inherit('StatsTopArg', _stats_top, {
+    'position': fields.Integer(description='Zero based position of the URL argument'),
+})
+
+stats_object = ns.model('Stats', {
+    'url_id':          fields.String(),
+    'granularity':     fields.String(),
+    'start':           fields.DateTime(),
+    'end':             fields.DateTime(),
+    'total':           fields.Integer(),
+    'series':          fields.List(fields.Nested(_stats_point)),
+    'top_referrers':   fields.List(fields.Nested(_stats_top)),
+    'top_user_agents': fields.List(fields.Nested(_stats_top)),
+    'top_args':        fields.List(fields.Nested(_stats_top_arg)),
+})
+
+_visitors_day = ns.model('VisitorsDay', {
+    'day':             fields.DateTime(),
+    'unique_visitors': fields.Integer(),
+})
+
+_heavy_hitter = ns.inherit('HeavyHitter', _stats_top, {
+    'error': fields.Integer(description='Upper bound on how far count may overestimate'),
+})
+
+visitors_object = ns.model('Visitors', {
+    'url_id':          fields.String(),
+    'start':           fields.DateTime(),
+    'end':             fields.DateTime(),
+    'unique_visitors': fields.Integer(
+        description=f'Estimated, about {104 / math.sqrt(2 ** settings.SKETCH_HLL_PRECISION):.1f}% standard error'
+    ),
+    'days':            fields.List(fields.Nested(_visitors_day)),
+    'top_referrers':   fields.List(fields.Nested(_heavy_hitter)),
+    'top_user_agents': fields.List(fields.Nested(_heavy_hitter)),
+})
@@ -1,48 +1,57 @@
 # SPDX-License-Identifier: MIT
 # Copyright (c) 2025 Scott Joiner
 
-import hashlib
 import logging
 from typing import Optional
+from src import settings
 from src.celery_app import celery
 
 from datetime import datetime, timezone
 from dateutil.parser import parse
+from bson import json_util
 from bson.objectid import ObjectId
-from pymongo.errors import DuplicateKeyError
+from pymongo.errors import DuplicateKeyError, BulkWriteError
 from flask_restx import marshal
 from flask import request
 
 from .extensions import mongo, LinkNotFoundError, LinkExpiredError
+from .cache import link_cache, MISSING
+from .invalidation import invalidation_bus
+from .shared_cache import shared_link_cache
+from .clicks import click_buffer
+from .expiry import is_expired
+from .metrics import mongo_operation
+from .allocators import short_link_allocator
+from .pagination import decode_cursor, LINKS, CLICKS
+from .templates import compile_template, compile_stored, TemplateError
+from .search import normalize_tags, extract_host, url_query, tags_query
+from .partitions import find_clicks
+from .ratelimit import rate_limiter
+from .rollups import link_stats
+from .sketches import link_audience
 from .serializers import new_link_request, update_link_request
-from .tasks import send_click_webhook
+from .webhooks import queue_click_webhook
 
 log = logging.getLogger(__name__)
 
-def generate_short_link():
-    """
-    Generate a potential short_link candidate using a new ObjectId and MD5.
-    Iterates through candidate lengths from 5 to 11.
-    """
-    new_id = ObjectId()
-    id_string = str(new_id).encode('utf-8')
-    for i in range(5, 12):
-        yield hashlib.md5(id_string).hexdigest()[:i]
-
-
+@mongo_operation
 def insert_unique_short_link(url_data):
     """
     Atomic insert leveraging mongoDB's atomicity and unique index inforcement
     """
     generate_link = not url_data.get('short_link')
     max_attempts = 5 if generate_link else 1
-    
+    candidates = short_link_allocator.candidates()
+
     for _ in range(max_attempts):
         if (generate_link):
-            candidate = next(generate_short_link()) 
-            url_data['short_link'] = candidate
+            # With a counter allocator, retries only happen when a custom link took the code
+            url_data['short_link'] = next(candidates)
         try:
             mongo.db.links.insert_one(url_data)
+            # Replace any cached miss for the code we just claimed
+            shared_link_cache.set(url_data)
+            invalidation_bus.publish(url_data['short_link'])
             return
         except DuplicateKeyError:
             continue
@@ -57,37 +66,194 @@ def create_link(data):
 
    # Get a dictionary
     links = marshal(data, new_link_request, ordered=True)
-    
+
+    return insert_links(links, request.decoded_token.get('sub'))
+
+
+@mongo_operation
+def insert_links(links, owner):
+    """
+    Bulk insert links with a single availability query and an unordered
+    insert_many. Each link gets a 'status' of created, reassigned (its
+    custom short_link was taken), skipped (no redirect_url), invalid
+    (redirect_url is not a valid template) or failed.
+    """
+
+    now = datetime.now(timezone.utc)
+    pending = []
+    status = {}
+
     for link in links:
 
         # If they haven't provied a url, just move on
         if not link.get('redirect_url'):
+            link['status'] = 'skipped'
+            continue
+
+        # Reject templates that could never render
+        try:
+            compile_template(link['redirect_url'])
+        except TemplateError as ex:
+            log.warning(str(ex))
+            link['status'] = 'invalid'
             continue
 
         # Add some data
-        now = datetime.now(timezone.utc)
         link['created'] = now
         link['updated'] = now
         link['expiration'] = None if not link['expiration'] else parse(link['expiration'])
-        link['owner'] =  request.decoded_token.get('sub')
+        link['owner'] = owner
         link['click_count'] = 0
+        link['tags'] = normalize_tags(link.get('tags'))
+        link['host'] = extract_host(link['redirect_url'])
+        pending.append(link)
+
+    # Check every custom short_link in one query
+    requested = [link['short_link'] for link in pending if link.get('short_link')]
+    taken = set()
+    if requested:
+        found = mongo.db.links.find({'short_link': {'$in': requested}}, {'short_link': 1, '_id': 0})
+        taken = {doc['short_link'] for doc in found}
+
+    for link in pending:
+        code = link.get('short_link')
+        if not code:
+            continue
+        if code in taken:
+            log.warning(f"Requested short link {code} is not available. Defaulting to generated link")
+            # Conflict: Remove provided short_link to generate a new one.
+            link.pop('short_link', None)
+            status[id(link)] = 'reassigned'
+        else:
+            # Later duplicates in the same request conflict with this one
+            taken.add(code)
+
+    # Pre-allocate generated codes in one lease
+    generated = [link for link in pending if not link.get('short_link')]
+    for link, code in zip(generated, short_link_allocator.allocate(len(generated))):
+        link['short_link'] = code
+
+    failed = []
+    if pending:
+        try:
+            mongo.db.links.insert_many(pending, ordered=False)
+        except BulkWriteError as ex:
+            failed = [(pending[e['index']], e) for e in ex.details['writeErrors']]
+
+    # Only rows that lost a race for their short_link go through the retry path
+    generated_ids = {id(link) for link in generated}
+    for link, error in failed:
+        if error['code'] != 11000:
+            log.error(f"Failed to insert link {link.get('short_link')}: {error.get('errmsg')}")
+            status[id(link)] = 'failed'
+            continue
 
-        # If they passed us a custom short_link, try to use it
-        if link.get('short_link'):
-            if mongo.db.links.find_one({'short_link': link['short_link']}):
-                log.warning(f"Requested short link {link['short_link']} is not available. Defaulting to generated link")
-                # Conflict: Remove provided short_link to generate a new one.
-                link.pop('short_link', None)
-            
-        # Can this be feactored to insert_many?
+        # A custom link claimed concurrently gets a generated one instead
+        if id(link) not in generated_ids:
+            status[id(link)] = 'reassigned'
+        link.pop('short_link')
         try:
             insert_unique_short_link(link)
         except Exception as ex:
             log.error(str(ex))
+            status[id(link)] = 'failed'
+
+    # Retried rows were already written through by insert_unique_short_link
+    retried = {id(link) for link, _ in failed}
+    inserted = [link for link in pending if id(link) not in retried]
+    shared_link_cache.set_many(inserted)
+    invalidation_bus.publish(*[link['short_link'] for link in inserted])
+
+    for link in pending:
+        link['status'] = status.get(id(link), 'created')
+        if link['status'] == 'failed':
+            link.pop('_id', None)
 
     return links
 
 
+@mongo_operation
+def import_links(stream, owner, chunk_size=None):
+    """
+    Import newline delimited JSON link requests in chunks, yielding one
+    NDJSON progress line per chunk. Memory use is bounded by the chunk size.
+    """
+
+    chunk_size = chunk_size or settings.BULK_CHUNK_SIZE
+    totals = {'received': 0, 'created': 0, 'reassigned': 0, 'skipped': 0, 'failed': 0, 'invalid': 0}
+    chunk, errors, number = [], [], 0
+
+    def flush(chunk, errors):
+        counts = dict.fromkeys(totals, 0)
+        counts['received'] = len(chunk) + len(errors)
+        counts['invalid'] = len(errors)
+
+        # Imports count against the same daily quota as POST /links
+        charged, now = 0, datetime.now(timezone.utc)
+        if chunk and settings.RATELIMIT_ENABLED and settings.LINK_DAILY_QUOTA:
+            if rate_limiter.consume_quota(owner, settings.LINK_DAILY_QUOTA, len(chunk), now=now).allowed:
+                charged = len(chunk)
+            else:
+                counts['failed'] = len(chunk)
+                errors += [{'line': line, 'message': 'daily link quota exceeded'} for line, _ in chunk]
+                chunk = []
+
+        links = marshal([data for _, data in chunk], new_link_request, ordered=True)
+        try:
+            links = insert_links(links, owner)
+        finally:
+            # Only links actually created are charged
+            created = sum(1 for link in links if link.get('status') in ('created', 'reassigned'))
+            if charged:
+                rate_limiter.refund_quota(owner, charged - created, now=now)
+
+        for (line, _), link in zip(chunk, links):
+            counts[link['status']] += 1
+            if link['status'] == 'failed':
+                errors.append({'line': line, 'message': 'insert failed'})
+            elif link['status'] == 'invalid':
+                errors.append({'line': line, 'message': 'invalid redirect_url template'})
+        for key, value in counts.items():
+            totals[key] += value
+        return json_util.dumps({'chunk': number, **counts, 'errors': errors, 'totals': totals}) + '\n'
+
+    for line, raw in enumerate(stream, start=1):
+        if not raw.strip():
+            continue
+        try:
+            data = json_util.loads(raw)
+            if not isinstance(data, dict):
+                raise ValueError('expected a JSON object')
+            chunk.append((line, data))
+        except ValueError as ex:
+            errors.append({'line': line, 'message': str(ex)})
+
+        if len(chunk) + len(errors) >= chunk_size:
+            number += 1
+            yield flush(chunk, errors)
+            chunk, errors = [], []
+
+    if chunk or errors:
+        number += 1
+        yield flush(chunk, errors)
+
+
+@mongo_operation
+def export_links(batch_size=None):
+    """
+    Stream every link as newline delimited (relaxed extended) JSON from a
+    server side cursor
+    """
+
+    cursor = mongo.db.links.find({}, batch_size=batch_size or settings.BULK_CHUNK_SIZE).sort('_id', 1)
+    try:
+        for doc in cursor:
+            yield json_util.dumps(doc) + '\n'
+    finally:
+        cursor.close()
+
+
+@mongo_operation
 def update_link(url_id, data):
     """
     Update a minified URL in the database.
@@ -109,15 +275,22 @@ def update_link(url_id, data):
         '$set': {}
     }
 
-    # List of fields to update directly
-    fields = ['url', 'expiration', 'web_hook', 'tags']
+    # List of fields to update directly, when present in the request
+    fields = ['redirect_url', 'expiration', 'web_hook', 'tags']
 
     for field in fields:
-        if field in validated_data:
+        if field in data:
             updates['$set'][field] = validated_data[field]
 
+    # Keep the search fields in step
+    if 'tags' in updates['$set']:
+        updates['$set']['tags'] = normalize_tags(updates['$set']['tags'])
+    if 'redirect_url' in updates['$set']:
+        compile_template(updates['$set']['redirect_url'])
+        updates['$set']['host'] = extract_host(updates['$set']['redirect_url'])
+
     # Process expiration field with additional parsing logic
-    if 'expiration' in validated_data:
+    if 'expiration' in data:
         updates['$set']['expiration'] = (
             parse(validated_data['expiration'])
             if validated_data['expiration'] else None
@@ -127,20 +300,26 @@ def update_link(url_id, data):
     mongo.db.links.update_one({"_id": ObjectId(url_id)}, updates)
 
     # Retrieve and return the updated document, raising an error if not found.
-    return mongo.db.links.find_one_or_404({"_id": ObjectId(url_id)})
+    link = mongo.db.links.find_one_or_404({"_id": ObjectId(url_id)})
+    shared_link_cache.set(link)
+    invalidation_bus.publish(url_id, link.get('short_link'))
+    return link
 
+@mongo_operation
 def delete_link(id):
     """
     Deletes a link if it exists
     """
 
-    mongo.db.links.find_one_or_404({"_id": ObjectId(id)})
+    link = mongo.db.links.find_one_or_404({"_id": ObjectId(id)})
     mongo.db.links.delete_one({"_id": ObjectId(id)})
+    shared_link_cache.delete(id, link.get('short_link'))
+    invalidation_bus.publish(id, link.get('short_link'))
 
      
-def find_one(id):
+def link_filter(id):
     """
-    Locate a minified url in the database
+    Build a query matching a link by ObjectId or short_link
     """
 
     # Dynamically buld the filter
@@ -151,9 +330,45 @@ def find_one(id):
     else:
         s['short_link'] = id
 
-    return mongo.db.links.find_one_or_404(s)
+    return s
 
 
+@mongo_operation
+def find_one(id):
+    """
+    Locate a minified url in the database
+    """
+
+    return shared_link_cache.load(
+        id,
+        lambda: mongo.db.links.find_one_or_404(link_filter(id))
+    )
+
+
+@mongo_operation
+def find_cached(id):
+    """
+    Locate a link for redirection, going through the in-process link cache
+    and then the shared cache. Returns None if the link does not exist.
+    """
+
+    link = link_cache.get(id)
+    if link is not MISSING:
+        return link
+
+    link = shared_link_cache.load(
+        id,
+        lambda: mongo.db.links.find_one(link_filter(id))
+    )
+    if link:
+        link_cache.put(link)
+    else:
+        link_cache.put_missing(id)
+
+    return link
+
+
+@mongo_operation
 def search(args):
     """
     Search for url in the database
@@ -163,19 +378,30 @@ def search(args):
     tags = args.getlist('tag')
     max = int(args.get('max') or 20)
     page = int(args.get('page') or 0) * max
+    cursor = args.get('cursor')
 
     # Dynamically build the query
     s = {}
 
-    if len(tags):
-        s['tags'] = {"$regex": "|".join(tags), "$options": "i"}
+    # Normalized tags match on the tags index; the url planner picks
+    # a prefix, host or text index depending on the search term
+    s.update(tags_query(tags, match_all=args.get('tag_match') == 'all'))
 
     if url:
-        s['url'] = {"$text": {'$search' :url}}
-    
-    return [x for x in mongo.db.links.find(s).skip(page).limit(max)]
+        s.update(url_query(url))
 
+    # A cursor resumes after the last _id seen instead of skipping pages
+    if cursor:
+        s['_id'] = {'$gt': decode_cursor(LINKS, cursor)['_id']}
 
+    results = mongo.db.links.find(s).sort('_id', 1)
+    if not cursor:
+        results = results.skip(page)
+
+    return [x for x in results.limit(max)]
+
+
+@mongo_operation
 def get_clicks(id, args):
     """
     Click Reporting
@@ -184,6 +410,9 @@ def get_clicks(id, args):
     tags = args.getlist('args')
     max = int(args.get('max') or 20)
     page = int(args.get('page') or 0) * max
+    cursor = args.get('cursor')
+    start = args.get('start')
+    end = args.get('end')
 
     url_object = find_one(id)
 
@@ -196,58 +425,132 @@ def get_clicks(id, args):
     if len(tags):
         s['args'] = {"$regex": "|".join(tags), "$options": "i"}
 
+    # Only the monthly partitions overlapping the range are queried; a link
+    # has no clicks before it was created. A cursor resumes after the last
+    # (clicked, _id) seen instead of skipping pages.
+    return find_clicks(
+        mongo.db,
+        s,
+        start=parse(start) if start else url_object.get('created'),
+        end=parse(end) if end else None,
+        after=decode_cursor(CLICKS, cursor) if cursor else None,
+        skip=0 if cursor else page,
+        limit=max
+    )
+
+@mongo_operation
+def get_stats(id, args):
+    """
+    Click Analytics from the pre-aggregated rollups
+    """
+
+    url_object = find_one(id)
+    start = args.get('start')
+    end = args.get('end')
+
+    return link_stats(
+        url_object['_id'],
+        granularity=args.get('granularity') or 'hour',
+        start=parse(start) if start else None,
+        end=parse(end) if end else None,
+        top=int(args.get('top') or 10)
+    )
+
+@mongo_operation
+def get_visitors(id, args):
+    """
+    Unique Visitors and top referrers/user agents from the daily sketches
+    """
+
+    url_object = find_one(id)
+    start = args.get('start')
+    end = args.get('end')
 
-    return [x for x in mongo.db.clicks.find(s).skip(page).limit(max)]
+    return link_audience(
+        url_object['_id'],
+        start=parse(start) if start else None,
+        end=parse(end) if end else None,
+        top=int(args.get('top') or 10)
+    )
 
-def add_link_click(link, requested_link, args):
+def client_info(req):
+    """
+    The parts of an incoming request recorded with each click
+    """
+    return {
+        'ip_address': req.remote_addr,
+        'user_agent': req.headers.get('User-Agent'),
+        'referrer':   req.headers.get('Referer'),
+    }
+
+
+def build_click(link, requested_link, args, client=None):
+    """
+    The click document recorded for one redirect
+    """
+    client = client or {}
+    return {
+        'url_id':       link['_id'],
+        'clicked':      datetime.now(timezone.utc),
+        'request_url':  requested_link,
+        'args':         args,
+        'ip_address':   client.get('ip_address'),
+        'user_agent':   client.get('user_agent'),
+        'referrer':     client.get('referrer'),
+    }
+
+
+def add_link_click(link, requested_link, args, client=None):
     """
     Click Tracking:
-    1) Increment click_count & set last_clicked on the link doc
-    2) Record a full click entry (with IP, UA, Referer)
+    1) Record a full click entry (with IP, UA, Referer from 'client')
+    2) Queue it for the click flusher, which persists it and bumps
+       click_count & last_clicked on the link doc in batches
     3) Fire off the webhook asynchronously
     """
     try:
-        # 1) Update link document: bump count & set last_clicked
-        updates = {
-            '$currentDate': {'last_clicked': True},
-            '$inc':         {'click_count': 1},
-        }
-        mongo.db.links.update_one({'_id': link['_id']}, updates)
-
-        # 2) Collect request context
-        click = {
-            'url_id':       link['_id'],
-            'clicked':      datetime.now(timezone.utc),
-            'request_url':  requested_link,
-            'args':         args,
-            'ip_address':   request.remote_addr,
-            'user_agent':   request.headers.get('User-Agent'),
-            'referrer':     request.headers.get('Referer'),
-        }
-              
+        # 1) Collect request context
+        click = build_click(link, requested_link, args, client)
+
+        # 2) Buffer the click; the flusher owns the copy
+        click_buffer.add(dict(click))
+
         # 3) Fire webhook task if configured
         webhook_url = link.get('web_hook')
         if webhook_url and webhook_url != 'https://test.com/webhook':
-            send_click_webhook.delay(webhook_url, click)
+            queue_click_webhook(webhook_url, click)
 
     except Exception as ex:
         log.exception("Error logging click: %s", ex)
 
 
-def get_redirect_target(short_link: str, request_url: str, varargs: Optional[str] = None) -> str:
+def get_redirect_target(short_link: str, request_url: str, varargs: Optional[str] = None,
+                        client: Optional[dict] = None) -> str:
+    """
+    Main Redirect Logic. Independent of any web framework: 'client' is
+    the client_info() of the incoming request.
+    """
+    link = check_redirectable(find_cached(short_link), short_link)
+
+    args = varargs.split("/") if varargs else []
+    add_link_click(link, request_url, args, client)
+
+    return redirect_url(link, args)
+
+
+def check_redirectable(link, short_link):
     """
-    Main Redirect Logic
+    Raise LinkNotFoundError or LinkExpiredError unless 'link' can be followed
     """
-    link = find_one(short_link)
     if not link:
         raise LinkNotFoundError(f"No link for {short_link}")
 
-    exp = link.get("expiration")
-    if exp and exp.date() < datetime.now(timezone.utc).date():
+    if is_expired(link):
         raise LinkExpiredError(f"Link {short_link} expired")
 
-    args = varargs.split("/") if varargs else []
-    add_link_click(link, request_url, args)
+    return link
+
 
-    # this will safely work even if there are no `{}` in the URL
-    return link["redirect_url"].format(*args)
\ No newline at end of file
+def redirect_url(link, args):
+    # Parsed once per distinct redirect_url, then a join per redirect
+    return compile_stored(link["redirect_url"]).render(args)
\ No newline at end of file
@@ -0,0 +1,154 @@
+# SPDX-License-Identifier: MIT
+# Copyright (c) 2025 Scott Joiner
+
+import logging
+import os
+import socket
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+
+from src import settings
+
+log = logging.getLogger(__name__)
+
+
+class _KeepAliveAdapter(HTTPAdapter):
+    """
+    HTTPAdapter that turns on TCP keep-alive for its pooled sockets
+    """
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs['socket_options'] = HTTPConnection.default_socket_options + [
+            (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        ]
+        super().init_poolmanager(*args, **kwargs)
+
+
+class SessionPool:
+    """
+    Per-host pooled requests sessions, owned by a single process.
+
+    Each destination host gets its own Session holding up to pool_size
+    persistent connections, so repeated webhook POSTs skip the TCP and TLS
+    handshakes. At most max_hosts sessions are kept; the least recently
+    used one is closed to make room. With a report_interval, each process
+    logs its connection reuse that often.
+    """
+
+    def __init__(self, pool_size, max_hosts, timeout, keep_alive=True, report_interval=0):
+        self.pool_size = pool_size
+        self.max_hosts = max_hosts
+        self.timeout = timeout
+        self.keep_alive = keep_alive
+        self.report_interval = report_interval
+        self._sessions = OrderedDict()
+        # Counts of sessions closed to make room
+        self._retired = {'requests': 0, 'connections': 0}
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._report_pid = None
+
+    def session_for(self, url):
+        host = self._host(url)
+        with self._lock:
+            # Connections must never be shared with a forked parent
+            if self._pid != os.getpid():
+                self._sessions.clear()
+                self._retired = {'requests': 0, 'connections': 0}
+                self._pid = os.getpid()
+            if self.report_interval and self._report_pid != os.getpid():
+                self._report_pid = os.getpid()
+                threading.Thread(target=self._report, name='webhook-pool-stats', daemon=True).start()
+
+            session = self._sessions.get(host)
+            if session is None:
+                session = self._sessions[host] = self._new_session()
+                while len(self._sessions) > self.max_hosts:
+                    evicted_host, evicted = self._sessions.popitem(last=False)
+                    for key, value in self._session_stats(evicted_host, evicted).items():
+                        self._retired[key] += value
+                    evicted.close()
+            self._sessions.move_to_end(host)
+            return session
+
+    def post(self, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        return self.session_for(url).post(url, **kwargs)
+
+    def stats(self):
+        """
+        Requests sent and connections opened per host. A ratio well above 1
+        means connections are being reused.
+        """
+        with self._lock:
+            sessions = list(self._sessions.items())
+
+        return {host: self._session_stats(host, session) for host, session in sessions}
+
+    def totals(self):
+        """
+        Requests sent and connections opened by this process, including
+        sessions that have since been evicted
+        """
+        totals = dict(self._retired)
+        for stats in self.stats().values():
+            for key, value in stats.items():
+                totals[key] += value
+        return totals
+
+    def log_stats(self):
+        for host, stats in self.stats().items():
+            log.info(f"Webhook connections to {host}: {stats['requests']} requests over {stats['connections']} connections")
+
+    def close(self):
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+
+    def _report(self):
+        while True:
+            time.sleep(self.report_interval)
+            try:
+                self.log_stats()
+            except Exception as ex:
+                log.warning(f'Unable to report webhook connection reuse: {ex}')
+
+    @staticmethod
+    def _session_stats(host, session):
+        pools = session.get_adapter(host).poolmanager.pools
+        conn_pools = [pools[key] for key in pools.keys()]
+        return {
+            'requests': sum(p.num_requests for p in conn_pools),
+            'connections': sum(p.num_connections for p in conn_pools),
+        }
+
+    def _new_session(self):
+        session = requests.Session()
+        adapter_class = _KeepAliveAdapter if self.keep_alive else HTTPAdapter
+        adapter = adapter_class(pool_connections=1, pool_maxsize=self.pool_size)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        if not self.keep_alive:
+            session.headers['Connection'] = 'close'
+        return session
+
+    @staticmethod
+    def _host(url):
+        parts = urlsplit(url)
+        return f'{parts.scheme}://{parts.netloc}'
+
+
+webhook_sessions = SessionPool(
+    settings.WEBHOOK_POOL_SIZE,
+    settings.WEBHOOK_POOL_MAX_HOSTS,
+    (settings.WEBHOOK_CONNECT_TIMEOUT, settings.WEBHOOK_READ_TIMEOUT),
+    keep_alive=settings.WEBHOOK_KEEP_ALIVE,
+    report_interval=settings.WEBHOOK_POOL_STATS_INTERVAL
+)
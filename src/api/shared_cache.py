@@ -0,0 +1,215 @@
+# SPDX-License-Identifier: MIT
+# Copyright (c) 2025 Scott Joiner
+
+import json
+import logging
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+from bson.objectid import ObjectId
+
+from src import settings
+from .extensions import get_redis
+from .cache import MISSING
+
+log = logging.getLogger(__name__)
+
+# Short field names used in the cached record
+_FIELDS = {
+    '_id': 'i',
+    'short_link': 's',
+    'redirect_url': 'u',
+    'web_hook': 'w',
+    'click_count': 'c',
+    'last_clicked': 'l',
+    'created': 'cr',
+    'updated': 'up',
+    'expiration': 'e',
+    'owner': 'o',
+    'tags': 't',
+    'host': 'h',
+}
+_KEYS = {v: k for k, v in _FIELDS.items()}
+
+# Stored for keys known not to exist
+_NOT_FOUND = b'-'
+
+
+def _encode_value(value):
+    if isinstance(value, ObjectId):
+        return {'$o': str(value)}
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return {'$d': int(value.timestamp() * 1000)}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict):
+        if '$o' in value:
+            return ObjectId(value['$o'])
+        if '$d' in value:
+            # Match PyMongo, which returns naive UTC datetimes
+            return datetime.fromtimestamp(value['$d'] / 1000, timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def dumps(link):
+    """
+    Serialize a link document into a compact JSON record
+    """
+    record = {_FIELDS.get(k, k): _encode_value(v) for k, v in link.items() if v is not None}
+    return json.dumps(record, separators=(',', ':'))
+
+
+def loads(data):
+    """
+    Rebuild a link document from a compact JSON record
+    """
+    return {_KEYS.get(k, k): _decode_value(v) for k, v in json.loads(data).items()}
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SharedLinkCache:
+    """
+    Second level link cache kept in Redis and shared by every worker.
+
+    Lookups are read-through: concurrent misses on the same key share one
+    loader call within a process, and a short Redis lock makes workers on
+    other processes wait for the first loader instead of querying MongoDB
+    themselves. Redis errors are treated as misses and pause the cache for
+    REDIS_RETRY_INTERVAL seconds.
+    """
+
+    def __init__(self, redis_factory, ttl, negative_ttl, lock_timeout, prefix='link:'):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.lock_timeout = lock_timeout
+        self.prefix = prefix
+        self._redis_factory = redis_factory
+        self._flights = {}
+        self._flights_lock = threading.Lock()
+        self._down_until = 0.0
+
+    def get(self, key):
+        """
+        Returns the cached document, None for a cached miss, or MISSING
+        """
+        data = self._call(lambda r: r.get(self.prefix + key))
+        if data is None:
+            return MISSING
+        if data == _NOT_FOUND:
+            return None
+        return loads(data)
+
+    def set(self, link):
+        self.set_many([link])
+
+    def set_many(self, links):
+        if not links:
+            return
+
+        def write(r):
+            pipe = r.pipeline(transaction=False)
+            for link in links:
+                data = dumps(link)
+                for key in self._keys(link):
+                    pipe.set(self.prefix + key, data, ex=self.ttl)
+            pipe.execute()
+        self._call(write)
+
+    def set_missing(self, key):
+        self._call(lambda r: r.set(self.prefix + key, _NOT_FOUND, ex=self.negative_ttl))
+
+    def delete(self, *keys):
+        keys = [self.prefix + str(k) for k in keys if k]
+        if keys:
+            self._call(lambda r: r.delete(*keys))
+
+    def load(self, key, loader):
+        """
+        Read-through lookup. The loader returns the document or None.
+        """
+        value = self.get(key)
+        if value is not MISSING:
+            return value
+
+        # Coalesce concurrent misses in this process
+        with self._flights_lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+
+        if not leader:
+            flight.done.wait()
+            if flight.error:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = self._load_locked(key, loader)
+            return flight.value
+        except Exception as ex:
+            flight.error = ex
+            raise
+        finally:
+            with self._flights_lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+    def _load_locked(self, key, loader):
+        lock_key = f'{self.prefix}lock:{key}'
+        token = uuid.uuid4().hex
+        locked = self._call(lambda r: r.set(lock_key, token, nx=True, px=int(self.lock_timeout * 1000)))
+
+        # Another process holds the lock: wait for it to fill the cache
+        if locked is False:
+            deadline = time.monotonic() + self.lock_timeout
+            while time.monotonic() < deadline:
+                time.sleep(0.01)
+                value = self.get(key)
+                if value is not MISSING:
+                    return value
+
+        try:
+            link = loader()
+            if link:
+                self.set(link)
+            else:
+                self.set_missing(key)
+            return link
+        finally:
+            if locked:
+                self._call(lambda r: r.delete(lock_key) if r.get(lock_key) == token.encode() else None)
+
+    def _call(self, op):
+        if self._down_until > time.monotonic():
+            return None
+        try:
+            return op(self._redis_factory())
+        except Exception as ex:
+            log.warning(f'Shared link cache unavailable: {ex}')
+            self._down_until = time.monotonic() + settings.REDIS_RETRY_INTERVAL
+            return None
+
+    @staticmethod
+    def _keys(link):
+        return [str(k) for k in (link.get('_id'), link.get('short_link')) if k]
+
+
+shared_link_cache = SharedLinkCache(
+    get_redis,
+    settings.LINK_REDIS_CACHE_TTL,
+    settings.LINK_REDIS_CACHE_NEGATIVE_TTL,
+    settings.LINK_REDIS_CACHE_LOCK_TIMEOUT
+)
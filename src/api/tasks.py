@@ -1,25 +1,52 @@
 # SPDX-License-Identifier: MIT
 # Copyright (c) 2025 Scott Joiner
 
+import logging
 import requests
+from src import settings
 from src.celery_app import celery
 from celery import Task
+from celery.signals import worker_process_init, worker_process_shutdown
+from .metrics import metrics_sync
+from .sessions import webhook_sessions
+
+log = logging.getLogger(__name__)
 
 class WebhookTask(Task):
     
-    # These need to be refactored into settings.py
     autoretry_for = (requests.RequestException,)
     retry_backoff = True          # exponential backoff
-    retry_backoff_max = 600       # cap backoff at 10m
+    retry_backoff_max = settings.WEBHOOK_RETRY_BACKOFF_MAX
     retry_jitter = True           # add some randomness
-    max_retries = 5
+    max_retries = settings.WEBHOOK_MAX_RETRIES
 
 @celery.task(base=WebhookTask, bind=True)
 def send_click_webhook(self, webhook_url: str, payload: dict):
     """
-    POSTs to a webhook URL.
+    POSTs to a webhook URL over a pooled keep-alive connection.
     Retries automatically on network errors up to max_retries.
     """
-    response = requests.post(webhook_url, json=payload, timeout=5)
+    response = webhook_sessions.post(webhook_url, json=payload)
+    response.raise_for_status()
+    return response.text
+
+@celery.task(base=WebhookTask, bind=True)
+def send_click_webhook_batch(self, webhook_url: str, payloads: list):
+    """
+    POSTs a batch of clicks to a webhook URL as a JSON array.
+    The whole batch is retried on network errors up to max_retries.
+    """
+    response = webhook_sessions.post(webhook_url, json=payloads)
     response.raise_for_status()
-    return response.text
\ No newline at end of file
+    return response.text
+
+@worker_process_init.connect
+def start_metrics_sync(**kwargs):
+    # Exports the webhook connection counters from this worker process
+    metrics_sync.ensure_started()
+
+@worker_process_shutdown.connect
+def log_webhook_connection_reuse(**kwargs):
+    metrics_sync.sync()
+    webhook_sessions.log_stats()
+    webhook_sessions.close()
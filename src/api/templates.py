@@ -0,0 +1,125 @@
+# SPDX-License-Identifier: MIT
+# Copyright (c) 2025 Scott Joiner
+
+"""
+Redirect URL templates. A redirect_url may contain positional slots filled
+from the short link's extra path segments:
+
+    https://example.com/{}/{}          auto numbered, like str.format
+    https://example.com/{1}?q={0}      explicit positions
+    https://example.com/{0|home}       'home' when the argument is missing
+
+Argument values are URL encoded for where the slot sits (path or query);
+defaults are inserted as written. Missing arguments without a default
+render as an empty string instead of raising IndexError.
+"""
+
+import logging
+import re
+from functools import lru_cache
+from string import Formatter
+from urllib.parse import quote, quote_plus
+
+log = logging.getLogger(__name__)
+
+
+class TemplateError(ValueError):
+    pass
+
+
+# Values made only of unreserved characters need no encoding, which is the common case
+_unreserved = re.compile(r'[A-Za-z0-9_.~-]*').fullmatch
+
+
+class RedirectTemplate:
+    """
+    A parsed template: the leading literal, then one (index, default,
+    in_query, following literal) tuple per slot
+    """
+
+    __slots__ = ('head', 'slots')
+
+    def __init__(self, head, slots):
+        self.head = head
+        self.slots = slots
+
+    def render(self, args):
+        if not self.slots:
+            return self.head
+
+        count = len(args)
+        out = [self.head]
+        append = out.append
+        for index, default, in_query, literal in self.slots:
+            value = args[index] if index < count else None
+            if not value:
+                append(default)
+            elif _unreserved(value):
+                append(value)
+            elif in_query:
+                append(quote_plus(value, safe=''))
+            else:
+                append(quote(value, safe=''))
+            append(literal)
+        return ''.join(out)
+
+
+@lru_cache(maxsize=4096)
+def compile_template(template):
+    """
+    Parse a redirect_url once; repeated calls with the same string are
+    served from the cache
+    """
+    literals = ['']
+    slots = []
+    auto, manual = 0, False
+    in_query = False
+
+    try:
+        parsed = list(Formatter().parse(template))
+    except ValueError as ex:
+        raise TemplateError(f'Invalid redirect template {template!r}: {ex}') from ex
+
+    for literal, field, spec, conversion in parsed:
+        literals[-1] += literal
+        in_query = in_query or '?' in literal
+        if field is None:
+            continue
+        if spec or conversion:
+            raise TemplateError(f'Format specs and conversions are not supported in {template!r}')
+
+        name, _, default = field.partition('|')
+        if name == '':
+            index, auto = auto, auto + 1
+        elif name.isdigit():
+            index, manual = int(name), True
+        else:
+            raise TemplateError(f'Slot {{{field}}} is not positional in {template!r}')
+        if auto and manual:
+            raise TemplateError(f'Cannot mix {{}} and numbered slots in {template!r}')
+
+        slots.append((index, default, in_query))
+        literals.append('')
+
+    return RedirectTemplate(
+        literals[0],
+        tuple(slot + (literal,) for slot, literal in zip(slots, literals[1:]))
+    )
+
+
+@lru_cache(maxsize=4096)
+def compile_stored(template):
+    """
+    compile_template() for a redirect_url read from the database. Links
+    saved before templates were validated may not parse; they redirect to
+    the URL as written, as they did before, and are logged once.
+    """
+    try:
+        return compile_template(template)
+    except TemplateError as ex:
+        log.warning(f'{ex}; redirecting to it unchanged')
+        return RedirectTemplate(template, ())
+
+
+def render(template, args):
+    return compile_template(template).render(args)
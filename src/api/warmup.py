@@ -0,0 +1,119 @@
+# SPDX-License-Identifier: MIT
+# Copyright (c) 2025 Scott Joiner
+
+import logging
+import os
+import threading
+import time
+
+from pymongo import DESCENDING
+
+from src import settings
+from .cache import link_cache
+from .extensions import mongo
+
+log = logging.getLogger(__name__)
+
+# Everything the redirect path reads from a link document
+WARMUP_PROJECTION = {'short_link': 1, 'redirect_url': 1, 'expiration': 1, 'web_hook': 1}
+WARMUP_SORT = [('click_count', DESCENDING), ('last_clicked', DESCENDING)]
+
+
+class LinkWarmup:
+    """
+    Loads the most clicked links into the in-process link cache when a
+    worker starts, with one projected query, so the first redirects after a
+    deploy do not all go to MongoDB. Stops after 'budget' seconds with
+    whatever has been loaded. Failures only mean a cold cache, so the
+    worker is reported ready either way.
+    """
+
+    def __init__(self, db_factory, cache, size, budget, clock=time.monotonic):
+        self.db_factory = db_factory
+        self.cache = cache
+        # Each link takes two cache entries, by _id and by short_link
+        self.size = min(size, cache.maxsize // 2)
+        self.budget = budget
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._pid = None
+        self._reset()
+
+    def _reset(self):
+        self.state = 'pending' if self.size > 0 else 'disabled'
+        self.loaded = 0
+        self.elapsed = 0.0
+        self._deadline = None
+
+    @property
+    def ready(self):
+        return self.current_state() not in ('pending', 'running')
+
+    def current_state(self):
+        # The budget also covers a query stuck waiting for the server
+        if self.state == 'running' and self._clock() >= self._deadline:
+            return 'timed_out'
+        return self.state
+
+    def status(self):
+        return {
+            'ready': self.ready,
+            'state': self.current_state(),
+            'loaded': self.loaded,
+            'target': self.size,
+            'elapsed': round(self.elapsed, 3),
+        }
+
+    def run(self):
+        if self.size <= 0:
+            return
+
+        started = self._clock()
+        deadline = self._deadline = started + self.budget
+        self.state = 'running'
+        try:
+            cursor = (
+                self.db_factory().links.find({}, WARMUP_PROJECTION)
+                .sort(WARMUP_SORT)
+                .limit(self.size)
+                .max_time_ms(int(self.budget * 1000))
+            )
+            with cursor:
+                for link in cursor:
+                    self.cache.put(link)
+                    self.loaded += 1
+                    if self._clock() >= deadline:
+                        self.state = 'timed_out'
+                        break
+                else:
+                    self.state = 'complete'
+        except Exception as ex:
+            log.warning(f'Link cache warmup failed after {self.loaded} links: {ex}')
+            self.state = 'failed'
+        finally:
+            self.elapsed = self._clock() - started
+
+        log.info(f'Link cache warmup {self.state}: {self.loaded} links in {self.elapsed:.2f}s')
+
+    def ensure_started(self):
+        """
+        Warm up once per process, in the background (safe to call per request)
+        """
+        if self._pid == os.getpid():
+            return
+
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            # A forked worker starts over with its own cache
+            self._reset()
+            threading.Thread(target=self.run, name='link-warmup', daemon=True).start()
+
+
+link_warmup = LinkWarmup(
+    lambda: mongo.db,
+    link_cache,
+    settings.LINK_WARMUP_SIZE,
+    settings.LINK_WARMUP_BUDGET
+)
@@ -0,0 +1,152 @@
+# SPDX-License-Identifier: MIT
+# Copyright (c) 2025 Scott Joiner
+
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+
+from src import settings
+from .extensions import get_redis
+from .metrics import WEBHOOK_ENQUEUE_LATENCY
+from .tasks import send_click_webhook, send_click_webhook_batch
+
+log = logging.getLogger(__name__)
+
+
+def webhook_payload(click):
+    """
+    JSON safe copy of a click document for webhook delivery
+    """
+    payload = dict(click)
+    payload['url_id'] = str(click['url_id'])
+    payload['clicked'] = click['clicked'].isoformat()
+    payload.pop('_id', None)
+    return payload
+
+
+class WebhookBatcher:
+    """
+    Accumulates click payloads per webhook URL and queues them as a single
+    batch task once the batch reaches max_size or has been open for window
+    seconds, whichever comes first.
+    """
+
+    def __init__(self, window, max_size, send):
+        self.window = window
+        self.max_size = max_size
+        self._send = send
+        self._batches = {}
+        self._cond = threading.Condition()
+        self._pid = None
+        self._stopped = False
+
+    def add(self, webhook_url, payload):
+        self.ensure_started()
+
+        with self._cond:
+            batch = self._batches.get(webhook_url)
+            if batch is None:
+                batch = self._batches[webhook_url] = (time.monotonic() + self.window, [])
+            batch[1].append(payload)
+            if len(batch[1]) >= self.max_size:
+                self._cond.notify_all()
+
+    def flush(self, force=False):
+        """
+        Queue every batch that is due (or all of them when forced)
+        """
+        now = time.monotonic()
+        with self._cond:
+            due = [
+                url for url, (deadline, payloads) in self._batches.items()
+                if force or deadline <= now or len(payloads) >= self.max_size
+            ]
+            ready = [(url, self._batches.pop(url)[1]) for url in due]
+
+        for url, payloads in ready:
+            for i in range(0, len(payloads), self.max_size):
+                try:
+                    self._send(url, payloads[i:i + self.max_size])
+                except Exception as ex:
+                    log.exception(f'Error queuing webhook batch for {url}: {ex}')
+
+    def ensure_started(self):
+        """
+        Start the flusher thread once per process
+        """
+        if self._pid == os.getpid():
+            return
+
+        with self._cond:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._stopped = False
+            threading.Thread(target=self._run, name='webhook-batcher', daemon=True).start()
+
+    def close(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        self.flush(force=True)
+
+    def _next_wakeup(self):
+        if not self._batches:
+            return self.window
+        return max(min(d for d, _ in self._batches.values()) - time.monotonic(), 0)
+
+    def _full(self):
+        return any(len(p) >= self.max_size for _, p in self._batches.values())
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._stopped or self._full(), self._next_wakeup())
+                if self._stopped:
+                    return
+            self.flush()
+
+
+def enqueue_async(webhook_url, payload):
+    """
+    Hand a delivery to the asyncio dispatcher (src.api.dispatcher)
+    """
+    get_redis().rpush(settings.WEBHOOK_QUEUE, json.dumps([webhook_url, payload]))
+
+
+def _send_batch(webhook_url, payloads):
+    if settings.WEBHOOK_ENGINE == 'async':
+        enqueue_async(webhook_url, payloads)
+    else:
+        send_click_webhook_batch.delay(webhook_url, payloads)
+
+
+webhook_batcher = WebhookBatcher(
+    settings.WEBHOOK_BATCH_WINDOW,
+    settings.WEBHOOK_BATCH_SIZE,
+    _send_batch
+)
+
+atexit.register(webhook_batcher.close)
+
+
+def queue_click_webhook(webhook_url, click):
+    """
+    Deliver a click to a webhook, batched when WEBHOOK_BATCH_ENABLED is set
+    and through the asyncio dispatcher when WEBHOOK_ENGINE is 'async'
+    """
+    payload = webhook_payload(click)
+    started = time.perf_counter()
+    if settings.WEBHOOK_BATCH_ENABLED:
+        webhook_batcher.add(webhook_url, payload)
+        engine = 'batch'
+    elif settings.WEBHOOK_ENGINE == 'async':
+        enqueue_async(webhook_url, payload)
+        engine = 'async'
+    else:
+        send_click_webhook.delay(webhook_url, payload)
+        engine = 'celery'
+    WEBHOOK_ENQUEUE_LATENCY.labels(engine).observe(time.perf_counter() - started)
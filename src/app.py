@@ -9,7 +9,12 @@ from flask_cors import CORS
 from flask_restx import Api
 
 from src import settings
-from src.api.extensions import mongo, ns as links_namespace
+from src.api import metrics, profiling
+from src.api.extensions import mongo, links_cli, ns as links_namespace
+from src.api.invalidation import invalidation_bus
+from src.api.indexes import provision_indexes
+from src.api.redirects import redirects
+from src.api.warmup import link_warmup
 #from werkzeug.middleware.proxy_fix import ProxyFix
 
 # logging
@@ -36,6 +41,24 @@ def create_app() -> Flask:
     # initialize Mongo on the Flask app
     mongo.init_app(app)
 
+    # request latency histograms and /metrics
+    metrics.init_app(app)
+
+    # sampled request profiling, only when PROFILE_ENABLED
+    profiling.init_app(app)
+
+    # subscribe this worker to link cache invalidations (once per process)
+    app.before_request(invalidation_bus.ensure_started)
+
+    # load the most clicked links before reporting ready (once per process)
+    link_warmup.ensure_started()
+    app.before_request(link_warmup.ensure_started)
+
+    # make sure the indexes the queries rely on exist
+    if settings.MONGO_ENSURE_INDEXES:
+        provision_indexes(mongo.db)
+    app.cli.add_command(links_cli)
+
     # instantiate a fresh Api *for this app*
     api = Api(
         version='1.0',
@@ -57,6 +80,9 @@ def create_app() -> Flask:
     api.add_namespace(links_namespace, path='/links')
     app.register_blueprint(bp)
 
+    # short link redirects, outside the Api
+    app.register_blueprint(redirects)
+
     return app
 
 app = create_app()
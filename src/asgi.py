@@ -0,0 +1,133 @@
+# SPDX-License-Identifier: MIT
+# Copyright (c) 2025 Scott Joiner
+
+"""
+ASGI redirect-only entry point. Each in-flight redirect is a coroutine
+rather than a worker thread, so one process can hold many thousands of
+concurrent redirects while MongoDB and Redis answer.
+
+    uvicorn src.asgi:app --workers 4
+"""
+
+import os
+import json
+import asyncio
+import logging.config
+from urllib.parse import quote
+
+from werkzeug.urls import iri_to_uri
+
+from src.api.extensions import LinkNotFoundError, LinkExpiredError
+from src.api.invalidation import invalidation_bus
+
+# logging
+logging.config.fileConfig( '%s/logging.conf' % os.path.dirname(os.path.abspath(__file__)))
+log = logging.getLogger(__name__)
+
+
+def _header(scope, name):
+    for key, value in scope['headers']:
+        if key == name:
+            return value.decode('latin-1')
+    return None
+
+
+def _request_url(scope):
+    host = _header(scope, b'host') or '%s:%s' % tuple(scope.get('server') or ('localhost', 80))
+    url = f"{scope.get('scheme', 'http')}://{host}{scope.get('root_path', '')}{scope['path']}"
+    if scope.get('query_string'):
+        url += '?' + scope['query_string'].decode('latin-1')
+    return url
+
+
+async def _send(send, status, headers=(), body=b''):
+    await send({'type': 'http.response.start', 'status': status, 'headers': list(headers)})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def _json(send, status, message):
+    body = json.dumps({'message': message}).encode()
+    await _send(send, status, [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())], body)
+
+
+def create_asgi_app(redirects_factory=None):
+    """
+    Build the ASGI callable. The redirect service is created at lifespan
+    startup, inside the worker's event loop.
+    """
+    state = {}
+
+    def factory():
+        from src.api.aio import AsyncRedirects
+        return AsyncRedirects()
+
+    redirects_factory = redirects_factory or factory
+    starting = asyncio.Lock()
+
+    async def start():
+        async with starting:
+            if 'redirects' not in state:
+                invalidation_bus.ensure_started()
+                redirects = redirects_factory()
+                await redirects.start()
+                state['redirects'] = redirects
+        return state['redirects']
+
+    async def lifespan(receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                try:
+                    await start()
+                except Exception as ex:
+                    log.exception('Redirect startup failed')
+                    await send({'type': 'lifespan.startup.failed', 'message': str(ex)})
+                    return
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                if 'redirects' in state:
+                    await state.pop('redirects').close()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def app(scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await lifespan(receive, send)
+        if scope['type'] != 'http':
+            return
+
+        if scope['method'] not in ('GET', 'HEAD'):
+            return await _json(send, 405, 'Method not allowed')
+
+        # /<short_link>/ or /<short_link>/<varargs>, like the Flask route.
+        # The server has already percent-decoded 'path'
+        short_link, slash, varargs = scope['path'].lstrip('/').partition('/')
+        if not short_link:
+            return await _json(send, 404, 'Not found')
+        if not slash:
+            location = (scope.get('raw_path') or quote(scope['path']).encode()) + b'/'
+            if scope.get('query_string'):
+                location += b'?' + scope['query_string']
+            return await _send(send, 308, [(b'location', location)])
+
+        client = {
+            'ip_address': (scope.get('client') or (None,))[0],
+            'user_agent': _header(scope, b'user-agent'),
+            'referrer':   _header(scope, b'referer'),
+        }
+        try:
+            # Servers running without lifespan events never send startup
+            redirects = state.get('redirects') or await start()
+            target = await redirects.redirect_target(short_link, _request_url(scope), varargs or None, client)
+        except LinkNotFoundError as e:
+            return await _json(send, 404, str(e))
+        except LinkExpiredError as e:
+            return await _json(send, 410, str(e))
+
+        # Percent-encode non-ASCII characters, as Werkzeug does for the Flask app
+        await _send(send, 302, [(b'location', iri_to_uri(target).encode('ascii')), (b'content-length', b'0')])
+
+    return app
+
+
+app = create_asgi_app()
@@ -0,0 +1,16 @@
+# SPDX-License-Identifier: MIT
+# Copyright (c) 2025 Scott Joiner
+
+"""
+gunicorn settings for multiprocess metrics. PROMETHEUS_MULTIPROC_DIR must
+point at an empty directory before gunicorn starts:
+
+    PROMETHEUS_MULTIPROC_DIR=/tmp/metrics gunicorn -c src/gunicorn_conf.py 'src.app:create_app()'
+"""
+
+from prometheus_client import multiprocess
+
+
+def child_exit(server, worker):
+    # Drop the live gauges (click buffer depth) of workers that have exited
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,61 @@
+# SPDX-License-Identifier: MIT
+# Copyright (c) 2025 Scott Joiner
+
+"""
+Redirect-only entry point: serves /<short_link>/<varargs> without the
+management API, RESTX or CORS so redirects can be scaled on their own.
+
+    gunicorn 'src.redirect_app:create_redirect_app()'
+"""
+
+import os
+import logging.config
+
+from flask import Flask
+
+from src import settings
+from src.api import metrics, profiling
+from src.api.extensions import mongo
+from src.api.invalidation import invalidation_bus
+from src.api.redirects import redirects
+from src.api.warmup import link_warmup
+
+# logging
+logging.config.fileConfig( '%s/logging.conf' % os.path.dirname(os.path.abspath(__file__)))
+log = logging.getLogger(__name__)
+
+
+def create_redirect_app() -> Flask:
+    app = Flask(__name__)
+    app.config['MONGO_URI'] = settings.MONGO_URI
+    app.config['DEBUG'] = settings.FLASK_DEBUG
+
+    # initialize Mongo on the Flask app
+    mongo.init_app(app)
+
+    # request latency histograms and /metrics
+    metrics.init_app(app)
+
+    # sampled request profiling, only when PROFILE_ENABLED
+    profiling.init_app(app)
+
+    # subscribe this worker to link cache invalidations (once per process)
+    app.before_request(invalidation_bus.ensure_started)
+
+    # load the most clicked links before reporting ready (once per process)
+    link_warmup.ensure_started()
+    app.before_request(link_warmup.ensure_started)
+
+    app.register_blueprint(redirects)
+    return app
+
+
+def main():
+    host = '0.0.0.0'
+    port = settings.FLASK_RUN_PORT
+    log.info(f'Starting redirect server at http://{host}:{port}/')
+    create_redirect_app().run(host=host, port=port)
+
+# Command line handler
+if __name__ == "__main__":
+    main()
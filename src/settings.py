@@ -2,6 +2,8 @@
 # Copyright (c) 2025 Scott Joiner
 
 import os
+import socket
+import tempfile
 
 # Flask settings
 FLASK_SERVER_NAME = 'localhost:8888'
@@ -18,13 +20,160 @@ RESTX_ERROR_404_HELP = False
 
 # Mongo settings
 MONGO_URI = os.environ.get('MONGO_URI') or 'mongodb://localhost:27017/urls'
+MONGO_ENSURE_INDEXES = (os.environ.get('MONGO_ENSURE_INDEXES') or 'true').lower() == 'true'
+
+# Seconds an expired link is kept (and answers 410) in 'links'. After that
+# 'flask links sweep-expired' moves it to the expired_links collection. Expired
+# links are only deleted outright, by a TTL index, with LINK_EXPIRED_DELETE.
+LINK_EXPIRATION_GRACE = int(os.environ.get('LINK_EXPIRATION_GRACE') or 30 * 24 * 3600)
+LINK_EXPIRED_DELETE = (os.environ.get('LINK_EXPIRED_DELETE') or 'false').lower() == 'true'
+
+# Short link allocation. SHORT_LINK_ALLOCATOR is 'mongo' or 'redis' (leased
+# counter blocks, base62 encoded) or 'hash' (legacy MD5 of an ObjectId).
+SHORT_LINK_ALLOCATOR = os.environ.get('SHORT_LINK_ALLOCATOR') or 'mongo'
+SHORT_LINK_BLOCK_SIZE = int(os.environ.get('SHORT_LINK_BLOCK_SIZE') or 1000)
+SHORT_LINK_OFFSET = int(os.environ.get('SHORT_LINK_OFFSET') or 62 ** 4)
+SHORT_LINK_SCRAMBLE = (os.environ.get('SHORT_LINK_SCRAMBLE') or 'true').lower() == 'true'
+
+# Bulk import/export settings
+BULK_CHUNK_SIZE = int(os.environ.get('BULK_CHUNK_SIZE') or 1000)
+
+# Link cache settings (per process, used by the redirect path)
+LINK_CACHE_SIZE = int(os.environ.get('LINK_CACHE_SIZE') or 10000)
+LINK_CACHE_TTL = int(os.environ.get('LINK_CACHE_TTL') or 60)
+LINK_CACHE_NEGATIVE_TTL = int(os.environ.get('LINK_CACHE_NEGATIVE_TTL') or 5)
+
+# At startup each worker loads the LINK_WARMUP_SIZE most clicked links into its
+# link cache (0 to disable), spending at most LINK_WARMUP_BUDGET seconds
+LINK_WARMUP_SIZE = int(os.environ.get('LINK_WARMUP_SIZE') or 1000)
+LINK_WARMUP_BUDGET = float(os.environ.get('LINK_WARMUP_BUDGET') or 5)
 
 # OAUTH settings
 IDP_URL = os.environ.get('IDP_URL')
 IDP_AUDIENCE = os.environ.get('IDP_AUDIENCE') or "public" 
 IDP_ALG = os.environ.get('IDP_ALG') or "RS256"
 
+# Signing keys are fetched from IDP_URL (a JWKS document) once per process and
+# refreshed every IDP_JWKS_REFRESH_INTERVAL seconds in the background, or on an
+# unknown kid at most every IDP_JWKS_MIN_REFRESH_INTERVAL seconds. If the IdP is
+# unreachable the last keys keep being used.
+IDP_JWKS_REFRESH_INTERVAL = int(os.environ.get('IDP_JWKS_REFRESH_INTERVAL') or 300)
+IDP_JWKS_MIN_REFRESH_INTERVAL = int(os.environ.get('IDP_JWKS_MIN_REFRESH_INTERVAL') or 10)
+IDP_JWKS_TIMEOUT = float(os.environ.get('IDP_JWKS_TIMEOUT') or 5)
+
+# Verified tokens are cached by hash until they expire, for at most AUTH_TOKEN_CACHE_TTL seconds
+AUTH_TOKEN_CACHE_SIZE = int(os.environ.get('AUTH_TOKEN_CACHE_SIZE') or 10000)
+AUTH_TOKEN_CACHE_TTL = int(os.environ.get('AUTH_TOKEN_CACHE_TTL') or 300)
+
+# Per owner, per endpoint rate limits ('<count>/<second|minute|hour|day>') kept in
+# Redis, or per process while Redis is down. RATELIMIT_ALGORITHM is token_bucket
+# or sliding_window. LINK_DAILY_QUOTA caps links created per owner per UTC day
+# (0 for no quota).
+RATELIMIT_ENABLED = (os.environ.get('RATELIMIT_ENABLED') or 'true').lower() == 'true'
+RATELIMIT_ALGORITHM = os.environ.get('RATELIMIT_ALGORITHM') or 'token_bucket'
+RATELIMIT_PREFIX = os.environ.get('RATELIMIT_PREFIX') or 'rl:'
+RATELIMIT_DEFAULT = os.environ.get('RATELIMIT_DEFAULT') or '300/minute'
+RATELIMIT_SEARCH = os.environ.get('RATELIMIT_SEARCH') or '120/minute'
+RATELIMIT_CREATE = os.environ.get('RATELIMIT_CREATE') or '60/minute'
+LINK_DAILY_QUOTA = int(os.environ.get('LINK_DAILY_QUOTA') or 10000)
+
+# Prometheus metrics at /metrics. Cache and click buffer figures are refreshed
+# every METRICS_SYNC_INTERVAL seconds. Under gunicorn also set
+# PROMETHEUS_MULTIPROC_DIR (see src/gunicorn_conf.py).
+METRICS_ENABLED = (os.environ.get('METRICS_ENABLED') or 'true').lower() == 'true'
+METRICS_SYNC_INTERVAL = float(os.environ.get('METRICS_SYNC_INTERVAL') or 5)
+
+# Opt-in request profiling. With PROFILE_ENABLED, PROFILE_SAMPLE_RATE of requests
+# (0 to 1), plus any request sending PROFILE_HEADER: PROFILE_TOKEN, have their
+# stacks sampled every PROFILE_INTERVAL seconds. Profiles are served at /profile
+# and, when PROFILE_DIR is set, written there as each process exits.
+PROFILE_ENABLED = (os.environ.get('PROFILE_ENABLED') or 'false').lower() == 'true'
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE') or 0)
+PROFILE_HEADER = os.environ.get('PROFILE_HEADER') or 'X-Profile'
+PROFILE_TOKEN = os.environ.get('PROFILE_TOKEN')
+PROFILE_INTERVAL = float(os.environ.get('PROFILE_INTERVAL') or 0.005)
+PROFILE_MAX_STACKS = int(os.environ.get('PROFILE_MAX_STACKS') or 10000)
+PROFILE_DIR = os.environ.get('PROFILE_DIR')
+
 # Celery settings
 CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL", "redis://localhost:6379/0")
 CELERY_RESULT_BACKEND = os.getenv("CELERY_RESULT_BACKEND", "redis://localhost:6379/1"),
-        
\ No newline at end of file
+
+# Redis settings (defaults to the celery broker instance)
+REDIS_URL = os.environ.get('REDIS_URL') or CELERY_BROKER_URL
+REDIS_SOCKET_TIMEOUT = float(os.environ.get('REDIS_SOCKET_TIMEOUT') or 0.5)
+REDIS_RETRY_INTERVAL = float(os.environ.get('REDIS_RETRY_INTERVAL') or 5)
+
+# Link cache invalidation settings
+LINK_CACHE_CHANNEL = os.environ.get('LINK_CACHE_CHANNEL') or 'links:invalidate'
+LINK_CACHE_CHANGE_STREAM = (os.environ.get('LINK_CACHE_CHANGE_STREAM') or 'false').lower() == 'true'
+
+# Shared (Redis) link cache settings. Click counters in cached records may
+# lag by up to LINK_REDIS_CACHE_TTL seconds.
+LINK_REDIS_CACHE_TTL = int(os.environ.get('LINK_REDIS_CACHE_TTL') or 300)
+LINK_REDIS_CACHE_NEGATIVE_TTL = int(os.environ.get('LINK_REDIS_CACHE_NEGATIVE_TTL') or 5)
+LINK_REDIS_CACHE_LOCK_TIMEOUT = float(os.environ.get('LINK_REDIS_CACHE_LOCK_TIMEOUT') or 2)
+
+# Click ingestion settings. CLICK_BUFFER_POLICY is one of drop, block or spill.
+CLICK_BUFFER_SIZE = int(os.environ.get('CLICK_BUFFER_SIZE') or 10000)
+CLICK_BATCH_SIZE = int(os.environ.get('CLICK_BATCH_SIZE') or 1000)
+CLICK_FLUSH_INTERVAL = float(os.environ.get('CLICK_FLUSH_INTERVAL') or 1)
+CLICK_BUFFER_POLICY = os.environ.get('CLICK_BUFFER_POLICY') or 'spill'
+CLICK_BLOCK_TIMEOUT = float(os.environ.get('CLICK_BLOCK_TIMEOUT') or 0.05)
+CLICK_SPILL_DIR = os.environ.get('CLICK_SPILL_DIR') or tempfile.gettempdir()
+# Attempts at writing a batch before it is spilled (or dropped)
+CLICK_MAX_ATTEMPTS = int(os.environ.get('CLICK_MAX_ATTEMPTS') or 5)
+
+# Clicks are stored in monthly clicks_YYYYMM partitions. Partitions older than
+# CLICK_RETENTION_MONTHS (0 keeps them forever) are written to gzipped NDJSON
+# in CLICK_ARCHIVE_DIR, unless CLICK_ARCHIVE is false, and then dropped.
+CLICK_RETENTION_MONTHS = int(os.environ.get('CLICK_RETENTION_MONTHS') or 0)
+CLICK_ARCHIVE = (os.environ.get('CLICK_ARCHIVE') or 'true').lower() == 'true'
+CLICK_ARCHIVE_DIR = os.environ.get('CLICK_ARCHIVE_DIR') or 'archive'
+
+# Click rollup retention in days per bucket size (0 keeps them forever)
+ROLLUP_MINUTE_RETENTION_DAYS = int(os.environ.get('ROLLUP_MINUTE_RETENTION_DAYS') or 2)
+ROLLUP_HOUR_RETENTION_DAYS = int(os.environ.get('ROLLUP_HOUR_RETENTION_DAYS') or 90)
+ROLLUP_DAY_RETENTION_DAYS = int(os.environ.get('ROLLUP_DAY_RETENTION_DAYS') or 0)
+
+# Zero based positions of URL path arguments counted in the /stats top_args
+# breakdown, e.g. '0,1'. Argument values come from whoever requests the link,
+# so none are counted by default.
+ROLLUP_ARG_POSITIONS = [int(p) for p in (os.environ.get('ROLLUP_ARG_POSITIONS') or '').split(',') if p.strip()]
+
+# Per link, per day sketches. HyperLogLog precision p gives a unique visitor
+# standard error of 1.04 / sqrt(2^p); Count-Min width w and depth d overcount
+# by at most e/w of the day's clicks with probability 1 - e^-d; Space-Saving
+# keeps the top SKETCH_TOP_K referrers and user agents.
+SKETCH_HLL_PRECISION = int(os.environ.get('SKETCH_HLL_PRECISION') or 12)
+SKETCH_CMS_WIDTH = int(os.environ.get('SKETCH_CMS_WIDTH') or 272)
+SKETCH_CMS_DEPTH = int(os.environ.get('SKETCH_CMS_DEPTH') or 5)
+SKETCH_TOP_K = int(os.environ.get('SKETCH_TOP_K') or 50)
+
+# Webhook settings. With batching enabled, clicks for the same webhook URL are
+# delivered together as a JSON array once WEBHOOK_BATCH_SIZE clicks are waiting
+# or WEBHOOK_BATCH_WINDOW seconds have passed.
+WEBHOOK_BATCH_ENABLED = (os.environ.get('WEBHOOK_BATCH_ENABLED') or 'false').lower() == 'true'
+WEBHOOK_BATCH_WINDOW = float(os.environ.get('WEBHOOK_BATCH_WINDOW') or 5)
+WEBHOOK_BATCH_SIZE = int(os.environ.get('WEBHOOK_BATCH_SIZE') or 100)
+WEBHOOK_MAX_RETRIES = int(os.environ.get('WEBHOOK_MAX_RETRIES') or 5)
+WEBHOOK_RETRY_BACKOFF_MAX = int(os.environ.get('WEBHOOK_RETRY_BACKOFF_MAX') or 600)
+
+# Webhook connection pool settings (per celery worker process)
+WEBHOOK_POOL_SIZE = int(os.environ.get('WEBHOOK_POOL_SIZE') or 10)
+WEBHOOK_POOL_MAX_HOSTS = int(os.environ.get('WEBHOOK_POOL_MAX_HOSTS') or 256)
+# Seconds between connection reuse log lines per worker (0 logs only at shutdown)
+WEBHOOK_POOL_STATS_INTERVAL = float(os.environ.get('WEBHOOK_POOL_STATS_INTERVAL') or 300)
+WEBHOOK_CONNECT_TIMEOUT = float(os.environ.get('WEBHOOK_CONNECT_TIMEOUT') or 3.05)
+WEBHOOK_READ_TIMEOUT = float(os.environ.get('WEBHOOK_READ_TIMEOUT') or 5)
+WEBHOOK_KEEP_ALIVE = (os.environ.get('WEBHOOK_KEEP_ALIVE') or 'true').lower() == 'true'
+
+# Webhook delivery engine: 'celery' tasks, or 'async' to queue deliveries in
+# Redis for the asyncio dispatcher (python -m src.api.dispatcher)
+WEBHOOK_ENGINE = os.environ.get('WEBHOOK_ENGINE') or 'celery'
+WEBHOOK_QUEUE = os.environ.get('WEBHOOK_QUEUE') or 'webhooks:pending'
+WEBHOOK_ASYNC_CONCURRENCY = int(os.environ.get('WEBHOOK_ASYNC_CONCURRENCY') or 1000)
+WEBHOOK_ASYNC_PER_HOST = int(os.environ.get('WEBHOOK_ASYNC_PER_HOST') or 20)
+# Names this dispatcher's processing list; keep it stable across restarts so
+# entries it was delivering when it stopped are picked up again
+WEBHOOK_CONSUMER = os.environ.get('WEBHOOK_CONSUMER') or socket.gethostname()
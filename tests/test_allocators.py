@@ -0,0 +1,47 @@
+# tests/test_allocators.py
+
+from src.api.allocators import RangeLeaseAllocator, HashAllocator, base62_encode, scramble
+
+
+class FakeCounter:
+    def __init__(self):
+        self.seq = 0
+        self.leases = 0
+
+    def __call__(self, size):
+        self.seq += size
+        self.leases += 1
+        return self.seq
+
+
+def test_base62_encode():
+    assert base62_encode(0) == '0'
+    assert base62_encode(61) == 'z'
+    assert base62_encode(62) == '10'
+    assert base62_encode(62 ** 4) == '10000'
+
+
+def test_scramble_is_a_permutation_per_length():
+    values = range(62, 62 ** 2)
+    assert sorted(scramble(n) for n in values) == list(values)
+
+
+def test_leases_blocks_and_never_repeats():
+    counter = FakeCounter()
+    allocator = RangeLeaseAllocator(counter, block_size=10, offset=62 ** 4)
+
+    codes = allocator.allocate(25) + [next(allocator.candidates()) for _ in range(5)]
+
+    # The bulk request leases a single block large enough for all of it
+    assert len(set(codes)) == 30
+    assert counter.leases == 2
+    assert all(len(c) == 5 for c in codes)
+
+
+def test_unscrambled_codes_are_sequential():
+    allocator = RangeLeaseAllocator(FakeCounter(), block_size=2, offset=0, scrambled=False)
+    assert allocator.allocate(3) == ['0', '1', '2']
+
+
+def test_hash_candidates_grow_on_retry():
+    assert [len(c) for c in HashAllocator().candidates()] == [5, 6, 7, 8, 9, 10, 11]
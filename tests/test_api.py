@@ -64,6 +64,7 @@ def test_search_links_uses_mongo(monkeypatch, app):
     ]
 
     mock_cursor = MagicMock()
+    mock_cursor.sort.return_value = mock_cursor
     mock_cursor.skip.return_value = mock_cursor
     mock_cursor.limit.return_value = mock_cursor
     mock_cursor.__iter__.return_value = iter(fake_list)
@@ -72,7 +73,7 @@ def test_search_links_uses_mongo(monkeypatch, app):
     mock_collection = MagicMock()
     mock_collection.find.return_value = mock_cursor 
     monkeypatch.setattr(
-        'src.api.extensions.mongo.db.urls',
+        'src.api.extensions.mongo.db.links',
         mock_collection
     )
 
@@ -87,4 +88,4 @@ def test_search_links_uses_mongo(monkeypatch, app):
     assert response.get_json() == expected
     
     # Verify we passed the query args to Mongo
-    mock_collection.find.assert_called_once_with({'tags': {'$regex': 'foo', '$options': 'i'}})
\ No newline at end of file
+    mock_collection.find.assert_called_once_with({'tags': {'$in': ['foo']}})
\ No newline at end of file
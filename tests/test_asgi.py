@@ -0,0 +1,269 @@
+# tests/test_asgi.py
+
+import asyncio
+from datetime import datetime, timezone
+
+from bson import ObjectId
+
+from src.api import aio
+from src.api.aio import AsyncLinkStore, AsyncClickWriter
+from src.api.cache import link_cache
+from src.api.extensions import LinkNotFoundError
+from src.asgi import create_asgi_app
+
+
+async def call(app, path, method='GET', headers=(), raw_path=None, query_string=b''):
+    sent = []
+
+    async def receive():
+        return {'type': 'http.request'}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        'type': 'http', 'method': method, 'scheme': 'http', 'path': path, 'query_string': query_string,
+        'headers': [(b'host', b'sho.rt'), *headers], 'client': ('10.1.2.3', 5000),
+    }
+    if raw_path is not None:
+        scope['raw_path'] = raw_path
+    await app(scope, receive, send)
+    return sent[0]['status'], dict(sent[0]['headers']), sent[1]['body']
+
+
+class FakeRedirects:
+    def __init__(self):
+        self.calls = []
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def redirect_target(self, short_link, request_url, varargs=None, client=None):
+        self.calls.append((short_link, request_url, varargs, client))
+        if short_link != 'abc12':
+            raise LinkNotFoundError(f'No link for {short_link}')
+        return 'https://example.com/'
+
+
+def test_asgi_routes_like_the_flask_app(monkeypatch):
+    monkeypatch.setattr('src.asgi.invalidation_bus.ensure_started', lambda: None)
+    redirects = FakeRedirects()
+    app = create_asgi_app(lambda: redirects)
+
+    async def scenario():
+        # startup creates the service; requests then go through it
+        messages = asyncio.Queue()
+        await messages.put({'type': 'lifespan.startup'})
+        sent = []
+
+        async def send(message):
+            sent.append(message['type'])
+
+        lifespan = asyncio.ensure_future(app({'type': 'lifespan'}, messages.get, send))
+        await asyncio.sleep(0)
+
+        ok = await call(app, '/abc12/a/b', headers=[(b'user-agent', b'pytest')])
+        missing = await call(app, '/zzz99/')
+        slashless = await call(app, '/abc12')
+        posted = await call(app, '/abc12/', method='POST')
+
+        await messages.put({'type': 'lifespan.shutdown'})
+        await lifespan
+        return sent, ok, missing, slashless, posted
+
+    sent, ok, missing, slashless, posted = asyncio.run(scenario())
+    assert sent == ['lifespan.startup.complete', 'lifespan.shutdown.complete']
+    assert ok[0] == 302 and ok[1][b'location'] == b'https://example.com/'
+    assert redirects.calls[0] == ('abc12', 'http://sho.rt/abc12/a/b', 'a/b',
+                                  {'ip_address': '10.1.2.3', 'user_agent': 'pytest', 'referrer': None})
+    assert missing[0] == 404 and b'zzz99' in missing[2]
+    assert slashless[0] == 308 and slashless[1][b'location'] == b'/abc12/'
+    assert posted[0] == 405
+
+
+def test_works_without_lifespan_and_encodes_locations(monkeypatch):
+    monkeypatch.setattr('src.asgi.invalidation_bus.ensure_started', lambda: None)
+
+    class IriRedirects(FakeRedirects):
+        async def redirect_target(self, short_link, request_url, varargs=None, client=None):
+            await super().redirect_target(short_link, request_url, varargs, client)
+            return f'https://example.com/caf\u00e9/{varargs}'
+
+    created = []
+    app = create_asgi_app(lambda: created.append(IriRedirects()) or created[-1])
+
+    async def scenario():
+        # No lifespan events: the service is created by the first request
+        first, second = await asyncio.gather(call(app, '/abc12/\u00fc'), call(app, '/abc12/x'))
+        slashless = await call(app, '/abc12', query_string=b'x=1')
+        return first, second, slashless
+
+    first, second, slashless = asyncio.run(scenario())
+    assert len(created) == 1
+    assert first[0] == second[0] == 302
+    assert first[1][b'location'] == b'https://example.com/caf%C3%A9/%C3%BC'
+    assert slashless[0] == 308 and slashless[1][b'location'] == b'/abc12/?x=1'
+
+
+def test_encoded_paths_decode_like_the_flask_app(monkeypatch):
+    from src.api import redirects as flask_redirects
+    from src.redirect_app import create_redirect_app
+
+    flask_calls = []
+
+    def target(short_link, request_url, varargs, client):
+        flask_calls.append((short_link, varargs))
+        return 'https://example.com/'
+
+    monkeypatch.setattr(flask_redirects, 'get_redirect_target', target)
+    assert create_redirect_app().test_client().get('/abc12/100%25/%2541').status_code == 302
+
+    monkeypatch.setattr('src.asgi.invalidation_bus.ensure_started', lambda: None)
+    redirects = FakeRedirects()
+    app = create_asgi_app(lambda: redirects)
+
+    async def scenario():
+        messages = asyncio.Queue()
+        await messages.put({'type': 'lifespan.startup'})
+
+        async def send(message):
+            pass
+
+        lifespan = asyncio.ensure_future(app({'type': 'lifespan'}, messages.get, send))
+        await asyncio.sleep(0)
+        # Servers pass the path decoded once, and the original in raw_path
+        ok = await call(app, '/abc12/100%/%41', raw_path=b'/abc12/100%25/%2541')
+        await messages.put({'type': 'lifespan.shutdown'})
+        await lifespan
+        return ok
+
+    assert asyncio.run(scenario())[0] == 302
+    assert [made[:1] + made[2:3] for made in redirects.calls] == flask_calls == [('abc12', '100%/%41')]
+
+
+def test_legacy_url_that_is_not_a_template_redirects_as_written():
+    redirects = aio.AsyncRedirects.__new__(aio.AsyncRedirects)
+    link = {'_id': ObjectId(), 'short_link': 'leg12', 'redirect_url': 'https://example.com/{name}'}
+
+    class Links:
+        async def find(self, short_link):
+            return link
+
+    class Clicks:
+        def add(self, click):
+            return True
+
+    redirects.links, redirects.clicks = Links(), Clicks()
+    target = asyncio.run(redirects.redirect_target('leg12', 'http://sho.rt/leg12/a', 'a'))
+    assert target == 'https://example.com/{name}'
+
+
+class FakeCollection:
+    def __init__(self, docs=()):
+        self.docs = list(docs)
+        self.queries = 0
+        self.writes = []
+
+    async def find_one(self, query):
+        self.queries += 1
+        await asyncio.sleep(0.01)
+        return next((d for d in self.docs if all(d.get(k) == v for k, v in query.items())), None)
+
+    async def bulk_write(self, ops, ordered=True):
+        self.writes.append(ops)
+
+
+class DownRedis:
+    async def get(self, key):
+        raise ConnectionError('redis is down')
+
+    async def set(self, *args, **kwargs):
+        raise ConnectionError('redis is down')
+
+    def pipeline(self, transaction=True):
+        return DownPipeline()
+
+
+class DownPipeline:
+    def set(self, *args, **kwargs):
+        return self
+
+    async def execute(self):
+        raise ConnectionError('redis is down')
+
+
+class FakeDb:
+    def __init__(self, links=()):
+        self.links = FakeCollection(links)
+        self.click_rollups = FakeCollection()
+        self.click_breakdowns = FakeCollection()
+
+
+def test_concurrent_misses_share_one_lookup():
+    link_cache.clear()
+    link = {'_id': ObjectId(), 'short_link': 'conc1', 'redirect_url': 'https://example.com/'}
+    db = FakeDb([link])
+    store = AsyncLinkStore(db, DownRedis())
+
+    async def scenario():
+        return await asyncio.gather(*[store.find('conc1') for _ in range(50)])
+
+    assert all(found['short_link'] == 'conc1' for found in asyncio.run(scenario()))
+    assert db.links.queries == 1
+    # Now served from the in-process cache
+    assert asyncio.run(store.find('conc1')) is not None
+    assert db.links.queries == 1
+    link_cache.clear()
+
+
+def test_click_writer_batches_on_the_loop(monkeypatch):
+    inserted, sketched = [], []
+
+    async def insert(db, clicks):
+        inserted.append(list(clicks))
+
+    async def ingest(db, clicks):
+        sketched.append(len(clicks))
+
+    monkeypatch.setattr(aio, 'insert_clicks_async', insert)
+    monkeypatch.setattr(aio, 'ingest_clicks_async', ingest)
+    db = FakeDb()
+
+    async def scenario():
+        writer = AsyncClickWriter(db, capacity=3, batch_size=2, flush_interval=60)
+        writer.start()
+        url_id = ObjectId()
+        clicks = [{'url_id': url_id, 'clicked': datetime(2025, 1, 1, tzinfo=timezone.utc), 'args': []}] * 4
+        results = [writer.add(dict(c)) for c in clicks]
+        await asyncio.sleep(0.05)
+        await writer.close()
+        return results, writer
+
+    results, writer = asyncio.run(scenario())
+    assert results == [True, True, True, False]
+    assert writer.dropped == 1
+    assert [len(batch) for batch in inserted] == [2, 1]
+    assert db.links.writes[0][0]._doc['$inc'] == {'click_count': 2}
+    assert sketched == [2, 1]
+
+
+def test_webhook_enqueue_failures_are_logged(monkeypatch):
+    from unittest.mock import MagicMock
+
+    log = MagicMock()
+    monkeypatch.setattr(aio, 'log', log)
+
+    async def scenario():
+        def enqueue():
+            raise ConnectionError('broker is down')
+
+        queued = asyncio.get_running_loop().run_in_executor(None, enqueue)
+        queued.add_done_callback(aio._log_webhook_failure)
+        await asyncio.wait([queued])
+        await asyncio.sleep(0)
+
+    asyncio.run(scenario())
+    assert 'broker is down' in log.error.call_args.args[0]
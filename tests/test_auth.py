@@ -0,0 +1,109 @@
+# tests/test_auth.py
+
+import json
+import threading
+import time
+from http.server import HTTPServer, BaseHTTPRequestHandler
+
+import jwt
+import pytest
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jwt.algorithms import RSAAlgorithm
+
+from src import settings
+from src.api import auth
+from src.api.auth import JWKSCache, verify_token
+from src.api.cache import TTLCache
+
+
+def make_key(kid):
+    private = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    jwk = RSAAlgorithm.to_jwk(private.public_key(), as_dict=True)
+    jwk.update({'kid': kid, 'use': 'sig', 'alg': 'RS256'})
+    return private, jwk
+
+
+def sign(private, kid, **claims):
+    claims = {'sub': 'user-1', 'aud': settings.IDP_AUDIENCE, 'exp': int(time.time()) + 60, **claims}
+    return jwt.encode(claims, private, algorithm='RS256', headers={'kid': kid})
+
+
+@pytest.fixture
+def idp():
+    """
+    Local JWKS file server; set idp.keys to change what it serves, idp.down to fail
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            server.requests += 1
+            if server.down:
+                self.send_response(503)
+                self.end_headers()
+                return
+            body = json.dumps({'keys': server.keys}).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(('127.0.0.1', 0), Handler)
+    server.keys, server.down, server.requests = [], False, 0
+    server.url = f'http://127.0.0.1:{server.server_port}/jwks.json'
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+
+
+@pytest.fixture
+def cache(idp, monkeypatch):
+    cache = JWKSCache(idp.url, refresh_interval=3600, min_refresh_interval=0, timeout=1)
+    cache._pid = auth.os.getpid()  # no background thread in tests
+    monkeypatch.setattr(auth, 'jwks_cache', cache)
+    monkeypatch.setattr(auth, 'token_cache', TTLCache(100, 300))
+    return cache
+
+
+def test_keys_fetched_once_and_tokens_cached(idp, cache, monkeypatch):
+    private, jwk = make_key('k1')
+    idp.keys = [jwk]
+
+    token = sign(private, 'k1')
+    assert verify_token(token)['sub'] == 'user-1'
+    assert verify_token(sign(private, 'k1', sub='user-2'))['sub'] == 'user-2'
+    assert idp.requests == 1
+
+    # A cached token skips signature verification entirely
+    monkeypatch.setattr(auth.jwt, 'decode', lambda *a, **k: pytest.fail('decoded again'))
+    assert verify_token(token)['sub'] == 'user-1'
+
+
+def test_unknown_kid_refreshes_and_stale_keys_survive_outage(idp, cache):
+    old, old_jwk = make_key('old')
+    new, new_jwk = make_key('new')
+    idp.keys = [old_jwk]
+    verify_token(sign(old, 'old'))
+
+    # Key rotation: an unseen kid triggers a refresh
+    idp.keys = [old_jwk, new_jwk]
+    assert verify_token(sign(new, 'new'))['sub'] == 'user-1'
+    assert idp.requests == 2
+
+    # IdP down: known keys keep working, unknown ones fail
+    idp.down = True
+    assert not cache.refresh()
+    assert verify_token(sign(old, 'old', sub='user-3'))['sub'] == 'user-3'
+    with pytest.raises(jwt.InvalidKeyError):
+        verify_token(sign(make_key('other')[0], 'other'))
+
+
+def test_token_cache_capped_at_expiry(idp, cache):
+    private, jwk = make_key('k1')
+    idp.keys = [jwk]
+    token = sign(private, 'k1', exp=int(time.time()) + 1)
+    verify_token(token)
+    time.sleep(1.1)
+    with pytest.raises(jwt.ExpiredSignatureError):
+        verify_token(token)
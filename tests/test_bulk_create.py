@@ -0,0 +1,71 @@
+# tests/test_bulk_create.py
+
+from unittest.mock import MagicMock
+from pymongo.errors import BulkWriteError
+from src.api import services
+from src.api.extensions import mongo
+
+
+def make_links(*short_links):
+    return [
+        {'redirect_url': f'https://example.com/{n}', 'short_link': s, 'expiration': None}
+        for n, s in enumerate(short_links)
+    ]
+
+
+def patch_services(monkeypatch, db, codes):
+    allocator = MagicMock()
+    allocator.allocate.side_effect = lambda n: [codes.pop(0) for _ in range(n)]
+    allocator.candidates.side_effect = lambda: iter(codes)
+    monkeypatch.setattr(mongo, 'db', db, raising=False)
+    monkeypatch.setattr(services, 'short_link_allocator', allocator)
+    monkeypatch.setattr(services, 'shared_link_cache', MagicMock())
+    monkeypatch.setattr(services, 'invalidation_bus', MagicMock())
+    return allocator
+
+
+def test_single_availability_query_and_insert_many(monkeypatch):
+    db = MagicMock()
+    db.links.find.return_value = [{'short_link': 'taken'}]
+    allocator = patch_services(monkeypatch, db, ['gen01', 'gen02', 'gen03'])
+
+    links = make_links('taken', None, 'mine', 'mine') + [{'redirect_url': None}]
+    result = services.insert_links(links, 'owner-1')
+
+    db.links.find.assert_called_once_with(
+        {'short_link': {'$in': ['taken', 'mine', 'mine']}}, {'short_link': 1, '_id': 0}
+    )
+    allocator.allocate.assert_called_once_with(3)
+    db.links.insert_many.assert_called_once()
+    db.links.insert_one.assert_not_called()
+
+    assert [l['status'] for l in result] == ['reassigned', 'created', 'created', 'reassigned', 'skipped']
+    assert [l.get('short_link') for l in result[:4]] == ['gen01', 'gen02', 'mine', 'gen03']
+
+
+def test_only_duplicate_rows_are_retried(monkeypatch):
+    db = MagicMock()
+    db.links.find.return_value = []
+    db.links.insert_many.side_effect = BulkWriteError({'writeErrors': [
+        {'index': 0, 'code': 11000, 'errmsg': 'duplicate key'},
+        {'index': 1, 'code': 121, 'errmsg': 'validation failed'},
+    ]})
+    patch_services(monkeypatch, db, ['gen01', 'gen02', 'gen03'])
+
+    result = services.insert_links(make_links('race', None, 'ok'), 'owner-1')
+
+    db.links.insert_one.assert_called_once()
+    assert [l['status'] for l in result] == ['reassigned', 'failed', 'created']
+    assert result[0]['short_link'] == 'gen02'
+
+
+def test_invalid_templates_are_not_inserted(monkeypatch):
+    db = MagicMock()
+    db.links.find.return_value = []
+    patch_services(monkeypatch, db, ['gen01'])
+
+    links = [{'redirect_url': 'https://example.com/{name}', 'expiration': None}] + make_links(None)
+    result = services.insert_links(links, 'owner-1')
+
+    assert [l['status'] for l in result] == ['invalid', 'created']
+    assert len(db.links.insert_many.call_args.args[0]) == 1
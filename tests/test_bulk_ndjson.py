@@ -0,0 +1,51 @@
+# tests/test_bulk_ndjson.py
+
+import io
+import json
+from unittest.mock import MagicMock
+from bson import ObjectId
+from src.app import create_app
+from src.api import services
+from src.api.extensions import mongo
+
+
+def test_import_reports_progress_per_chunk(monkeypatch):
+    def fake_insert(links, owner):
+        for link in links:
+            link['status'] = 'created'
+        return links
+
+    monkeypatch.setattr(services, 'insert_links', fake_insert)
+
+    lines = [json.dumps({'redirect_url': f'https://example.com/{n}'}) for n in range(5)]
+    lines.insert(2, '{not json')
+    stream = io.BytesIO(('\n'.join(lines) + '\n').encode())
+
+    progress = [json.loads(p) for p in services.import_links(stream, 'owner-1', chunk_size=4)]
+
+    assert [p['chunk'] for p in progress] == [1, 2]
+    assert progress[0]['created'] == 3
+    assert progress[0]['errors'][0]['line'] == 3
+    assert progress[-1]['totals'] == {
+        'received': 6, 'created': 5, 'reassigned': 0, 'skipped': 0, 'failed': 0, 'invalid': 1
+    }
+
+
+def test_export_streams_ndjson(monkeypatch):
+    docs = [{'_id': ObjectId(), 'short_link': 'a'}, {'_id': ObjectId(), 'short_link': 'b'}]
+    cursor = MagicMock()
+    cursor.sort.return_value = cursor
+    cursor.__iter__.return_value = iter(docs)
+    db = MagicMock()
+    db.links.find.return_value = cursor
+
+    app = create_app()
+    monkeypatch.setattr(mongo, 'db', db, raising=False)
+
+    response = app.test_client().get('/api/links/bulk', headers={'Authorization': 'Bearer valid-token'})
+
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    lines = response.get_data(as_text=True).splitlines()
+    assert [json.loads(l)['short_link'] for l in lines] == ['a', 'b']
+    cursor.close.assert_called_once()
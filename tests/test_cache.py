@@ -0,0 +1,98 @@
+# tests/test_cache.py
+
+from bson import ObjectId
+from datetime import datetime, timedelta, timezone
+from src.api.cache import TTLCache, LinkCache, MISSING
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set('a', 1)
+    cache.set('b', 2)
+
+    # Touch 'a' so 'b' becomes the eviction candidate
+    assert cache.get('a') == 1
+    cache.set('c', 3)
+
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+    assert cache.stats()['evictions'] == 1
+
+
+def test_ttl_cache_expires_entries():
+    clock = FakeClock()
+    cache = TTLCache(maxsize=10, ttl=5, clock=clock)
+    cache.set('a', 1)
+
+    clock.now = 4.9
+    assert cache.get('a') == 1
+
+    clock.now = 5.0
+    assert cache.get('a') is None
+
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['expirations']) == (1, 1, 1)
+
+
+def test_link_cache_aliases_and_invalidation():
+    cache = LinkCache(maxsize=10, ttl=60, negative_ttl=5)
+    link = {'_id': ObjectId(), 'short_link': 'abc12', 'redirect_url': 'https://example.com'}
+    cache.put(link)
+
+    # Reachable through either identifier
+    assert cache.get('abc12') is link
+    assert cache.get(str(link['_id'])) is link
+
+    # Invalidating by _id evicts the short_link alias too
+    cache.invalidate(str(link['_id']))
+    assert cache.get('abc12') is MISSING
+
+
+def test_link_cache_negative_entries():
+    cache = LinkCache(maxsize=10, ttl=60, negative_ttl=5)
+    cache.put_missing('nope1')
+
+    assert cache.get('nope1') is None
+    cache.invalidate('nope1')
+    assert cache.get('nope1') is MISSING
+
+
+def test_link_cache_ttl_respects_expiration():
+    cache = LinkCache(maxsize=10, ttl=3600, negative_ttl=5)
+    link = {
+        '_id': ObjectId(),
+        'short_link': 'soon1',
+        'expiration': datetime.now(timezone.utc) + timedelta(seconds=30)
+    }
+    cache.put(link)
+
+    expires_at, _ = cache._entries._data['soon1']
+    assert expires_at - cache._entries._clock() <= 30
+
+
+def test_ttl_cache_drops_expired_entries_on_write():
+    clock = FakeClock()
+    cache = TTLCache(maxsize=10, ttl=5, clock=clock)
+    cache.set('a', 1, ttl=1)
+    cache.set('b', 2)
+    # Replacing 'b' leaves a stale heap item that must not evict the new value
+    cache.set('b', 3, ttl=10)
+
+    clock.now = 6
+    cache.set('c', 4)
+    assert len(cache) == 2
+    assert cache.get('b') == 3
+    assert cache.stats()['expirations'] == 1
+
+    clock.now = 20
+    cache.purge()
+    assert len(cache) == 0
@@ -0,0 +1,146 @@
+# tests/test_clicks.py
+
+from bson import ObjectId
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock
+from src.api.extensions import mongo
+from src.api.clicks import ClickBuffer
+
+
+def make_click(url_id, seconds=0):
+    return {
+        'url_id': url_id,
+        'clicked': datetime(2025, 1, 1, tzinfo=timezone.utc) + timedelta(seconds=seconds),
+        'args': [],
+    }
+
+
+def test_flush_batches_clicks_and_counters(monkeypatch):
+    db = MagicMock()
+    monkeypatch.setattr(mongo, 'db', db, raising=False)
+
+    buffer = ClickBuffer(capacity=100, batch_size=100, flush_interval=60)
+    a, b = ObjectId(), ObjectId()
+    for click in (make_click(a, 1), make_click(a, 5), make_click(b, 2)):
+        assert buffer.add(click)
+
+    buffer.close()
+
+    clicks = db['clicks_202501'].insert_many.call_args.args[0]
+    assert len(clicks) == 3
+
+    # One $inc per link, carrying the latest click time
+    updates = {op._filter['_id']: op._doc for op in db.links.bulk_write.call_args.args[0]}
+    assert updates[a] == {'$inc': {'click_count': 2}, '$max': {'last_clicked': make_click(a, 5)['clicked']}}
+    assert updates[b]['$inc'] == {'click_count': 1}
+    assert len(buffer) == 0
+
+
+def test_drop_policy_when_full(monkeypatch):
+    monkeypatch.setattr(mongo, 'db', MagicMock(), raising=False)
+
+    buffer = ClickBuffer(capacity=1, batch_size=100, flush_interval=60, policy='drop')
+    assert buffer.add(make_click(ObjectId()))
+    assert not buffer.add(make_click(ObjectId()))
+    assert buffer.dropped == 1
+    buffer.close()
+
+
+def test_spill_policy_replays_on_flush(monkeypatch, tmp_path):
+    db = MagicMock()
+    monkeypatch.setattr(mongo, 'db', db, raising=False)
+
+    buffer = ClickBuffer(capacity=1, batch_size=100, flush_interval=60, policy='spill', spill_dir=str(tmp_path))
+    url_id = ObjectId()
+    buffer.add(make_click(url_id))
+    buffer.add(make_click(url_id, 1))
+    assert buffer.spilled == 1
+
+    buffer.close()
+
+    written = [c for call in db['clicks_202501'].insert_many.call_args_list for c in call.args[0]]
+    assert len(written) == 2
+    assert written[1]['url_id'] == url_id
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_retry_does_not_count_applied_stages_twice(monkeypatch):
+    db = MagicMock()
+    db.click_rollups.bulk_write.side_effect = [Exception('primary stepped down'), None]
+    monkeypatch.setattr(mongo, 'db', db, raising=False)
+
+    buffer = ClickBuffer(capacity=100, batch_size=100, flush_interval=60)
+    buffer.add(make_click(ObjectId()))
+    buffer.flush()
+    buffer.flush()
+
+    assert db['clicks_202501'].insert_many.call_count == 1
+    assert db.links.bulk_write.call_count == 1
+    assert db.click_rollups.bulk_write.call_count == 2
+    assert db.click_breakdowns.bulk_write.call_count == 1
+    buffer.close()
+
+
+def test_partial_bulk_write_failure_retries_only_failed_ops(monkeypatch):
+    from pymongo.errors import BulkWriteError
+
+    db = MagicMock()
+    failure = BulkWriteError({'writeErrors': [{'index': 1, 'code': 91, 'errmsg': 'shutting down'}]})
+    db.links.bulk_write.side_effect = [failure, None]
+    monkeypatch.setattr(mongo, 'db', db, raising=False)
+
+    buffer = ClickBuffer(capacity=100, batch_size=100, flush_interval=60)
+    a, b = ObjectId(), ObjectId()
+    buffer.add(make_click(a))
+    buffer.add(make_click(b))
+    buffer.flush()
+    buffer.flush()
+
+    retried = db.links.bulk_write.call_args_list[1].args[0]
+    assert [op._filter['_id'] for op in retried] == [b]
+    buffer.close()
+
+
+def test_failing_batch_is_spilled_after_max_attempts(monkeypatch, tmp_path):
+    db = MagicMock()
+    db.links.bulk_write.side_effect = Exception('down')
+    monkeypatch.setattr(mongo, 'db', db, raising=False)
+
+    buffer = ClickBuffer(capacity=100, batch_size=1, flush_interval=60, policy='spill',
+                         spill_dir=str(tmp_path), max_attempts=2)
+    # Flush by hand only
+    monkeypatch.setattr(buffer, 'ensure_started', lambda: None)
+    buffer.add(make_click(ObjectId()))
+    buffer.add(make_click(ObjectId(), 1))
+    buffer.flush()
+    assert len(buffer) == 1
+    buffer.flush()
+
+    # Given up on, and the batch behind it is no longer held up
+    assert buffer.spilled == 1
+    assert len(buffer) == 0
+    assert db['clicks_202501'].insert_many.call_count == 2
+
+    # Replayed later without inserting the clicks again
+    db.links.bulk_write.side_effect = None
+    buffer.close()
+    assert db['clicks_202501'].insert_many.call_count == 2
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_startup_replays_spill_files_of_other_processes(monkeypatch, tmp_path):
+    from bson import json_util
+
+    db = MagicMock()
+    monkeypatch.setattr(mongo, 'db', db, raising=False)
+    url_id = ObjectId()
+    # Left behind by a worker that has exited
+    (tmp_path / 'clicks-999999.ndjson').write_text(json_util.dumps(make_click(url_id)) + '\n')
+
+    buffer = ClickBuffer(capacity=100, batch_size=100, flush_interval=60, policy='spill', spill_dir=str(tmp_path))
+    with buffer._flush_lock:
+        buffer._replay_spill(everyone=True)
+
+    written = db['clicks_202501'].insert_many.call_args.args[0]
+    assert [c['url_id'] for c in written] == [url_id]
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,186 @@
+# tests/test_dispatcher.py
+
+import asyncio
+import json
+from aiohttp import web
+from src.api import dispatcher as dispatch
+from src.api.dispatcher import AsyncWebhookDispatcher
+
+
+async def start_stub(handler):
+    app = web.Application()
+    app.router.add_post('/hook', handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f'http://127.0.0.1:{port}/hook'
+
+
+def test_delivers_with_per_host_limit():
+    state = {'active': 0, 'peak': 0, 'bodies': []}
+
+    async def handler(request):
+        state['active'] += 1
+        state['peak'] = max(state['peak'], state['active'])
+        state['bodies'].append(await request.json())
+        await asyncio.sleep(0.01)
+        state['active'] -= 1
+        return web.Response(text='ok')
+
+    async def scenario():
+        runner, url = await start_stub(handler)
+        try:
+            async with AsyncWebhookDispatcher(concurrency=100, per_host=3, timeout=(1, 1)) as d:
+                for n in range(20):
+                    await d.submit(url, {'n': n})
+            return d
+        finally:
+            await runner.cleanup()
+
+    d = asyncio.run(scenario())
+
+    assert d.delivered == 20
+    assert state['peak'] <= 3
+    assert sorted(b['n'] for b in state['bodies']) == list(range(20))
+
+
+def test_retries_with_backoff_then_gives_up(monkeypatch):
+    monkeypatch.setattr(dispatch, 'retry_countdown', lambda retries: 0)
+    attempts = []
+
+    async def handler(request):
+        attempts.append(await request.json())
+        # Fail the first two attempts of each batch
+        return web.Response(status=503 if len(attempts) <= 2 else 200)
+
+    async def scenario(max_retries):
+        runner, url = await start_stub(handler)
+        try:
+            async with AsyncWebhookDispatcher(concurrency=10, per_host=1, timeout=(1, 1), max_retries=max_retries) as d:
+                await d.submit(url, [{'n': 1}, {'n': 2}])
+            return d
+        finally:
+            await runner.cleanup()
+
+    d = asyncio.run(scenario(max_retries=5))
+    assert (d.delivered, d.failed) == (1, 0)
+    assert len(attempts) == 3
+    assert attempts[0] == [{'n': 1}, {'n': 2}]
+
+    attempts.clear()
+    d = asyncio.run(scenario(max_retries=1))
+    assert (d.delivered, d.failed) == (0, 1)
+    assert len(attempts) == 2
+
+
+def test_retry_countdown_matches_webhook_task_policy():
+    for retries in range(10):
+        assert 0 <= dispatch.retry_countdown(retries) <= min(2 ** retries, dispatch.WebhookTask.retry_backoff_max)
+
+
+def test_backoff_does_not_hold_a_slot(monkeypatch):
+    monkeypatch.setattr(dispatch, 'retry_countdown', lambda retries: 0.2)
+    order = []
+
+    async def handler(request):
+        body = await request.json()
+        order.append(body['n'])
+        return web.Response(status=503 if body['n'] == 1 and order.count(1) == 1 else 200)
+
+    async def scenario():
+        runner, url = await start_stub(handler)
+        try:
+            async with AsyncWebhookDispatcher(concurrency=1, per_host=1, timeout=(1, 1)) as d:
+                await d.submit(url, {'n': 1})
+                await asyncio.sleep(0.05)
+                # Gets the only slot while the first delivery backs off
+                await d.submit(url, {'n': 2})
+                await asyncio.sleep(0.05)
+                assert order == [1, 2]
+            return d
+        finally:
+            await runner.cleanup()
+
+    d = asyncio.run(scenario())
+    assert order == [1, 2, 1]
+    assert d.delivered == 2
+    # Host limits are not kept once nothing uses them
+    assert len(d._hosts) == 0
+
+
+class FakeRedis:
+    def __init__(self, lists):
+        self.lists = lists
+
+    async def lmove(self, src, dest, wherefrom, whereto):
+        items = self.lists.setdefault(src, [])
+        if not items:
+            return None
+        item = items.pop() if wherefrom == 'RIGHT' else items.pop(0)
+        target = self.lists.setdefault(dest, [])
+        target.insert(0, item) if whereto == 'LEFT' else target.append(item)
+        return item
+
+    async def blmove(self, src, dest, timeout, wherefrom, whereto):
+        item = await self.lmove(src, dest, wherefrom, whereto)
+        if item is None:
+            await asyncio.sleep(0.01)
+        return item
+
+    async def lrem(self, name, count, value):
+        self.lists[name].remove(value)
+
+
+def test_run_acknowledges_deliveries_and_recovers_unfinished_entries():
+    bodies = []
+
+    async def handler(request):
+        bodies.append(await request.json())
+        return web.Response(text='ok')
+
+    async def scenario():
+        runner, url = await start_stub(handler)
+        entry = json.dumps([url, {'n': 1}])
+        redis = FakeRedis({
+            'hooks': [json.dumps([url, {'n': 2}]), 'not json'],
+            # Left behind when this consumer last stopped
+            'hooks:processing:w1': [entry],
+        })
+        try:
+            async with AsyncWebhookDispatcher(concurrency=10, per_host=2, timeout=(1, 1)) as d:
+                consumer = asyncio.create_task(d.run(redis, 'hooks', 'w1'))
+                await asyncio.sleep(0.2)
+                consumer.cancel()
+            return redis
+        finally:
+            await runner.cleanup()
+
+    redis = asyncio.run(scenario())
+    assert sorted(b['n'] for b in bodies) == [1, 2]
+    assert redis.lists['hooks'] == []
+    assert redis.lists['hooks:processing:w1'] == []
+
+
+def test_unexpected_errors_fail_and_acknowledge_the_entry():
+    acked = []
+
+    async def handler(request):
+        return web.Response(text='ok')
+
+    async def scenario():
+        runner, url = await start_stub(handler)
+        try:
+            async with AsyncWebhookDispatcher(concurrency=10, per_host=1, timeout=(1, 1)) as d:
+                async def ack():
+                    acked.append(True)
+                # Not JSON serializable, so the POST raises TypeError
+                await d.submit(url, {'n': object()}, ack)
+            return d
+        finally:
+            await runner.cleanup()
+
+    d = asyncio.run(scenario())
+    assert (d.delivered, d.failed) == (0, 1)
+    assert acked == [True]
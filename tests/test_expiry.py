@@ -0,0 +1,51 @@
+# tests/test_expiry.py
+
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock
+
+import pytest
+from bson import ObjectId
+
+from src.api import expiry
+from src.api.expiry import is_expired, sweep_expired_links
+from src.api.extensions import LinkExpiredError
+from src.api.services import check_redirectable
+
+
+def test_expiration_is_exact():
+    now = datetime(2025, 5, 1, 12, 0, tzinfo=timezone.utc)
+    # Naive datetimes from PyMongo are UTC
+    link = {'short_link': 'abc12', 'expiration': datetime(2025, 5, 1, 12, 0, 1)}
+    assert not is_expired(link, now)
+    assert is_expired(link, now + timedelta(seconds=1))
+    assert not is_expired({'expiration': None}, now)
+
+
+def test_expired_earlier_today_is_gone():
+    link = {'short_link': 'abc12', 'expiration': datetime.now(timezone.utc) - timedelta(seconds=1)}
+    with pytest.raises(LinkExpiredError):
+        check_redirectable(link, 'abc12')
+
+
+class FakeCursor(list):
+
+    def limit(self, n):
+        return FakeCursor(self[:n])
+
+
+def test_sweep_archives_then_deletes(monkeypatch):
+    monkeypatch.setattr(expiry, 'shared_link_cache', MagicMock())
+    monkeypatch.setattr(expiry, 'invalidation_bus', MagicMock())
+    links = [{'_id': ObjectId(), 'short_link': f'old{n}', 'expiration': datetime(2025, 1, 1)} for n in range(3)]
+
+    db = MagicMock()
+    db.links.find.side_effect = [FakeCursor(links[:2]), FakeCursor(links[2:])]
+    now = datetime(2025, 3, 1, tzinfo=timezone.utc)
+
+    assert sweep_expired_links(db, grace=86400, now=now, batch_size=2) == 3
+    cutoff = now - timedelta(days=1)
+    db.links.find.assert_called_with({'expiration': {'$lte': cutoff}})
+    assert db['expired_links'].bulk_write.call_count == 2
+    ids = [link['_id'] for link in links[:2]]
+    db.links.delete_many.assert_any_call({'_id': {'$in': ids}, 'expiration': {'$lte': cutoff}})
+    expiry.invalidation_bus.publish.assert_any_call(*ids, 'old0', 'old1')
@@ -0,0 +1,185 @@
+# tests/test_indexes.py
+
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+from src import settings
+from src.api.indexes import ensure_indexes, check_query_plans, _stages
+
+
+def test_stage_walk_finds_nested_collscan():
+    plan = {'stage': 'SORT', 'inputStage': {'stage': 'OR', 'inputStages': [
+        {'stage': 'IXSCAN'}, {'stage': 'FETCH', 'inputStage': {'stage': 'COLLSCAN'}}
+    ]}}
+    assert 'COLLSCAN' in _stages(plan)
+
+
+@pytest.fixture
+def db():
+    client = MongoClient(settings.MONGO_URI, serverSelectionTimeoutMS=500)
+    try:
+        client.admin.command('ping')
+    except PyMongoError:
+        pytest.skip('MongoDB is not available')
+    yield client.get_default_database()
+    client.close()
+
+
+def test_no_query_shape_falls_back_to_collscan(db):
+    ensure_indexes(db)
+    assert check_query_plans(db) == []
+
+
+def _shape(value):
+    """
+    Field and operator names only; values and list lengths are ignored
+    """
+    if isinstance(value, dict):
+        return tuple(sorted((key, _shape(v)) for key, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(dict.fromkeys(_shape(v) for v in value))
+    return None
+
+
+class RecordingCursor:
+    def __init__(self, log, collection, query):
+        self.entry = [collection, query, None]
+        log.append(self.entry)
+
+    def sort(self, key, direction=None):
+        self.entry[2] = [(key, direction or 1)] if isinstance(key, str) else list(key)
+        return self
+
+    def skip(self, n):
+        return self
+
+    limit = batch_size = max_time_ms = skip
+
+    def close(self):
+        pass
+
+    def __iter__(self):
+        return iter([])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+class RecordingCollection:
+    def __init__(self, log, name):
+        self.log = log
+        self.name = name
+
+    def find(self, query=None, *args, **kwargs):
+        return RecordingCursor(self.log, self.name, query or {})
+
+    def find_one(self, query, *args, **kwargs):
+        self.find(query)
+        return {'_id': ObjectId(), 'short_link': 'abc12', 'created': datetime(2025, 1, 1)}
+
+    find_one_or_404 = find_one
+
+    def aggregate(self, pipeline, **kwargs):
+        self.find(pipeline[0]['$match'])
+        return iter([])
+
+    def count_documents(self, query):
+        return 1
+
+    def insert_many(self, docs, **kwargs):
+        pass
+
+
+class RecordingDb:
+    def __init__(self):
+        self.log = []
+
+    def __getattr__(self, name):
+        return RecordingCollection(self.log, name)
+
+    __getitem__ = __getattr__
+
+    def list_collection_names(self, **kwargs):
+        return ['links', 'clicks_202501']
+
+
+def test_query_shapes_match_the_queries_issued(monkeypatch):
+    from werkzeug.datastructures import MultiDict
+    from src.api import services
+    from src.api.cache import link_cache
+    from src.api.expiry import sweep_expired_links
+    from src.api.extensions import mongo
+    from src.api.indexes import QUERY_SHAPES, CLICKS
+    from src.api.pagination import encode_cursor, LINKS, CLICKS as CLICK_CURSOR
+    from src.api.rollups import link_stats
+    from src.api.sketches import link_audience
+    from src.api.warmup import LinkWarmup
+
+    db = RecordingDb()
+    monkeypatch.setattr(mongo, 'db', db, raising=False)
+    monkeypatch.setattr(services.shared_link_cache, 'load', lambda key, loader: loader())
+    for name in ('set_many', 'delete'):
+        monkeypatch.setattr(services.shared_link_cache, name, lambda *a: None)
+    monkeypatch.setattr(services.invalidation_bus, 'publish', lambda *a: None)
+    link_cache.clear()
+
+    url_id = str(ObjectId())
+    services.find_cached('abc12')
+    services.find_cached(url_id)
+    services.insert_links([{'redirect_url': 'https://example.com/', 'short_link': 'abc12', 'expiration': None}], 'me')
+    for args in (
+        {}, {'tag': ['a', 'b']}, {'tag': ['a', 'b'], 'tag_match': 'all'},
+        {'url': 'https://example.com/'}, {'url': 'example.com'}, {'url': 'example'},
+        {'cursor': encode_cursor(LINKS, {'_id': ObjectId()})},
+    ):
+        services.search(MultiDict(args))
+    list(services.export_links())
+    services.get_clicks(url_id, MultiDict())
+    cursor = encode_cursor(CLICK_CURSOR, {'clicked': datetime(2025, 1, 2), '_id': ObjectId()})
+    services.get_clicks(url_id, MultiDict({'cursor': cursor}))
+    link_stats(ObjectId())
+    link_audience(ObjectId())
+    sweep_expired_links(db)
+    LinkWarmup(lambda: db, link_cache, 10, 5).run()
+    link_cache.clear()
+
+    def shapes(entries):
+        return {
+            (CLICKS if collection.startswith('clicks_') else collection, _shape(query), _shape(sort))
+            for collection, query, sort in entries
+        }
+
+    issued = shapes(db.log)
+    declared = shapes((collection, query, sort) for _, collection, query, sort in QUERY_SHAPES)
+    assert issued - declared == set(), 'queries missing from QUERY_SHAPES'
+    assert declared - issued == set(), 'QUERY_SHAPES entries no longer issued'
+
+
+def test_only_an_unwanted_expiration_ttl_is_dropped(monkeypatch):
+    from unittest.mock import MagicMock
+    from pymongo import IndexModel
+    from pymongo.errors import OperationFailure
+    from src.api import indexes
+
+    plain_expiration = IndexModel([('expiration', 1)])
+    monkeypatch.setattr(indexes, 'INDEXES', {'links': [IndexModel([('short_link', 1)], unique=True), plain_expiration]})
+    monkeypatch.setattr(indexes, 'existing_partitions', lambda db: [])
+
+    db = MagicMock()
+    db['links'].create_indexes.side_effect = [
+        OperationFailure('conflict', code=85), OperationFailure('conflict', code=85), ['expiration_1'],
+    ]
+    db['links'].index_information.return_value = {
+        'short_link_1': {'key': [('short_link', 1)]},
+        'expiration_1': {'key': [('expiration', 1)], 'expireAfterSeconds': 60},
+    }
+
+    assert ensure_indexes(db) == ['expiration_1']
+    # The existing short_link index is left alone
+    db['links'].drop_index.assert_called_once_with([('expiration', 1)])
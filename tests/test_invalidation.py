@@ -0,0 +1,57 @@
+# tests/test_invalidation.py
+
+import time
+import fakeredis
+from bson import ObjectId
+from src.api.cache import LinkCache, MISSING
+from src.api.invalidation import InvalidationBus
+
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_publish_evicts_in_other_processes():
+    server = fakeredis.FakeServer()
+
+    # Two "workers", each with its own cache and redis connection
+    cache_a = LinkCache(maxsize=10, ttl=60, negative_ttl=5)
+    cache_b = LinkCache(maxsize=10, ttl=60, negative_ttl=5)
+    bus_a = InvalidationBus(cache_a, 'test:invalidate', lambda: fakeredis.FakeRedis(server=server))
+    bus_b = InvalidationBus(cache_b, 'test:invalidate', lambda: fakeredis.FakeRedis(server=server))
+
+    link = {'_id': ObjectId(), 'short_link': 'abc12'}
+    cache_a.put(link)
+    cache_b.put(link)
+
+    bus_b.ensure_started()
+    try:
+        # Wait for the subscriber to attach before publishing
+        probe = fakeredis.FakeRedis(server=server)
+        assert wait_for(lambda: probe.pubsub_numsub('test:invalidate')[0][1] == 1)
+
+        bus_a.publish(str(link['_id']))
+
+        assert cache_a.get('abc12') is MISSING
+        assert wait_for(lambda: cache_b.get('abc12') is MISSING)
+    finally:
+        bus_b.stop()
+
+
+def test_publish_tolerates_redis_outage():
+    cache = LinkCache(maxsize=10, ttl=60, negative_ttl=5)
+
+    def unavailable():
+        raise ConnectionError('redis down')
+
+    bus = InvalidationBus(cache, 'test:invalidate', unavailable)
+    cache.put_missing('abc12')
+
+    # Local eviction still happens
+    bus.publish('abc12')
+    assert cache.get('abc12') is MISSING
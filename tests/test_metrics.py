@@ -0,0 +1,85 @@
+# tests/test_metrics.py
+
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from prometheus_client import REGISTRY
+
+from src import settings
+from src.api import services, webhooks
+from src.api.metrics import MongoCommandTimer, mongo_operation, metrics_sync, _operation
+from src.api.cache import link_cache
+from src.redirect_app import create_redirect_app
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+def test_mongo_commands_labelled_by_services_function():
+    timer = MongoCommandTimer()
+
+    @mongo_operation
+    def find_things():
+        timer.succeeded(SimpleNamespace(command_name='find', duration_micros=1500))
+        return _operation.get()
+
+    before = sample('mongo_command_duration_seconds_count', operation='find_things', command='find')
+    assert find_things() == 'find_things'
+    assert _operation.get() == 'background'
+    assert sample('mongo_command_duration_seconds_count', operation='find_things', command='find') == before + 1
+
+
+def test_generator_operations_label_each_step():
+    @mongo_operation
+    def stream():
+        yield _operation.get()
+        yield _operation.get()
+
+    assert list(stream()) == ['stream', 'stream']
+    assert _operation.get() == 'background'
+
+
+def test_cache_counters_sync_as_deltas():
+    metrics_sync.sync()
+    before = sample('cache_lookups_total', cache='link', result='miss')
+    link_cache.get('not-cached-anywhere')
+    link_cache.get('not-cached-either')
+    metrics_sync.sync()
+    metrics_sync.sync()
+    assert sample('cache_lookups_total', cache='link', result='miss') == before + 2
+
+
+def test_webhook_connection_reuse_is_exported(monkeypatch):
+    from src.api import metrics
+    totals = {'requests': 0, 'connections': 0}
+    monkeypatch.setattr(metrics.webhook_sessions, 'totals', lambda: dict(totals))
+    metrics_sync.sync()
+    before = sample('webhook_pool_total', event='request')
+    totals.update(requests=5, connections=1)
+    metrics_sync.sync()
+    assert sample('webhook_pool_total', event='request') == before + 5
+    assert sample('webhook_pool_total', event='connection') >= 1
+
+
+def test_requests_are_timed_and_exposed(monkeypatch):
+    monkeypatch.setattr(services, 'find_cached', lambda key: None)
+    client = create_redirect_app().test_client()
+    before = sample('http_request_duration_seconds_count',
+                    endpoint='redirects.redirect_short_link', method='GET', status='404')
+    assert client.get('/nope1/').status_code == 404
+
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert b'click_buffer_depth' in response.data
+    assert sample('http_request_duration_seconds_count',
+                  endpoint='redirects.redirect_short_link', method='GET', status='404') == before + 1
+
+
+def test_webhook_enqueue_latency(monkeypatch):
+    monkeypatch.setattr(settings, 'WEBHOOK_BATCH_ENABLED', False)
+    monkeypatch.setattr(settings, 'WEBHOOK_ENGINE', 'celery')
+    monkeypatch.setattr(webhooks.send_click_webhook, 'delay', lambda *args: None)
+    before = sample('webhook_enqueue_duration_seconds_count', engine='celery')
+    webhooks.queue_click_webhook('https://hooks.example/', {'url_id': 'x', 'clicked': datetime.now(timezone.utc)})
+    assert sample('webhook_enqueue_duration_seconds_count', engine='celery') == before + 1
@@ -0,0 +1,47 @@
+# tests/test_pagination.py
+
+import pytest
+from unittest.mock import MagicMock
+from bson import ObjectId
+from datetime import datetime, timezone
+from werkzeug.datastructures import MultiDict
+from src.api import services
+from src.api.extensions import mongo
+from src.api.pagination import (
+    encode_cursor, decode_cursor, cursor_headers, InvalidCursorError, LINKS, CLICKS, NEXT_CURSOR_HEADER
+)
+
+
+def test_click_cursor_round_trip():
+    doc = {'_id': ObjectId(), 'clicked': datetime(2025, 3, 4, 5, 6, 7, 123000, tzinfo=timezone.utc)}
+    assert decode_cursor(CLICKS, encode_cursor(CLICKS, doc)) == doc
+
+
+def test_cursor_kind_and_garbage_are_rejected():
+    token = encode_cursor(LINKS, {'_id': ObjectId()})
+    with pytest.raises(InvalidCursorError):
+        decode_cursor(CLICKS, token)
+    with pytest.raises(InvalidCursorError):
+        decode_cursor(LINKS, 'not-a-cursor')
+
+
+def test_only_full_pages_get_a_next_cursor():
+    items = [{'_id': ObjectId()} for _ in range(2)]
+    assert cursor_headers(LINKS, items, MultiDict({'max': '3'})) == {}
+    assert NEXT_CURSOR_HEADER in cursor_headers(LINKS, items, MultiDict({'max': '2'}))
+
+
+def test_search_with_cursor_uses_range_not_skip(monkeypatch):
+    cursor = MagicMock()
+    cursor.sort.return_value = cursor
+    cursor.limit.return_value = iter([])
+    db = MagicMock()
+    db.links.find.return_value = cursor
+    monkeypatch.setattr(mongo, 'db', db, raising=False)
+
+    last = ObjectId()
+    services.search(MultiDict({'cursor': encode_cursor(LINKS, {'_id': last}), 'max': '5'}))
+
+    db.links.find.assert_called_once_with({'_id': {'$gt': last}})
+    cursor.skip.assert_not_called()
+    cursor.limit.assert_called_once_with(5)
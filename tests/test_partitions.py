@@ -0,0 +1,94 @@
+# tests/test_partitions.py
+
+import gzip
+from datetime import datetime, timezone
+from unittest.mock import MagicMock
+
+from bson import ObjectId, json_util
+
+from src.api import partitions
+from src.api.partitions import (
+    partition_name, partitions_between, expired_partitions, apply_retention, find_clicks, insert_clicks
+)
+
+
+class FakeCursor(list):
+
+    def sort(self, *args):
+        return self
+
+    def batch_size(self, n):
+        return self
+
+    def skip(self, n):
+        return FakeCursor(self[n:])
+
+    def limit(self, n):
+        return FakeCursor(self[:n])
+
+
+class FakeDb:
+    """
+    Partitions as plain lists; filters are ignored
+    """
+
+    def __init__(self, **collections):
+        self.collections = {name: MagicMock() for name in collections}
+        for name, docs in collections.items():
+            self.collections[name].find.side_effect = lambda *a, docs=docs: FakeCursor(docs)
+            self.collections[name].count_documents.return_value = len(docs)
+            self.collections[name].estimated_document_count.return_value = len(docs)
+        self.drop_collection = MagicMock()
+
+    def list_collection_names(self):
+        return list(self.collections) + ['links', 'clicks']
+
+    def __getitem__(self, name):
+        return self.collections[name]
+
+
+def test_partition_routing():
+    assert partition_name(datetime(2025, 3, 31, 23, 59)) == 'clicks_202503'
+    db = FakeDb(clicks_202412=[], clicks_202501=[], clicks_202503=[])
+    assert partitions_between(db, datetime(2025, 1, 15), datetime(2025, 2, 1)) == ['clicks_202501']
+    assert partitions_between(db, start=datetime(2025, 1, 1)) == ['clicks_202501', 'clicks_202503']
+    assert partitions_between(db) == ['clicks_202412', 'clicks_202501', 'clicks_202503']
+
+
+def test_insert_groups_by_month(monkeypatch):
+    monkeypatch.setattr(partitions, '_ensured', set())
+    db = MagicMock()
+    insert_clicks(db, [
+        {'clicked': datetime(2025, 1, 31, tzinfo=timezone.utc)},
+        {'clicked': datetime(2025, 2, 1, tzinfo=timezone.utc)},
+    ])
+    assert [c.args[0] for c in db.__getitem__.call_args_list].count('clicks_202501') == 2
+    assert db['clicks_202502'].insert_many.called
+
+
+def test_skip_crosses_partitions_by_count():
+    db = FakeDb(clicks_202501=[{'n': 1}, {'n': 2}], clicks_202502=[{'n': 3}, {'n': 4}, {'n': 5}])
+    assert find_clicks(db, {}, skip=3, limit=2) == [{'n': 4}, {'n': 5}]
+    assert not db['clicks_202501'].find.called
+    assert find_clicks(db, {}, limit=3) == [{'n': 1}, {'n': 2}, {'n': 3}]
+
+
+def test_cursor_skips_earlier_partitions():
+    db = FakeDb(clicks_202501=[{'n': 1}], clicks_202502=[{'n': 2}])
+    after = {'clicked': datetime(2025, 2, 3, tzinfo=timezone.utc), '_id': ObjectId()}
+    assert find_clicks(db, {'url_id': 1}, after=after) == [{'n': 2}]
+    assert not db['clicks_202501'].find.called
+
+
+def test_retention_archives_then_drops(tmp_path):
+    clicks = [{'_id': ObjectId(), 'clicked': datetime(2024, 11, 2)}, {'_id': ObjectId(), 'clicked': datetime(2024, 11, 3)}]
+    db = FakeDb(clicks_202411=clicks, clicks_202412=[], clicks_202503=[])
+    now = datetime(2025, 3, 10, tzinfo=timezone.utc)
+
+    assert expired_partitions(db, months=3, now=now) == ['clicks_202411']
+    assert expired_partitions(db, months=0, now=now) == []
+
+    assert apply_retention(db, months=3, directory=str(tmp_path), archive=True, now=now) == ['clicks_202411']
+    db.drop_collection.assert_called_once_with('clicks_202411')
+    with gzip.open(tmp_path / 'clicks_202411.ndjson.gz', 'rt') as f:
+        assert [json_util.loads(line)['_id'] for line in f] == [c['_id'] for c in clicks]
@@ -0,0 +1,89 @@
+# tests/test_profiling.py
+
+import sys
+import threading
+import time
+from collections import Counter
+
+from flask import Flask
+
+from src import settings
+from src.api import profiling
+from src.api.profiling import StackSampler, collapse, to_collapsed, to_speedscope, TRUNCATED
+
+
+def test_collapse_is_outermost_first():
+    def inner():
+        return collapse(sys._getframe())
+
+    def outer():
+        return inner()
+
+    names = outer().split(';')
+    assert names[-1].startswith('inner (test_profiling.py:')
+    assert names[-2].startswith('outer (test_profiling.py:')
+
+
+def test_sampler_aggregates_per_endpoint():
+    sampler = StackSampler(interval=0.001, max_stacks=100)
+    done = threading.Event()
+
+    def busy_request():
+        sampler.begin('redirects.redirect_short_link')
+        deadline = time.monotonic() + 0.1
+        while time.monotonic() < deadline:
+            pass
+        sampler.end()
+        done.set()
+
+    threading.Thread(target=busy_request).start()
+    done.wait(5)
+    stacks, counts = sampler.snapshot(reset=True)
+
+    assert counts == {'redirects.redirect_short_link': 1}
+    samples = stacks['redirects.redirect_short_link']
+    assert sum(samples.values()) > 0
+    assert all('busy_request (test_profiling.py:' in stack for stack in samples if stack != TRUNCATED)
+    assert sampler.snapshot() == ({}, {})
+
+
+def test_output_formats():
+    stacks = {'api.links': Counter({'a;b': 3, 'a;c': 1})}
+    assert to_collapsed(stacks) == 'api.links;a;b 3\napi.links;a;c 1\n'
+
+    doc = to_speedscope(stacks, interval=0.01)
+    assert [f['name'] for f in doc['shared']['frames']] == ['a', 'b', 'c']
+    profile = doc['profiles'][0]
+    assert profile['samples'] == [[0, 1], [0, 2]]
+    assert profile['weights'] == [0.03, 0.01]
+
+
+def test_disabled_installs_nothing(monkeypatch):
+    monkeypatch.setattr(settings, 'PROFILE_ENABLED', False)
+    app = Flask(__name__)
+    profiling.init_app(app)
+    assert not app.before_request_funcs and not app.teardown_request_funcs
+    assert 'profile' not in app.view_functions
+
+
+def test_header_triggers_profiling(monkeypatch):
+    monkeypatch.setattr(settings, 'PROFILE_ENABLED', True)
+    monkeypatch.setattr(settings, 'PROFILE_SAMPLE_RATE', 0)
+    monkeypatch.setattr(settings, 'PROFILE_TOKEN', 'secret')
+    monkeypatch.setattr(settings, 'PROFILE_DIR', None)
+    monkeypatch.setattr(profiling, 'profiler', StackSampler(interval=0.001, max_stacks=100))
+
+    app = Flask(__name__)
+    app.add_url_rule('/slow', 'slow', lambda: time.sleep(0.05) or 'ok')
+    profiling.init_app(app)
+    client = app.test_client()
+
+    client.get('/slow')
+    client.get('/slow', headers={'X-Profile': 'wrong'})
+    client.get('/slow', headers={'X-Profile': 'secret'})
+    assert profiling.profiler.snapshot()[1] == {'slow': 1}
+
+    # FLASK_DEBUG skips auth in tests
+    response = client.get('/profile?format=speedscope')
+    assert response.json['requests'] == {'slow': 1}
+    assert response.json['profiles'][0]['name'] == 'slow'
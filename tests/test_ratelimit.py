@@ -0,0 +1,164 @@
+# tests/test_ratelimit.py
+
+from datetime import datetime, timezone
+
+import pytest
+from flask import Flask, request
+
+from src import settings
+from src.api import ratelimit
+from src.api.ratelimit import LocalLimiter, RateLimiter, parse_limit, rate_limit, SLIDING_WINDOW
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def down():
+    raise ConnectionError('redis is down')
+
+
+def test_parse_limit():
+    assert parse_limit('100/minute') == (100, 60)
+    assert parse_limit('5/seconds') == (5, 1)
+    with pytest.raises(ValueError):
+        parse_limit('5/fortnight')
+
+
+def test_token_bucket_refills_over_time():
+    clock = Clock()
+    limiter = RateLimiter(down, local=LocalLimiter(clock=clock))
+
+    decisions = [limiter.hit('search:alice', 3, 3) for _ in range(4)]
+    assert [d.allowed for d in decisions] == [True, True, True, False]
+    assert decisions[2].remaining == 0
+    assert decisions[3].retry_after == 1
+
+    # Other owners have their own bucket
+    assert limiter.hit('search:bob', 3, 3).allowed
+
+    clock.now += 1
+    assert limiter.hit('search:alice', 3, 3).allowed
+    assert not limiter.hit('search:alice', 3, 3).allowed
+
+
+def test_sliding_window_weights_previous_window():
+    clock = Clock(600.0)
+    limiter = RateLimiter(down, SLIDING_WINDOW, local=LocalLimiter(clock=clock))
+
+    assert all(limiter.hit('k', 10, 60).allowed for _ in range(10))
+    assert not limiter.hit('k', 10, 60).allowed
+
+    # Halfway through the next window half of the old requests still count
+    clock.now += 90
+    assert sum(limiter.hit('k', 10, 60).allowed for _ in range(10)) == 5
+
+
+def test_daily_quota_counts_cost():
+    limiter = RateLimiter(down)
+    now = datetime(2025, 1, 1, 23, 0, tzinfo=timezone.utc)
+    assert limiter.consume_quota('alice', 10, 8, now=now).remaining == 2
+    denied = limiter.consume_quota('alice', 10, 3, now=now)
+    assert not denied.allowed and denied.retry_after == 3600
+    assert limiter.consume_quota('alice', 10, 2, now=now).allowed
+    # A new day starts a new quota
+    assert limiter.consume_quota('alice', 10, 10, now=datetime(2025, 1, 2, tzinfo=timezone.utc)).allowed
+
+
+def test_decorator_sets_headers_and_429(monkeypatch):
+    monkeypatch.setattr(settings, 'RATELIMIT_ENABLED', True)
+    monkeypatch.setattr(settings, 'LINK_DAILY_QUOTA', 3)
+    monkeypatch.setattr(ratelimit, 'rate_limiter', RateLimiter(down))
+
+    app = Flask(__name__)
+
+    @app.route('/links', methods=['POST'])
+    @rate_limit('create', '2/minute', quota_cost=lambda: len(request.json))
+    def create():
+        return {'created': len(request.json)}, 201
+
+    @app.before_request
+    def authenticate():
+        request.decoded_token = {'sub': request.headers['X-Sub']}
+
+    client = app.test_client()
+    ok = client.post('/links', json=[1], headers={'X-Sub': 'alice'})
+    assert ok.status_code == 201
+    assert ok.headers['X-RateLimit-Limit'] == '2'
+    assert ok.headers['X-RateLimit-Remaining'] == '1'
+
+    over_quota = client.post('/links', json=[1, 2, 3], headers={'X-Sub': 'alice'})
+    assert over_quota.status_code == 429
+    assert over_quota.json == {'message': 'Daily link quota exceeded'}
+
+    limited = client.post('/links', json=[1], headers={'X-Sub': 'alice'})
+    assert limited.status_code == 429
+    assert int(limited.headers['Retry-After']) >= 1
+    assert client.post('/links', json=[1], headers={'X-Sub': 'bob'}).status_code == 201
+
+
+def test_quota_charges_only_what_was_created(monkeypatch):
+    monkeypatch.setattr(settings, 'RATELIMIT_ENABLED', True)
+    monkeypatch.setattr(settings, 'LINK_DAILY_QUOTA', 3)
+    limiter = RateLimiter(down)
+    monkeypatch.setattr(ratelimit, 'rate_limiter', limiter)
+
+    app = Flask(__name__)
+
+    @app.route('/links', methods=['POST'])
+    @rate_limit('create', '10/minute', quota_cost=lambda: len(request.json),
+                quota_used=lambda rv: sum(1 for link in rv[0] if link == 'ok'))
+    def create():
+        if request.json == ['boom']:
+            raise RuntimeError('insert failed')
+        return request.json, 201
+
+    @app.before_request
+    def authenticate():
+        request.decoded_token = {'sub': 'alice'}
+
+    client = app.test_client()
+    # Two of three rows were skipped, and a failing request costs nothing
+    assert client.post('/links', json=['ok', 'skipped', 'invalid']).status_code == 201
+    assert client.post('/links', json=['boom']).status_code == 500
+    assert client.post('/links', json=['ok', 'ok']).status_code == 201
+    assert client.post('/links', json=['ok']).status_code == 429
+
+
+def test_sliding_window_keeps_one_key_per_limit():
+    # Redis Cluster only allows a script the keys it was given
+    assert 'KEYS[1] ..' not in ratelimit._SLIDING_WINDOW
+    limiter = LocalLimiter(clock=Clock(600.0))
+    limiter.sliding_window('k', 10, 60, 1)
+    limiter._clock.now += 60
+    limiter.sliding_window('k', 10, 60, 1)
+    assert limiter._state.get('k') == {10: 1, 11: 1}
+
+
+@pytest.fixture
+def redis_client():
+    import redis
+    client = redis.Redis.from_url(settings.REDIS_URL, socket_connect_timeout=0.5)
+    try:
+        client.ping()
+    except redis.RedisError:
+        pytest.skip('Redis is not available')
+    yield client
+    for key in client.scan_iter('rl-test:*'):
+        client.delete(key)
+
+
+@pytest.mark.parametrize('algorithm', ['token_bucket', SLIDING_WINDOW])
+def test_redis_scripts_enforce_limit(redis_client, algorithm):
+    limiter = RateLimiter(lambda: redis_client, algorithm, prefix='rl-test:')
+    decisions = [limiter.hit('alice', 3, 60) for _ in range(4)]
+    assert [d.allowed for d in decisions] == [True, True, True, False]
+    assert decisions[3].retry_after > 0
+    assert limiter.consume_quota('alice', 5, 5).allowed
+    assert not limiter.consume_quota('alice', 5, 1).allowed
+    limiter.refund_quota('alice', 2)
+    assert limiter.consume_quota('alice', 5, 2).allowed
@@ -0,0 +1,76 @@
+# tests/test_redirects.py
+
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+from src.api import services
+from src.api.warmup import link_warmup
+from src.app import create_app
+from src.redirect_app import create_redirect_app
+
+LINK = {
+    '_id': ObjectId(),
+    'short_link': 'abc12',
+    'redirect_url': 'https://example.com/{}/{}',
+    'expiration': None,
+}
+
+
+@pytest.fixture
+def clicks(monkeypatch):
+    links = {
+        'abc12': LINK,
+        'old12': {**LINK, 'short_link': 'old12', 'expiration': datetime(2020, 1, 1)},
+        # Saved before redirect templates were validated
+        'leg12': {**LINK, 'short_link': 'leg12', 'redirect_url': 'https://example.com/{name}'},
+    }
+    monkeypatch.setattr(services, 'find_cached', links.get)
+    recorded = []
+    monkeypatch.setattr(services.click_buffer, 'add', recorded.append)
+    return recorded
+
+
+@pytest.mark.parametrize('factory', [create_redirect_app, create_app])
+def test_redirect_records_client(factory, clicks):
+    client = factory().test_client()
+    response = client.get('/abc12/a/b', headers={'User-Agent': 'pytest', 'Referer': 'https://ref.example/'})
+    assert response.status_code == 302
+    assert response.headers['Location'] == 'https://example.com/a/b'
+    assert clicks[0]['args'] == ['a', 'b']
+    assert clicks[0]['user_agent'] == 'pytest'
+    assert clicks[0]['referrer'] == 'https://ref.example/'
+    assert clicks[0]['ip_address'] == '127.0.0.1'
+
+
+@pytest.mark.parametrize('factory', [create_redirect_app, create_app])
+def test_legacy_url_that_is_not_a_template_redirects_as_written(factory, clicks):
+    response = factory().test_client().get('/leg12/a')
+    assert response.status_code == 302
+    # Werkzeug percent-encodes the braces in the Location header
+    assert response.headers['Location'] == 'https://example.com/%7Bname%7D'
+
+
+def test_missing_and_expired_links(clicks):
+    client = create_redirect_app().test_client()
+    assert client.get('/nope1/').status_code == 404
+    assert client.get('/old12/').status_code == 410
+    assert clicks == []
+
+
+def test_redirect_app_has_no_management_api():
+    endpoints = {rule.endpoint for rule in create_redirect_app().url_map.iter_rules()}
+    assert endpoints == {'static', 'metrics', 'redirects.redirect_short_link', 'redirects.ready'}
+
+
+def test_readiness_follows_warmup(monkeypatch):
+    monkeypatch.setattr(link_warmup, 'state', 'running')
+    monkeypatch.setattr(link_warmup, '_deadline', float('inf'))
+    client = create_redirect_app().test_client()
+    assert client.get('/ready').status_code == 503
+
+    monkeypatch.setattr(link_warmup, 'state', 'complete')
+    response = client.get('/ready')
+    assert response.status_code == 200
+    assert response.json['ready'] is True
@@ -0,0 +1,94 @@
+# tests/test_rollups.py
+
+from unittest.mock import MagicMock
+from bson import ObjectId
+from datetime import datetime, timezone
+from src.api.extensions import mongo
+from src import settings
+from src.api.rollups import rollup_updates, breakdown_updates, link_stats
+
+
+def make_click(url_id, minute, referrer=None, args=()):
+    return {
+        'url_id': url_id,
+        'clicked': datetime(2025, 6, 1, 10, minute, 30, tzinfo=timezone.utc),
+        'referrer': referrer,
+        'user_agent': 'curl/8.0',
+        'args': list(args),
+    }
+
+
+def test_batch_folds_into_one_upsert_per_bucket():
+    url_id = ObjectId()
+    clicks = [
+        make_click(url_id, 1, 'https://news.example', ['x']),
+        make_click(url_id, 1),
+        make_click(url_id, 2, args=['x', 'y']),
+    ]
+
+    ops = {(op._filter['g'], op._filter['ts'].minute): op._doc for op in rollup_updates(clicks)}
+
+    # Two minute buckets, one hour and one day bucket
+    assert sorted(ops) == [('day', 0), ('hour', 0), ('minute', 1), ('minute', 2)]
+    assert ops[('minute', 1)]['$inc'] == {'count': 2}
+    assert ops[('hour', 0)]['$inc'] == {'count': 3}
+    assert 'expires' in ops[('hour', 0)]['$setOnInsert']
+
+
+def test_breakdowns_are_one_document_per_value(monkeypatch):
+    monkeypatch.setattr(settings, 'ROLLUP_ARG_POSITIONS', [0])
+    url_id = ObjectId()
+    clicks = [
+        make_click(url_id, 1, 'https://news.example', ['x']),
+        make_click(url_id, 1),
+        make_click(url_id, 2, args=['x', 'y']),
+    ]
+
+    hour = {(op._filter['k'], op._filter['v']): op._doc['$inc']['n']
+            for op in breakdown_updates(clicks) if op._filter['g'] == 'hour'}
+    assert hour == {
+        ('referrer', 'https://news.example'): 1,
+        ('referrer', '(direct)'): 2,
+        ('agent', 'curl/8.0'): 3,
+        # Position 1 is not whitelisted
+        ('arg', '0:x'): 2,
+    }
+
+
+def test_distinct_values_never_grow_a_document():
+    url_id = ObjectId()
+    clicks = [make_click(url_id, n % 60, f'https://ref{n}.example', [f'random{n}']) for n in range(5000)]
+
+    for op in rollup_updates(clicks):
+        assert list(op._doc['$inc']) == ['count']
+
+    ops = breakdown_updates(clicks)
+    # Arguments are not tracked by default, and every value has its own document
+    assert not any(op._filter['k'] == 'arg' for op in ops)
+    assert all(op._doc['$inc'] == {'n': op._doc['$inc']['n']} for op in ops)
+    assert len([op for op in ops if op._filter['k'] == 'referrer']) == 2 * 5000
+
+
+def test_link_stats_merges_buckets(monkeypatch):
+    url_id = ObjectId()
+    series = MagicMock()
+    series.sort.return_value = [
+        {'ts': datetime(2025, 6, 1, 10), 'count': 3},
+        {'ts': datetime(2025, 6, 1, 11), 'count': 1},
+    ]
+    db = MagicMock()
+    db.click_rollups.find.return_value = series
+    db.click_breakdowns.aggregate.return_value = [
+        {'_id': {'k': 'referrer', 'v': '(direct)'}, 'n': 1},
+        {'_id': {'k': 'referrer', 'v': 'a.com'}, 'n': 3},
+        {'_id': {'k': 'arg', 'v': '1:y'}, 'n': 1},
+        {'_id': {'k': 'arg', 'v': '0:x'}, 'n': 2},
+    ]
+    monkeypatch.setattr(mongo, 'db', db, raising=False)
+
+    stats = link_stats(url_id, 'hour', start=datetime(2025, 6, 1), end=datetime(2025, 6, 2), top=1)
+
+    assert stats['total'] == 4
+    assert [p['count'] for p in stats['series']] == [3, 1]
+    assert stats['top_referrers'] == [{'value': 'a.com', 'count': 3}]
+    assert stats['top_args'] == [{'position': 0, 'value': 'x', 'count': 2}]
@@ -0,0 +1,38 @@
+# tests/test_search.py
+
+from unittest.mock import MagicMock
+from werkzeug.datastructures import MultiDict
+from src.api import services
+from src.api.extensions import mongo
+from src.api.search import normalize_tags, extract_host, url_query, tags_query
+
+
+def test_tags_are_normalized():
+    assert normalize_tags([' Foo', 'foo', 'BAR', '', None]) == ['foo', 'bar']
+    assert tags_query(['A', 'b'], match_all=True) == {'tags': {'$all': ['a', 'b']}}
+    assert tags_query([]) == {}
+
+
+def test_host_extraction():
+    assert extract_host('https://WWW.Example.com:8443/path?q={0}') == 'www.example.com'
+    assert extract_host(None) is None
+
+
+def test_url_query_planner():
+    assert url_query('https://example.com/a.b') == {'redirect_url': {'$regex': r'^https://example\.com/a\.b'}}
+    assert url_query('Example.COM') == {'host': 'example.com'}
+    assert url_query('summer sale') == {'$text': {'$search': 'summer sale'}}
+
+
+def test_search_builds_indexed_query(monkeypatch):
+    cursor = MagicMock()
+    cursor.sort.return_value = cursor
+    cursor.skip.return_value = cursor
+    cursor.limit.return_value = iter([])
+    db = MagicMock()
+    db.links.find.return_value = cursor
+    monkeypatch.setattr(mongo, 'db', db, raising=False)
+
+    services.search(MultiDict([('tag', 'Promo'), ('tag', 'EU'), ('url', 'example.com')]))
+
+    db.links.find.assert_called_once_with({'tags': {'$in': ['promo', 'eu']}, 'host': 'example.com'})
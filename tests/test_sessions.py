@@ -0,0 +1,63 @@
+# tests/test_sessions.py
+
+import threading
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from src.api.sessions import SessionPool
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers['Content-Length']))
+        self.send_response(200)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'ok')
+
+    def log_message(self, *args):
+        pass
+
+
+def test_posts_reuse_one_connection_per_host():
+    server = HTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f'http://127.0.0.1:{server.server_port}/hook'
+
+    pool = SessionPool(pool_size=2, max_hosts=4, timeout=(1, 1))
+    try:
+        for _ in range(5):
+            assert pool.post(url, json={'n': 1}).text == 'ok'
+
+        stats = pool.stats()[f'http://127.0.0.1:{server.server_port}']
+        assert stats == {'requests': 5, 'connections': 1}
+    finally:
+        pool.close()
+        server.shutdown()
+
+
+def test_evicts_least_recently_used_host():
+    pool = SessionPool(pool_size=2, max_hosts=1, timeout=(1, 1))
+    first = pool.session_for('https://a.test/hook')
+    pool.session_for('https://b.test/hook')
+
+    assert pool.session_for('https://a.test/other') is not first
+
+
+def test_totals_include_evicted_sessions():
+    server = HTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_port
+
+    pool = SessionPool(pool_size=2, max_hosts=1, timeout=(1, 1))
+    try:
+        pool.post(f'http://127.0.0.1:{port}/hook', json={})
+        pool.post(f'http://127.0.0.1:{port}/hook', json={})
+        # A second host name for the same server evicts the first session
+        pool.post(f'http://localhost:{port}/hook', json={})
+
+        assert list(pool.stats()) == [f'http://localhost:{port}']
+        assert pool.totals() == {'requests': 3, 'connections': 2}
+    finally:
+        pool.close()
+        server.shutdown()
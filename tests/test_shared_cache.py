@@ -0,0 +1,76 @@
+# tests/test_shared_cache.py
+
+import threading
+import time
+import fakeredis
+from bson import ObjectId
+from datetime import datetime
+from src.api.cache import MISSING
+from src.api.shared_cache import SharedLinkCache, dumps, loads
+
+
+def make_cache():
+    server = fakeredis.FakeServer()
+    return SharedLinkCache(lambda: fakeredis.FakeRedis(server=server), ttl=60, negative_ttl=5, lock_timeout=1)
+
+
+def test_record_round_trip():
+    link = {
+        '_id': ObjectId(),
+        'short_link': 'abc12',
+        'redirect_url': 'https://example.com/{0}',
+        'created': datetime(2025, 1, 2, 3, 4, 5, 678000),
+        'expiration': None,
+        'tags': ['a', 'b'],
+    }
+
+    record = dumps(link)
+    assert '"s":"abc12"' in record
+
+    # None values are dropped from the record
+    link.pop('expiration')
+    assert loads(record) == link
+
+
+def test_concurrent_misses_share_one_load():
+    cache = make_cache()
+    link = {'_id': ObjectId(), 'short_link': 'abc12'}
+    calls = []
+
+    def loader():
+        calls.append(1)
+        time.sleep(0.05)
+        return link
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.load('abc12', loader))) for _ in range(10)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert all(r['short_link'] == 'abc12' for r in results)
+
+    # Written under both identifiers
+    assert cache.get(str(link['_id']))['short_link'] == 'abc12'
+
+
+def test_misses_and_deletes():
+    cache = make_cache()
+
+    assert cache.load('nope1', lambda: None) is None
+    assert cache.get('nope1') is None
+
+    cache.delete('nope1')
+    assert cache.get('nope1') is MISSING
+
+
+def test_redis_outage_falls_through_to_loader():
+    def unavailable():
+        raise ConnectionError('redis down')
+
+    cache = SharedLinkCache(unavailable, ttl=60, negative_ttl=5, lock_timeout=1)
+    link = {'_id': ObjectId(), 'short_link': 'abc12'}
+
+    assert cache.load('abc12', lambda: link) is link
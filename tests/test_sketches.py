@@ -0,0 +1,110 @@
+# tests/test_sketches.py
+
+from datetime import datetime, timezone
+
+from unittest.mock import MagicMock
+
+import pytest
+
+from src.api import sketches
+from src.api.extensions import mongo
+from src.api.sketches import HyperLogLog, CountMinSketch, SpaceSaving
+
+
+def test_hyperloglog_within_error_bound():
+    hll = HyperLogLog(12)
+    for i in range(20000):
+        hll.add(f'visitor-{i}')
+    assert abs(hll.count() - 20000) / 20000 < 0.05
+
+
+def test_hyperloglog_merge_matches_union_and_round_trips():
+    a, b = HyperLogLog(12), HyperLogLog(12)
+    for i in range(3000):
+        a.add(i)
+    for i in range(2000, 5000):
+        b.add(i)
+    merged = HyperLogLog.from_bytes(12, a.to_bytes()).merge(b)
+    assert abs(merged.count() - 5000) / 5000 < 0.05
+
+
+def test_count_min_never_undercounts_and_merges():
+    a, b = CountMinSketch(272, 5), CountMinSketch(272, 5)
+    for i in range(1000):
+        a.add(f'k{i % 50}')
+    b.add('k1', 7)
+    a.merge(b)
+    assert a.estimate('k1') >= 27
+    assert a.estimate('k1') <= 27 + 1007 * 2.72 / 272
+    assert CountMinSketch.from_bytes(272, 5, a.to_bytes()).estimate('k1') == a.estimate('k1')
+
+
+def test_space_saving_keeps_heavy_hitters():
+    ss = SpaceSaving(5)
+    for i in range(1000):
+        ss.add('hot' if i % 3 == 0 else f'cold{i}')
+    other = SpaceSaving(5)
+    for _ in range(100):
+        other.add('hot')
+    ss.merge(other)
+    key, count, error = ss.top(1)[0]
+    assert key == 'hot'
+    assert count - error <= 434 <= count
+
+
+class FakeSketches:
+    """
+    Just enough of a collection for the versioned merge in ingest_clicks
+    """
+
+    def __init__(self):
+        self.docs = {}
+        self.races = 0
+
+    def find(self, query, projection=None):
+        if 'url_id' in query:
+            docs = [d for d in self.docs.values() if d['url_id'] == query['url_id']]
+            return MagicMock(sort=lambda *a: sorted(docs, key=lambda d: d['day']))
+        return [dict(self.docs[i]) for i in query['_id']['$in'] if i in self.docs]
+
+    def bulk_write(self, ops, ordered=True):
+        for op in ops:
+            key, version = op._filter['_id'], op._filter['v']
+            if self.races:
+                # Another process wins the race for this write
+                self.races -= 1
+                self.docs[key]['v'] = 'other'
+            current = self.docs.get(key)
+            if current is None or current['v'] == version:
+                self.docs[key] = {**(current or {'_id': key}), **op._doc['$set']}
+
+
+@pytest.fixture
+def store(monkeypatch):
+    store = FakeSketches()
+    monkeypatch.setattr(mongo, 'db', MagicMock(link_sketches=store), raising=False)
+    return store
+
+
+def _clicks(url_id, day, n, referrer='https://ref.example/'):
+    when = datetime(2025, 3, day, 12, tzinfo=timezone.utc)
+    return [
+        {'url_id': url_id, 'clicked': when, 'ip_address': f'10.0.0.{i}',
+         'user_agent': 'agent', 'referrer': referrer}
+        for i in range(n)
+    ]
+
+
+def test_ingest_merges_batches_and_days(store):
+    sketches.ingest_clicks(_clicks('L1', 1, 40))
+    store.races = 1
+    sketches.ingest_clicks(_clicks('L1', 1, 40))  # same visitors again, after a lost race
+    sketches.ingest_clicks(_clicks('L1', 2, 10, referrer=None))
+
+    assert len(store.docs) == 2
+    audience = sketches.link_audience(
+        'L1', datetime(2025, 3, 1, tzinfo=timezone.utc), datetime(2025, 3, 2, tzinfo=timezone.utc)
+    )
+    assert [d['unique_visitors'] for d in audience['days']] == pytest.approx([40, 10], abs=2)
+    assert audience['unique_visitors'] == pytest.approx(40, abs=2)
+    assert audience['top_referrers'][0] == {'value': 'https://ref.example/', 'count': 80, 'error': 0}
@@ -0,0 +1,40 @@
+# tests/test_templates.py
+
+import pytest
+
+from src.api.templates import compile_template, render, TemplateError
+
+
+def test_matches_str_format_for_plain_args():
+    for template, args in [
+        ('https://example.com/', ['x']),
+        ('https://example.com/{}/{}', ['a', 'b']),
+        ('https://example.com/{1}/{0}', ['a', 'b']),
+        ('https://example.com/{{literal}}/{}', ['a']),
+    ]:
+        assert render(template, args) == template.format(*args)
+
+
+def test_missing_args_use_defaults_instead_of_raising():
+    assert render('https://example.com/{}/{}', ['a']) == 'https://example.com/a/'
+    assert render('https://example.com/{0|home}', []) == 'https://example.com/home'
+    assert render('https://example.com/{0|home}', ['shop']) == 'https://example.com/shop'
+
+
+def test_values_are_encoded_for_their_slot():
+    assert render('https://example.com/{}?q={}', ['a b?', 'x&y z']) == 'https://example.com/a%20b%3F?q=x%26y+z'
+
+
+def test_compiled_once():
+    assert compile_template('https://example.com/{}') is compile_template('https://example.com/{}')
+
+
+@pytest.mark.parametrize('template', [
+    'https://example.com/{name}',
+    'https://example.com/{0:>10}',
+    'https://example.com/{}/{0}',
+    'https://example.com/{',
+])
+def test_invalid_templates(template):
+    with pytest.raises(TemplateError):
+        compile_template(template)
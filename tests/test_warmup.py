@@ -0,0 +1,79 @@
+# tests/test_warmup.py
+
+from unittest.mock import MagicMock
+
+from bson import ObjectId
+
+from src.api.cache import LinkCache
+from src.api.warmup import LinkWarmup, WARMUP_PROJECTION
+
+
+class FakeClock:
+    def __init__(self, step=0.0):
+        self.now = 0.0
+        self.step = step
+
+    def __call__(self):
+        self.now += self.step
+        return self.now
+
+
+class FakeCursor(list):
+
+    def sort(self, *args):
+        return self
+
+    def limit(self, n):
+        return FakeCursor(self[:n])
+
+    def max_time_ms(self, ms):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+def make_db(count):
+    links = [{'_id': ObjectId(), 'short_link': f'hot{n}', 'redirect_url': 'https://example.com'} for n in range(count)]
+    db = MagicMock()
+    db.links.find.return_value = FakeCursor(links)
+    return db, links
+
+
+def test_warmup_loads_top_links_with_one_query():
+    db, links = make_db(5)
+    cache = LinkCache(maxsize=100, ttl=60, negative_ttl=5)
+    warmup = LinkWarmup(lambda: db, cache, size=3, budget=5)
+    assert not warmup.ready
+
+    warmup.run()
+    db.links.find.assert_called_once_with({}, WARMUP_PROJECTION)
+    assert warmup.status()['state'] == 'complete'
+    assert warmup.ready and warmup.loaded == 3
+    assert cache.get('hot2') is links[2]
+    assert cache.get(str(links[0]['_id'])) is links[0]
+
+
+def test_warmup_stops_at_budget():
+    db, _ = make_db(10)
+    warmup = LinkWarmup(lambda: db, LinkCache(100, 60, 5), size=10, budget=2, clock=FakeClock(step=1))
+    warmup.run()
+    assert warmup.status()['state'] == 'timed_out'
+    assert 0 < warmup.loaded < 10
+
+
+def test_warmup_failure_still_reports_ready():
+    db = MagicMock()
+    db.links.find.side_effect = Exception('no server')
+    warmup = LinkWarmup(lambda: db, LinkCache(100, 60, 5), size=10, budget=2)
+    warmup.run()
+    assert warmup.ready and warmup.state == 'failed'
+
+
+def test_warmup_size_capped_by_cache():
+    warmup = LinkWarmup(MagicMock(), LinkCache(10, 60, 5), size=1000, budget=2)
+    assert warmup.size == 5
+    assert LinkWarmup(MagicMock(), LinkCache(10, 60, 5), size=0, budget=2).ready
@@ -0,0 +1,34 @@
+# tests/test_webhooks.py
+
+import json
+from bson import ObjectId
+from datetime import datetime, timezone
+from src.api.webhooks import WebhookBatcher, webhook_payload
+
+
+def test_batches_per_url_by_size_and_on_close():
+    sent = []
+    batcher = WebhookBatcher(window=60, max_size=2, send=lambda url, payloads: sent.append((url, payloads)))
+
+    batcher.add('https://a.test/hook', {'n': 1})
+    batcher.add('https://b.test/hook', {'n': 2})
+    batcher.add('https://a.test/hook', {'n': 3})
+
+    # 'a' reached max_size, 'b' is still inside its window
+    batcher.flush()
+    assert sent == [('https://a.test/hook', [{'n': 1}, {'n': 3}])]
+
+    batcher.close()
+    assert sent[-1] == ('https://b.test/hook', [{'n': 2}])
+
+
+def test_payload_is_json_safe():
+    click = {
+        '_id': ObjectId(),
+        'url_id': ObjectId(),
+        'clicked': datetime(2025, 1, 1, tzinfo=timezone.utc),
+        'args': ['x'],
+    }
+
+    payload = json.loads(json.dumps(webhook_payload(click)))
+    assert payload == {'url_id': str(click['url_id']), 'clicked': '2025-01-01T00:00:00+00:00', 'args': ['x']}